@@ -0,0 +1,61 @@
+package cmd
+
+import (
+	"fmt"
+	"os"
+	"path/filepath"
+	"time"
+)
+
+// findBuildOutput returns the directory in the staging output holding the build.
+// Transforms that already nest their output under <root>/<shell> or <shell> are
+// unwrapped so the published tree is not nested twice.
+func findBuildOutput(stagingPath, root, shell string) string {
+	entries, err := os.ReadDir(stagingPath)
+	if err != nil || len(entries) != 1 || !entries[0].IsDir() {
+		return stagingPath
+	}
+
+	switch entries[0].Name() {
+	case shell:
+		return filepath.Join(stagingPath, shell)
+	case root:
+		nested, err := os.ReadDir(filepath.Join(stagingPath, root))
+		if err == nil && len(nested) == 1 && nested[0].IsDir() && nested[0].Name() == shell {
+			return filepath.Join(stagingPath, root, shell)
+		}
+	}
+	return stagingPath
+}
+
+// publishOutput moves a successful build's output from its staging directory to
+// <output>/<root>/<shell>, the same layout the Python CLI publishes. The previous
+// output is moved aside immediately before the rename and then removed.
+func publishOutput(stagingPath, outputPath, root, shell string) (string, error) {
+	dest := filepath.Join(outputPath, root, shell)
+	if err := os.MkdirAll(filepath.Dir(dest), 0o755); err != nil {
+		return "", fmt.Errorf("failed to create output directory: %w", err)
+	}
+
+	previous := ""
+	if _, err := os.Stat(dest); err == nil {
+		previous = filepath.Join(filepath.Dir(dest), fmt.Sprintf(".%s.%d", shell, time.Now().UnixNano()))
+		if err := os.Rename(dest, previous); err != nil {
+			return "", fmt.Errorf("failed to move previous output aside: %w", err)
+		}
+	}
+
+	if err := os.Rename(findBuildOutput(stagingPath, root, shell), dest); err != nil {
+		// Put the previous output back rather than leaving nothing published
+		if previous != "" {
+			os.Rename(previous, dest)
+		}
+		os.RemoveAll(stagingPath)
+		return "", fmt.Errorf("failed to publish output: %w", err)
+	}
+	if previous != "" {
+		os.RemoveAll(previous)
+	}
+	os.RemoveAll(stagingPath)
+	return dest, nil
+}
@@ -281,9 +281,14 @@ func runBuilds(shellFilter string) error {
 		return nil
 	}
 
+	// Builds render into private staging directories and are published to
+	// target/bartleby/<root>/<shell> when they succeed.
 	outputPath := filepath.Join(rp, "target", "bartleby")
-	if err := os.MkdirAll(outputPath, 0o755); err != nil {
-		return fmt.Errorf("failed to create output directory: %w", err)
+	stagingRoot := filepath.Join(rp, "target", "bartleby-staging")
+	for _, dir := range []string{outputPath, stagingRoot} {
+		if err := os.MkdirAll(dir, 0o755); err != nil {
+			return fmt.Errorf("failed to create output directory: %w", err)
+		}
 	}
 
 	img := imageName()
@@ -331,6 +336,11 @@ func runBuilds(shellFilter string) error {
 	for _, b := range builds {
 		fmt.Printf("Building %s/%s (root: %s)...\n", b.name, b.shell, b.rootDoc)
 
+		stagingPath, err := os.MkdirTemp(stagingRoot, fmt.Sprintf("%s-%s-", b.name, b.shell))
+		if err != nil {
+			return fmt.Errorf("failed to create staging directory: %w", err)
+		}
+
 		cfg := runner.TransformConfig{
 			ImageName:    img,
 			InstanceName: instanceName,
@@ -349,7 +359,7 @@ func runBuilds(shellFilter string) error {
 			DocRepo:                  name,
 			DocRepoVersion:           version,
 			InputPath:                rp,
-			OutputPath:               outputPath,
+			OutputPath:               stagingPath,
 			PipConfigPath:            pipPath,
 			DocumentTitle:            effectiveTitle,
 			NoTimestampTitle:         flagNoTimestampTitle,
@@ -362,8 +372,15 @@ func runBuilds(shellFilter string) error {
 		}
 
 		if err := runner.RunTransform(cfg); err != nil {
+			os.RemoveAll(stagingPath)
 			return fmt.Errorf("transform failed for %s/%s: %w", b.name, b.shell, err)
 		}
+
+		dest, err := publishOutput(stagingPath, outputPath, b.name, b.shell)
+		if err != nil {
+			return fmt.Errorf("failed to publish %s/%s: %w", b.name, b.shell, err)
+		}
+		fmt.Printf("Published %s\n", dest)
 	}
 
 	return nil
@@ -0,0 +1,99 @@
+"""Host-side cache of remote logos and cover images.
+
+Logo and cover image URLs are downloaded once into the bartleby cache
+directory and mounted into the transform, with the logo environment
+variables pointing at the local copies. Cached copies are revalidated with
+``ETag`` and ``Last-Modified`` at most once per ``HMD_BARTLEBY_ASSET_MAX_AGE``
+seconds, and are used as they are when the server cannot be reached.
+"""
+
+import hashlib
+import json
+import os
+import posixpath
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Optional
+
+from .cache import get_cache_path
+
+ASSETS_TARGET = "/hmd_transform/assets"
+ASSET_MAX_AGE_ENV = "HMD_BARTLEBY_ASSET_MAX_AGE"
+DEFAULT_MAX_AGE = 3600
+TIMEOUT = 10
+
+
+def get_assets_path() -> Path:
+    path = get_cache_path("assets")
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def is_remote(url: Optional[str]) -> bool:
+    return bool(url) and urllib.parse.urlparse(url).scheme in ("http", "https")
+
+
+def get_asset_name(url: str) -> str:
+    """Name the cached copy of ``url``, keeping its file extension."""
+    suffix = posixpath.splitext(urllib.parse.urlparse(url).path)[1]
+    return hashlib.sha256(url.encode()).hexdigest()[:16] + suffix.lower()
+
+
+def _read_metadata(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def fetch_asset(
+    url: str, assets_path: Path = None, max_age: int = None
+) -> Optional[Path]:
+    """Return a local copy of ``url``, downloading or revalidating it as needed.
+
+    Returns:
+        The cached file, or None when it is not cached and cannot be
+        downloaded
+    """
+    assets_path = assets_path or get_assets_path()
+    if max_age is None:
+        max_age = int(os.environ.get(ASSET_MAX_AGE_ENV, DEFAULT_MAX_AGE))
+
+    name = get_asset_name(url)
+    asset_path = assets_path / name
+    metadata_path = assets_path / f"{name}.json"
+    metadata = _read_metadata(metadata_path) if asset_path.exists() else {}
+
+    if metadata and time.time() - metadata.get("checked_at", 0) < max_age:
+        return asset_path
+
+    request = urllib.request.Request(url)
+    if metadata.get("etag"):
+        request.add_header("If-None-Match", metadata["etag"])
+    if metadata.get("last_modified"):
+        request.add_header("If-Modified-Since", metadata["last_modified"])
+
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            temp_path = assets_path / f".{name}.{os.getpid()}"
+            temp_path.write_bytes(response.read())
+            os.replace(temp_path, asset_path)
+            metadata = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except urllib.error.HTTPError as e:
+        if e.code != 304 or not metadata:
+            print(f"Unable to download {url}: {e}")
+            return asset_path if metadata else None
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Unable to download {url}: {e}")
+        return asset_path if metadata else None
+
+    metadata["checked_at"] = time.time()
+    metadata_path.write_text(json.dumps(metadata))
+    return asset_path
@@ -0,0 +1,379 @@
+"""Static API extraction for autodoc builds.
+
+Module, class and function signatures and docstrings are read from the
+Python sources with :mod:`ast`, without importing anything. The result is
+written as a tree of stub modules that autodoc can import in place of the
+real packages. The transform only avoids installing the packages'
+dependencies if its image reads ``AUTODOC_STUBS``/``AUTODOC_STUBS_PATH``;
+the pip config and cache are still provided for images that do not. Each
+source root gets its own stub tree, so gathered
+repositories with the same package paths do not overwrite each other.
+Extraction results are cached per file content hash.
+"""
+
+import ast
+import builtins
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .build_cache import IGNORED_DIRS, InputHasher
+from .cache import get_cache_path
+
+# Bumped whenever the extracted format changes to invalidate cached results
+EXTRACTOR_VERSION = 2
+STUBS_TARGET = "/hmd_transform/autodoc_stubs"
+INDEX_FILENAME = "api.json"
+KEPT_DECORATORS = {"property", "staticmethod", "classmethod"}
+# Defined in every stub to stand in for base classes that are not in it
+BASE_HELPER = """def _bartleby_base(module, name):
+    return type(name, (), {"__module__": module, "__qualname__": name})"""
+
+# Shared so that repeated builds in one process only rehash changed files
+_hasher = InputHasher()
+
+
+def _default(node: ast.expr) -> str:
+    """Render a default value, replacing anything that is not a literal."""
+    try:
+        ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return "..."
+    return ast.unparse(node)
+
+
+def _literal(node: Optional[ast.expr]) -> Optional[ast.expr]:
+    if node is None or _default(node) != "...":
+        return node
+    return ast.Constant(value=...)
+
+
+def _signature(args: ast.arguments) -> str:
+    args = ast.arguments(
+        posonlyargs=args.posonlyargs,
+        args=args.args,
+        vararg=args.vararg,
+        kwonlyargs=args.kwonlyargs,
+        kw_defaults=[_literal(d) for d in args.kw_defaults],
+        kwarg=args.kwarg,
+        defaults=[_literal(d) for d in args.defaults],
+    )
+    return ast.unparse(args)
+
+
+def _extract_function(node) -> Dict:
+    return {
+        "kind": "function",
+        "name": node.name,
+        "async": isinstance(node, ast.AsyncFunctionDef),
+        "signature": _signature(node.args),
+        "returns": ast.unparse(node.returns) if node.returns else None,
+        "decorators": [ast.unparse(d) for d in node.decorator_list],
+        "docstring": ast.get_docstring(node, clean=False),
+    }
+
+
+def _extract_body(body: List[ast.stmt]) -> List[Dict]:
+    members = []
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            members.append(_extract_function(node))
+        elif isinstance(node, ast.ClassDef):
+            members.append(
+                {
+                    "kind": "class",
+                    "name": node.name,
+                    "bases": [ast.unparse(b) for b in node.bases],
+                    "decorators": [ast.unparse(d) for d in node.decorator_list],
+                    "docstring": ast.get_docstring(node, clean=False),
+                    "members": _extract_body(node.body),
+                }
+            )
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    members.append(
+                        {
+                            "kind": "data",
+                            "name": target.id,
+                            "annotation": (
+                                ast.unparse(node.annotation)
+                                if isinstance(node, ast.AnnAssign)
+                                else None
+                            ),
+                            "value": _default(node.value) if node.value else None,
+                        }
+                    )
+    return members
+
+
+def _extract_imports(body: List[ast.stmt]) -> Dict[str, str]:
+    """Map names bound by module-level imports to what they import.
+
+    Relative imports keep their leading dots.
+    """
+    imports = {}
+    for node in body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    imports[alias.asname] = alias.name
+                else:
+                    name = alias.name.split(".")[0]
+                    imports[name] = name
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            for alias in node.names:
+                separator = "" if module.endswith(".") else "."
+                imports[alias.asname or alias.name] = f"{module}{separator}{alias.name}"
+    return imports
+
+
+def extract_module(source: str) -> Dict:
+    """Extract the documented API of a module from its source."""
+    tree = ast.parse(source)
+    return {
+        "docstring": ast.get_docstring(tree, clean=False),
+        "imports": _extract_imports(tree.body),
+        "members": _extract_body(tree.body),
+    }
+
+
+def _docstring(docstring: Optional[str], indent: str) -> List[str]:
+    if docstring is None:
+        return []
+    return [f"{indent}{docstring!r}"]
+
+
+def _resolve_import(target: str, module_name: str, is_package: bool) -> str:
+    level = len(target) - len(target.lstrip("."))
+    if not level:
+        return target
+    package = module_name.split(".")
+    if not is_package:
+        package = package[:-1]
+    package = package[: len(package) - level + 1]
+    return ".".join(package + [target[level:]])
+
+
+def _render_base(base: str, module: Dict, defined: set) -> str:
+    """Render a base class so that the stub imports on its own.
+
+    Builtins and classes defined earlier in the stub are used as they are.
+    Anything else is replaced by a placeholder class that carries the
+    module and name the base was imported from, which is what autodoc shows
+    for ``:show-inheritance:``.
+    """
+    name = base.split("[")[0]
+    if name in defined or (name.isidentifier() and hasattr(builtins, name)):
+        return name
+    head, _, rest = name.partition(".")
+    target = module["imports"].get(head)
+    if target is not None:
+        target = _resolve_import(
+            target, module["name"], module.get("is_package", False)
+        )
+        qualified = f"{target}.{rest}" if rest else target
+    else:
+        qualified = f"{module['name']}.{name}" if module["name"] else name
+    base_module, _, base_name = qualified.rpartition(".")
+    return f"_bartleby_base({base_module!r}, {base_name!r})"
+
+
+def _render_members(
+    members: List[Dict], indent: str = "", module: Dict = None
+) -> List[str]:
+    module = module or {"name": "", "imports": {}}
+    defined = module.setdefault("defined", set())
+    lines = []
+    for member in members:
+        if member["kind"] == "data":
+            annotation = f": {member['annotation']}" if member["annotation"] else ""
+            value = f" = {member['value']}" if member["value"] else ""
+            if annotation or value:
+                lines.append(f"{indent}{member['name']}{annotation}{value}")
+        elif member["kind"] == "function":
+            decorators = [d for d in member["decorators"] if d in KEPT_DECORATORS]
+            if any(d.endswith((".setter", ".deleter")) for d in member["decorators"]):
+                continue
+            lines += [f"{indent}@{d}" for d in decorators]
+            returns = f" -> {member['returns']}" if member["returns"] else ""
+            prefix = "async def" if member["async"] else "def"
+            lines.append(
+                f"{indent}{prefix} {member['name']}({member['signature']}){returns}:"
+            )
+            lines += _docstring(member["docstring"], indent + "    ")
+            lines.append(f"{indent}    ...")
+        elif member["kind"] == "class":
+            bases = [_render_base(b, module, defined) for b in member["bases"]]
+            bases = f"({', '.join(bases)})" if bases else ""
+            lines.append(f"{indent}class {member['name']}{bases}:")
+            lines += _docstring(member["docstring"], indent + "    ")
+            lines += _render_members(
+                member["members"], indent + "    ", {**module, "defined": set(defined)}
+            )
+            lines.append(f"{indent}    ...")
+            defined.add(member["name"])
+    return lines
+
+
+def render_stub(module: Dict, module_name: str = "", is_package: bool = False) -> str:
+    """Render an extracted module as an importable stub module.
+
+    Annotations are never evaluated and non-literal values are replaced
+    with ``...``, so the stub imports without any of its dependencies.
+    Class bases are kept. Bases that are neither builtins nor defined in
+    the module are replaced by placeholder classes with the module and name
+    they were imported from.
+
+    Args:
+        module: Result of :func:`extract_module`
+        module_name: Dotted name of the module, used to name imported bases
+        is_package: Whether the module is the ``__init__`` of a package
+    """
+    lines = _docstring(module["docstring"], "")
+    lines.append("from __future__ import annotations")
+    lines.append(BASE_HELPER)
+    context = {
+        "name": module_name,
+        "is_package": is_package,
+        "imports": module.get("imports", {}),
+    }
+    lines += _render_members(module["members"], module=context)
+    return "\n".join(lines) + "\n"
+
+
+def _extract_file(path: str) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return extract_module(f.read())
+    except (SyntaxError, UnicodeDecodeError) as e:
+        print(f"Skipping autodoc extraction of {path}: {e}")
+        return None
+
+
+def get_module_name(relative: Path) -> str:
+    """Return the dotted module name of a path relative to ``src/python``."""
+    parts = list(relative.with_suffix("").parts)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def get_root_names(python_paths: List[Path]) -> List[str]:
+    """Name the stub tree of each source root after its repository.
+
+    ``<repo>/src/python`` is named ``<repo>``. Duplicate names get a numeric
+    suffix.
+    """
+    names = []
+    for python_path in python_paths:
+        python_path = Path(python_path)
+        name = (
+            python_path.parent.parent.name
+            if python_path.parts[-2:] == ("src", "python")
+            else python_path.name
+        )
+        candidate = name
+        number = 2
+        while candidate in names:
+            candidate = f"{name}-{number}"
+            number += 1
+        names.append(candidate)
+    return names
+
+
+def find_modules(python_path: Path) -> List[Path]:
+    modules = []
+    for root, dirs, names in os.walk(python_path):
+        dirs[:] = sorted(
+            d for d in dirs if d not in IGNORED_DIRS and not d.endswith(".egg-info")
+        )
+        modules.extend(Path(root) / n for n in sorted(names) if n.endswith(".py"))
+    return modules
+
+
+def extract_modules(
+    python_paths: List[Path], hasher: InputHasher = None, jobs: int = None
+) -> Dict[Tuple[str, Path], Dict]:
+    """Extract the API of every module under ``python_paths``.
+
+    Results are cached by file hash; files without a cached result are
+    parsed in parallel.
+
+    Returns:
+        Mapping of (source root name from :func:`get_root_names`, path
+        relative to the source root) to extracted module
+    """
+    hasher = hasher or _hasher
+    cache_dir = get_cache_path("autodoc", f"v{EXTRACTOR_VERSION}")
+    cache_dir.mkdir(exist_ok=True)
+
+    modules = {}
+    missing = {}
+    for root, python_path in zip(get_root_names(python_paths), python_paths):
+        for path in find_modules(Path(python_path)):
+            relative = (root, path.relative_to(python_path))
+            cache_file = cache_dir / f"{hasher.hash_file(path)}.json"
+            if cache_file.exists():
+                modules[relative] = json.loads(cache_file.read_text())
+            else:
+                missing[relative] = (path, cache_file)
+
+    if len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            extracted = executor.map(_extract_file, [p for p, _ in missing.values()])
+            extracted = list(extracted)
+    else:
+        extracted = [_extract_file(p) for p, _ in missing.values()]
+
+    for (relative, (_, cache_file)), module in zip(missing.items(), extracted):
+        if module is None:
+            continue
+        cache_file.write_text(json.dumps(module))
+        modules[relative] = module
+
+    return modules
+
+
+def build_stubs(python_paths: List[Path], stubs_path: Path, jobs: int = None) -> Path:
+    """Write the stub tree for ``python_paths`` into ``stubs_path``.
+
+    Stubs are written to a directory per source root, named by
+    :func:`get_root_names`. Only stubs whose content changed are rewritten,
+    and stubs of deleted modules are removed. An ``api.json`` index of all
+    modules, by source root, is written alongside.
+
+    Returns:
+        The stub tree path
+    """
+    modules = extract_modules(python_paths, jobs=jobs)
+    stubs_path.mkdir(parents=True, exist_ok=True)
+
+    expected = {stubs_path / INDEX_FILENAME}
+    index = {}
+    for (root, relative), module in sorted(modules.items()):
+        stub_path = stubs_path / root / relative
+        expected.add(stub_path)
+        module_name = get_module_name(relative)
+        stub = render_stub(module, module_name, relative.stem == "__init__")
+        if not stub_path.exists() or stub_path.read_text() != stub:
+            stub_path.parent.mkdir(parents=True, exist_ok=True)
+            stub_path.write_text(stub)
+        index.setdefault(root, {})[module_name] = module
+
+    index_content = json.dumps(index, indent=2, sort_keys=True)
+    index_path = stubs_path / INDEX_FILENAME
+    if not index_path.exists() or index_path.read_text() != index_content:
+        index_path.write_text(index_content)
+
+    for root, _, names in os.walk(stubs_path):
+        for name in names:
+            path = Path(root) / name
+            if path not in expected:
+                path.unlink()
+
+    return stubs_path
@@ -0,0 +1,123 @@
+"""Input hashing for bartleby builds.
+
+A build is identified by a hash of its input files together with the
+arguments it is run with, so identical requests can share a single run.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Tuple
+
+INPUT_DIRS = ["docs", "meta-data"]
+AUTODOC_INPUT_DIRS = ["src/python"]
+IGNORED_DIRS = {"__pycache__", ".git", ".pytest_cache"}
+
+
+def get_input_paths(repo_path: Path, autodoc: bool = False) -> List[Path]:
+    """Return the repository paths a build reads from."""
+    dirs = INPUT_DIRS + (AUTODOC_INPUT_DIRS if autodoc else [])
+    return [Path(repo_path) / d for d in dirs if (Path(repo_path) / d).exists()]
+
+
+class InputHasher:
+    """Hashes build inputs, reusing file hashes while files are unchanged.
+
+    File hashes are cached by path, size and modification time so that a
+    long-running process only rereads files that have changed.
+    """
+
+    def __init__(self) -> None:
+        self._files: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = Lock()
+
+    def hash_file(self, path: Path) -> str:
+        stat = os.stat(path)
+        key = str(path)
+        with self._lock:
+            cached = self._files.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+
+        with self._lock:
+            self._files[key] = (stat.st_mtime_ns, stat.st_size, file_hash)
+        return file_hash
+
+    def hash_tree(
+        self, base_path: Path, paths: List[Path], exclude: List[Path] = ()
+    ) -> str:
+        """Hash the files under ``paths`` relative to ``base_path``.
+
+        Directories listed in ``exclude`` are skipped.
+        """
+        excluded = {str(Path(p)) for p in exclude}
+        digest = hashlib.sha256()
+        for path in sorted(Path(p) for p in paths):
+            if path.is_file():
+                files = [path]
+            else:
+                files = []
+                for root, dirs, names in os.walk(path):
+                    dirs[:] = sorted(
+                        d
+                        for d in dirs
+                        if d not in IGNORED_DIRS
+                        and os.path.join(root, d) not in excluded
+                    )
+                    files.extend(Path(root) / name for name in sorted(names))
+
+            for file_path in files:
+                relative = Path(os.path.relpath(file_path, base_path)).as_posix()
+                digest.update(relative.encode())
+                digest.update(b"\0")
+                digest.update(self.hash_file(file_path).encode())
+                digest.update(b"\n")
+        return digest.hexdigest()
+
+
+def hash_inputs(
+    repo_path: Path,
+    autodoc: bool,
+    sources: Dict,
+    hasher: InputHasher,
+    full_context: bool = False,
+) -> str:
+    """Hash everything a build of ``repo_path`` reads.
+
+    Includes the docs and metadata, the Python sources when autodoc is on,
+    the docs of external sources and any global style overrides. With
+    ``full_context`` the build can read the whole repository, so everything
+    outside ``target`` is hashed instead of the input directories.
+    """
+    repo_path = Path(repo_path)
+    if full_context:
+        paths = [repo_path]
+    else:
+        paths = get_input_paths(repo_path, autodoc)
+    for source in sources.values():
+        if source.get("artifact_path"):
+            paths.append(
+                repo_path / source["artifact_path"] / source.get("docs_root", "docs")
+            )
+    hmd_home = os.environ.get("HMD_HOME")
+    if hmd_home:
+        paths.append(Path(hmd_home) / "bartleby" / "styles")
+    # Staged sources are hashed from their artifact path above
+    exclude = [repo_path / "docs" / "_sources", repo_path / "target"]
+    return hasher.hash_tree(repo_path, [p for p in paths if p.exists()], exclude)
+
+
+def get_build_key(input_hash: str, transform_args: Dict) -> str:
+    """Combine an input hash with the arguments of a transform run."""
+    digest = hashlib.sha256()
+    digest.update(input_hash.encode())
+    digest.update(json.dumps(transform_args, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
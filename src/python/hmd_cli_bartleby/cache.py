@@ -0,0 +1,24 @@
+"""Location of bartleby's local caches and build state."""
+
+import os
+from pathlib import Path
+
+
+def get_cache_path(*parts: str) -> Path:
+    """Return a path inside the bartleby cache directory.
+
+    The cache directory is ``HMD_BARTLEBY_CACHE_DIR`` if set, otherwise
+    ``$HMD_HOME/bartleby/cache``, falling back to ``~/.cache/hmd-bartleby``.
+    Parent directories are created as needed.
+    """
+    cache_dir = os.environ.get("HMD_BARTLEBY_CACHE_DIR")
+    if not cache_dir:
+        hmd_home = os.environ.get("HMD_HOME")
+        if hmd_home:
+            cache_dir = os.path.join(hmd_home, "bartleby", "cache")
+        else:
+            cache_dir = os.path.join(Path.home(), ".cache", "hmd-bartleby")
+
+    path = Path(cache_dir).joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
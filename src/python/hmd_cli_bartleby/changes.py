@@ -0,0 +1,151 @@
+"""Output change detection for published builds.
+
+The content hashes of each published build are kept in a manifest under
+``target/bartleby-state``. When a build is published again, files whose
+content is unchanged are replaced by the previous copies, keeping their
+inode and modification time, so sync tools only transfer what changed. A
+change manifest listing added, modified and removed files is written for
+every publish.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+STATE_DIR = "bartleby-state"
+MANIFEST_FILENAME = "manifest.json"
+CHANGES_FILENAME = "changes.json"
+
+
+def get_state_path(output_path: Path, root: str, shell: str) -> Path:
+    """Return the state directory of a build published under ``output_path``."""
+    return Path(output_path).parent / STATE_DIR / root / shell
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _list_files(path: Path) -> Dict[str, Path]:
+    files = {}
+    for root, _, names in os.walk(path):
+        for name in names:
+            file_path = Path(root) / name
+            if not file_path.is_symlink():
+                files[file_path.relative_to(path).as_posix()] = file_path
+    return files
+
+
+def hash_tree(path: Path, previous: Optional[Dict] = None, jobs: int = None) -> Dict:
+    """Return the manifest of a directory.
+
+    Files whose size and modification time match ``previous`` keep their
+    recorded hash; everything else is hashed in parallel.
+
+    Returns:
+        Mapping of relative path to ``sha256``, ``size`` and ``mtime_ns``
+    """
+    previous = previous or {}
+    files = _list_files(path)
+    manifest = {}
+    to_hash = []
+    for relative, file_path in files.items():
+        stat = file_path.stat()
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        recorded = previous.get(relative)
+        if (
+            recorded
+            and recorded["size"] == entry["size"]
+            and recorded["mtime_ns"] == entry["mtime_ns"]
+        ):
+            entry["sha256"] = recorded["sha256"]
+        else:
+            to_hash.append(relative)
+        manifest[relative] = entry
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for relative, file_hash in zip(
+            to_hash, executor.map(hash_file, [files[r] for r in to_hash])
+        ):
+            manifest[relative]["sha256"] = file_hash
+
+    return manifest
+
+
+def load_manifest(state_path: Path) -> Dict:
+    try:
+        return json.loads((state_path / MANIFEST_FILENAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _reuse(previous_path: Path, new_path: Path):
+    """Replace ``new_path`` with the identical previous file."""
+    temp_path = new_path.with_name(f".{new_path.name}.reuse")
+    try:
+        os.link(previous_path, temp_path)
+        os.replace(temp_path, new_path)
+    except OSError:
+        stat = previous_path.stat()
+        os.utime(new_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def reuse_unchanged(
+    new_path: Path, previous_path: Path, state_path: Path, jobs: int = None
+) -> Tuple[Dict, Dict]:
+    """Keep unchanged files from the previous publish in a new build.
+
+    Files in ``new_path`` with the same content as the file at the same path
+    in ``previous_path`` are replaced with hard links to the previous file,
+    falling back to copying its modification time.
+
+    Returns:
+        Tuple of (manifest of ``new_path``, change manifest)
+    """
+    previous = {}
+    if previous_path.is_dir():
+        previous = hash_tree(previous_path, load_manifest(state_path), jobs=jobs)
+
+    current = hash_tree(new_path, jobs=jobs)
+    changes = {
+        "published_at": time.time(),
+        "added": [],
+        "modified": [],
+        "removed": sorted(set(previous) - set(current)),
+        "unchanged": 0,
+    }
+
+    for relative, entry in sorted(current.items()):
+        recorded = previous.get(relative)
+        if recorded is None:
+            changes["added"].append(relative)
+        elif recorded["sha256"] != entry["sha256"]:
+            changes["modified"].append(relative)
+        else:
+            _reuse(previous_path / relative, new_path / relative)
+            current[relative] = recorded
+            changes["unchanged"] += 1
+
+    return current, changes
+
+
+def write_state(state_path: Path, manifest: Dict, changes: Dict):
+    """Record the manifest and change manifest of a published build."""
+    state_path.mkdir(parents=True, exist_ok=True)
+    (state_path / MANIFEST_FILENAME).write_text(json.dumps(manifest, sort_keys=True))
+    (state_path / CHANGES_FILENAME).write_text(json.dumps(changes, indent=2))
+
+
+def summarize(changes: Dict) -> str:
+    return (
+        f"{len(changes['added'])} added, {len(changes['modified'])} modified, "
+        f"{len(changes['removed'])} removed, {changes['unchanged']} unchanged"
+    )
@@ -0,0 +1,131 @@
+"""Precompressed siblings for HTML build output.
+
+With precompression enabled, ``.gz`` and, when ``brotli`` is installed,
+``.br`` copies of text assets are written next to the originals before an
+html build is published, so static hosting can serve them without
+compressing on every request. Compressed copies are kept in a store under
+``target/bartleby-state`` addressed by the content hash of the original, and
+files unchanged since the last run reuse them instead of being compressed
+again.
+"""
+
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+from .changes import STATE_DIR, hash_file
+from .dedup import collect_garbage, get_store_path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PRECOMPRESS_ENV = "HMD_BARTLEBY_PRECOMPRESS"
+COMPRESSED_DIR = "compressed"
+MIN_SIZE = 1024
+COMPRESSIBLE_SUFFIXES = {
+    ".html",
+    ".htm",
+    ".css",
+    ".js",
+    ".json",
+    ".svg",
+    ".txt",
+    ".xml",
+    ".map",
+    ".ttf",
+    ".eot",
+    ".otf",
+}
+
+
+class CompressResult(NamedTuple):
+    files: int
+    compressed: int
+    reused: int
+
+
+def precompress_enabled() -> bool:
+    return os.environ.get(PRECOMPRESS_ENV, "false").lower() in ("true", "1", "yes")
+
+
+def get_encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    """Return the available encoders by file suffix."""
+    encoders = {".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoders[".br"] = lambda data: brotli.compress(data, quality=11)
+    return encoders
+
+
+def get_compressed_store_path(output_path: Path) -> Path:
+    return Path(output_path).parent / STATE_DIR / COMPRESSED_DIR
+
+
+def find_compressible_files(path: Path) -> List[Path]:
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            file_path = Path(root) / name
+            if (
+                file_path.suffix.lower() in COMPRESSIBLE_SUFFIXES
+                and not file_path.is_symlink()
+                and file_path.stat().st_size >= MIN_SIZE
+            ):
+                files.append(file_path)
+    return files
+
+
+def _compress_file(path: Path, store_path: Path, encoders: Dict) -> bool:
+    """Write the compressed siblings of ``path``.
+
+    Returns:
+        Whether any sibling had to be compressed rather than reused
+    """
+    file_hash = hash_file(path)
+    data = None
+    compressed = False
+    for suffix, encode in encoders.items():
+        sibling = path.with_name(path.name + suffix)
+        stored = store_path / file_hash[:2] / f"{file_hash}{suffix}"
+        if sibling.exists():
+            continue
+        try:
+            os.link(stored, sibling)
+            continue
+        except FileNotFoundError:
+            pass
+
+        if data is None:
+            data = path.read_bytes()
+        sibling.write_bytes(encode(data))
+        compressed = True
+        stored.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(sibling, stored)
+        except FileExistsError:
+            pass
+    return compressed
+
+
+def precompress_tree(path: Path, output_path: Path, jobs: int = None) -> CompressResult:
+    """Write compressed siblings for the text assets under ``path``.
+
+    Args:
+        path: The build output to compress, before it is published
+        output_path: The ``target/bartleby`` directory it is published to
+        jobs: Number of files compressed at once
+    """
+    store_path = get_compressed_store_path(output_path)
+    encoders = get_encoders()
+    files = find_compressible_files(path)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        compressed = sum(
+            executor.map(lambda f: _compress_file(f, store_path, encoders), files)
+        )
+
+    # Deduplication can hard-link compressed siblings into the asset store
+    collect_garbage(store_path, [get_store_path(output_path)])
+    return CompressResult(len(files), compressed, len(files) - compressed)
@@ -1,6 +1,8 @@
+import asyncio
 import json
 import os
 import shutil
+import time
 from importlib.metadata import version
 from typing import Any, Dict
 from cement import Controller, ex
@@ -126,6 +128,10 @@ BARTLEBY_PARAMETERS = {
 }
 
 
+def _get_image_name() -> str:
+    return f"{os.environ.get('HMD_CONTAINER_REGISTRY', 'ghcr.io/neuronsphere')}/hmd-tf-bartleby:{os.environ.get('HMD_TF_BARTLEBY_VERSION', 'stable')}"
+
+
 def _get_default_builder_config(shell: str):
     prefix = f"HMD_BARTLEBY__{shell.upper()}__"
     config = {}
@@ -382,29 +388,427 @@ class LocalController(Controller):
                     "default": "all",
                 },
             ),
+            (
+                ["-j", "--jobs"],
+                {
+                    "action": "store",
+                    "dest": "jobs",
+                    "type": int,
+                    "help": "The number of builds to run concurrently. Output of each build is "
+                    "prefixed with its root and shell and logged to target/bartleby/logs.",
+                    "default": 1,
+                },
+            ),
+            (
+                ["--memory-budget"],
+                {
+                    "action": "store",
+                    "dest": "memory_budget",
+                    "type": int,
+                    "help": "The total memory in MB that concurrent builds may use, based on the "
+                    "peak memory recorded for previous builds.",
+                    "default": None,
+                },
+            ),
+            (
+                ["--docker-hosts"],
+                {
+                    "action": "store",
+                    "dest": "docker_hosts",
+                    "help": "Comma-separated DOCKER_HOST endpoints to distribute builds across, each "
+                    "with an optional '=N' concurrency limit, e.g. 'tcp://builder:2375=4'. "
+                    "Defaults to HMD_BARTLEBY_DOCKER_HOSTS.",
+                    "default": None,
+                },
+            ),
+            (
+                ["--runner"],
+                {
+                    "action": "store",
+                    "dest": "runner",
+                    "choices": ["docker", "local"],
+                    "help": "Run builds in the transform container or, with 'local', with the "
+                    "transform installed on the host without Docker.",
+                    "default": "docker",
+                },
+            ),
+            (
+                ["--build-cache"],
+                {
+                    "action": "store",
+                    "dest": "build_cache",
+                    "help": "Shared build cache to restore unchanged builds from and store new "
+                    "builds in: a directory, an http(s):// URL accepting GET and PUT, or "
+                    "s3://bucket/prefix. Defaults to HMD_BARTLEBY_BUILD_CACHE.",
+                    "default": None,
+                },
+            ),
+            (
+                ["--full-context"],
+                {
+                    "action": "store_true",
+                    "dest": "full_context",
+                    "help": "Mount the whole repository into the transform instead of only "
+                    "docs, meta-data and, with autodoc, src/python.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--tmpfs-size"],
+                {
+                    "action": "store",
+                    "dest": "tmpfs_size",
+                    "help": "Write intermediate build files to a tmpfs of this size, e.g. 2g, "
+                    "instead of disk. Defaults to HMD_BARTLEBY_TMPFS_SIZE.",
+                    "default": None,
+                },
+            ),
+            (
+                ["--optimize-images"],
+                {
+                    "action": "store_true",
+                    "dest": "optimize_images",
+                    "help": "Resize and recompress PNG and JPEG images in docs before building, "
+                    "within HMD_BARTLEBY_IMAGE_MAX_SIZE and HMD_BARTLEBY_IMAGE_QUALITY. "
+                    "Requires Pillow.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--prerender-uml"],
+                {
+                    "action": "store_true",
+                    "dest": "prerender_uml",
+                    "help": "Render inline uml diagrams once on the host before building, "
+                    "caching the images by diagram source for all builders.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--no-preflight"],
+                {
+                    "action": "store_true",
+                    "dest": "no_preflight",
+                    "help": "Skip checking toctree, include and image references before "
+                    "starting builds.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--no-dedup"],
+                {
+                    "action": "store_true",
+                    "dest": "no_dedup",
+                    "help": "Skip hard-linking identical assets across the build output.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--precompress"],
+                {
+                    "action": "store_true",
+                    "dest": "precompress",
+                    "help": "Write .gz and, with brotli installed, .br copies of text assets "
+                    "next to html output. Defaults to HMD_BARTLEBY_PRECOMPRESS.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--shard-search-index"],
+                {
+                    "action": "store_true",
+                    "dest": "shard_search_index",
+                    "help": "Split the html search index into shards loaded on demand for the "
+                    "words searched. Defaults to HMD_BARTLEBY_SHARD_SEARCH_INDEX.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--pdf-chapters"],
+                {
+                    "action": "store_true",
+                    "dest": "pdf_chapters",
+                    "help": "Render each top-level toctree entry of a pdf root as a separate "
+                    "build and merge the chapters. Use with -j to render chapters in parallel. "
+                    "Requires pypdf.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--venv-cache"],
+                {
+                    "action": "store_true",
+                    "dest": "venv_cache",
+                    "help": "Reuse a virtual environment for autodoc builds while the requirements "
+                    "of the documented packages and the image are unchanged. The image must "
+                    "install into the environment named by BARTLEBY_VENV.",
+                    "default": False,
+                },
+            ),
             *[param["arg"] for _, param in BARTLEBY_PARAMETERS.items()],
         )
 
+    def _execute_builds(self, builds):
+        from .distributed import get_docker_hosts
+        from .scheduler import BuildHistory
+
+        jobs = self.app.pargs.jobs
+        docker_hosts = get_docker_hosts(self.app.pargs.docker_hosts)
+        history = BuildHistory.open_default()
+
+        try:
+            if (
+                docker_hosts
+                or self.app.pargs.runner == "local"
+                or (jobs > 1 and len(builds) > 1)
+            ):
+                transforms = [
+                    self._get_transform_args(
+                        build["name"],
+                        build["shell"],
+                        build["root_doc"],
+                        build["config"],
+                    )
+                    for build in builds
+                ]
+
+            if self.app.pargs.runner == "local":
+                from .local_runner import run_local
+
+                results = run_local(transforms, jobs=jobs, history=history)
+                return [result.success for result in results]
+
+            if docker_hosts:
+                from .distributed import run_distributed
+
+                results = asyncio.run(
+                    run_distributed(transforms, docker_hosts, history=history)
+                )
+                return [result.success for result in results]
+
+            if jobs > 1 and len(builds) > 1:
+                from .runner import run_transforms
+
+                results = asyncio.run(
+                    run_transforms(
+                        transforms,
+                        jobs=jobs,
+                        memory_budget=self.app.pargs.memory_budget,
+                        history=history,
+                    )
+                )
+                return [result.success for result in results]
+
+            results = []
+            for build in builds:
+                start = time.monotonic()
+                success = self._run_transform(
+                    build["name"], build["shell"], build["root_doc"], build["config"]
+                )
+                history.record(
+                    build["name"],
+                    build["shell"],
+                    time.monotonic() - start,
+                    success=success is not False,
+                )
+                results.append(success is not False)
+            return results
+        finally:
+            history.close()
+
+    def _execute_cached_builds(self, builds):
+        from .remote_cache import get_cache_backend
+
+        backend = get_cache_backend(self.app.pargs.build_cache)
+        if backend is None or len(self.app.pargs.gather) > 0:
+            return self._execute_builds(builds)
+
+        from .build_cache import InputHasher, hash_inputs
+        from .remote_cache import RemoteBuildCache, get_image_digest, get_remote_key
+
+        image_digest = get_image_digest(_get_image_name(), self.app.pargs.runner)
+        if image_digest is None:
+            print(
+                "Build cache skipped: the transform has no immutable id to key "
+                "builds on. Pull the image first to use the cache."
+            )
+            return self._execute_builds(builds)
+
+        cache = RemoteBuildCache(backend)
+        repo_path = Path(os.getcwd())
+        input_hash = hash_inputs(
+            repo_path,
+            self.app.pargs.autodoc,
+            _get_sources(read_manifest()),
+            InputHasher(),
+            full_context=self.app.pargs.full_context,
+        )
+
+        keys = []
+        results = {}
+        for index, build in enumerate(builds):
+            args = self._get_transform_args(
+                build["name"], build["shell"], build["root_doc"], build["config"]
+            )
+            keys.append(get_remote_key(input_hash, args, image_digest))
+            if cache.restore(keys[index], build["name"], build["shell"]):
+                results[index] = True
+
+        pending = [i for i in range(len(builds)) if i not in results]
+        if pending:
+            built = self._execute_builds([builds[i] for i in pending])
+            for index, success in zip(pending, built):
+                results[index] = success
+                if success:
+                    cache.store(
+                        keys[index], builds[index]["name"], builds[index]["shell"]
+                    )
+
+        return [results[i] for i in range(len(builds))]
+
+    def _build_docs_view(self):
+        """Build the docs view with optimized images and pre-rendered diagrams.
+
+        Does nothing unless ``--optimize-images`` or ``--prerender-uml`` is set.
+        """
+        optimize_images = self.app.pargs.optimize_images
+        prerender_uml = self.app.pargs.prerender_uml
+        if not (optimize_images or prerender_uml):
+            return
+
+        from .dedup import format_size
+        from .images import build_overlay, check_pillow, get_overlay_path
+
+        if optimize_images:
+            check_pillow()
+        overlay_path = get_overlay_path()
+        overlay = build_overlay(
+            Path(os.getcwd()) / "docs", overlay_path, optimize=optimize_images
+        )
+        if optimize_images:
+            print(
+                f"Optimized {overlay.optimized} of {overlay.images} images, "
+                f"saving {format_size(overlay.bytes_saved)}"
+            )
+
+        if prerender_uml:
+            from .uml import prerender_uml as render
+
+            uml = render(overlay_path, _get_image_name(), jobs=self.app.pargs.jobs)
+            print(
+                f"Pre-rendered {uml.diagrams} inline diagrams in {uml.documents} "
+                f"documents, {uml.rendered} not cached"
+            )
+
+    def _execute_chapter_builds(self, builds):
+        from .pdf_chapters import (
+            check_pypdf,
+            merge_chapters,
+            plan_chapters,
+            remove_chapter_roots,
+        )
+
+        check_pypdf()
+        docs_path = Path(os.getcwd()) / "docs"
+        plans = []
+        expanded = []
+        try:
+            for build in builds:
+                plan = (
+                    plan_chapters(docs_path, build) if build["shell"] == "pdf" else None
+                )
+                plans.append((plan, len(expanded)))
+                expanded.extend([c.build for c in plan.chapters] if plan else [build])
+
+            # The docs view must include the generated chapter roots
+            self._build_docs_view()
+            expanded_results = self._execute_cached_builds(expanded)
+        finally:
+            remove_chapter_roots(docs_path)
+
+        results = []
+        for plan, start in plans:
+            if plan is None:
+                results.append(expanded_results[start])
+                continue
+
+            success = all(expanded_results[start : start + len(plan.chapters)])
+            if success:
+                try:
+                    merged = merge_chapters(plan)
+                    print(
+                        f"[{plan.build['name']}/pdf] Merged {len(plan.chapters)} "
+                        f"chapters into {merged}"
+                    )
+                except Exception as e:
+                    print(f"[{plan.build['name']}/pdf] Unable to merge chapters: {e}")
+                    success = False
+            results.append(success)
+
+        return results
+
+    def _preflight_and_execute(self, builds):
+        # Gathered docs are part of the input, so they are copied in once
+        # before validation and input hashing see the docs directory
+        if self.app.pargs.gather:
+            gather_repos(self.app.pargs.gather)
+
+        if not self.app.pargs.no_preflight:
+            from .validate import validate_docs
+
+            errors = validate_docs(
+                Path(os.getcwd()) / "docs", [build["root_doc"] for build in builds]
+            )
+            if errors:
+                for error in errors:
+                    print(f"Error: {error}")
+                raise SystemExit(
+                    f"Error: pre-flight validation found {len(errors)} broken "
+                    f"reference(s). Use --no-preflight to build anyway."
+                )
+
+        if self.app.pargs.pdf_chapters:
+            results = self._execute_chapter_builds(builds)
+        else:
+            self._build_docs_view()
+            results = self._execute_cached_builds(builds)
+
+        if any(results or []) and not self.app.pargs.no_dedup:
+            from .dedup import dedup_output, format_size
+
+            output_path = Path(os.getcwd()) / "target" / "bartleby"
+            dedup = dedup_output(output_path)
+            print(
+                f"Deduplicated {dedup.linked} of {dedup.files} assets in {output_path}, "
+                f"saving {format_size(dedup.bytes_saved)}"
+            )
+
+        return results
+
+    def _check_tmpfs_size(self):
+        from .hmd_cli_bartleby import TMPFS_SIZE_ENV, parse_size
+
+        tmpfs_size = self.app.pargs.tmpfs_size or os.environ.get(TMPFS_SIZE_ENV)
+        if tmpfs_size:
+            try:
+                parse_size(tmpfs_size)
+            except ValueError as e:
+                raise SystemExit(f"Error: --tmpfs-size or {TMPFS_SIZE_ENV}: {e}")
+
     def _run_builds(self, builds):
+        self._check_tmpfs_size()
+
         repo_path = Path(os.getcwd())
         docs_path = repo_path / "docs"
         manifest = read_manifest()
         sources = _get_sources(manifest)
 
         if not sources:
-            for build in builds:
-                self._run_transform(
-                    build["name"], build["shell"], build["root_doc"], build["config"]
-                )
-            return
+            return self._preflight_and_execute(builds)
 
         valid_sources = _validate_source_paths(repo_path, docs_path, sources)
         if not valid_sources:
-            for build in builds:
-                self._run_transform(
-                    build["name"], build["shell"], build["root_doc"], build["config"]
-                )
-            return
+            return self._preflight_and_execute(builds)
 
         _stage_sources(repo_path, docs_path, valid_sources)
 
@@ -418,10 +822,7 @@ class LocalController(Controller):
                     originals[index_path] = original
 
         try:
-            for build in builds:
-                self._run_transform(
-                    build["name"], build["shell"], build["root_doc"], build["config"]
-                )
+            return self._preflight_and_execute(builds)
         finally:
             for index_path, original in originals.items():
                 _restore_index(index_path, original)
@@ -496,7 +897,12 @@ class LocalController(Controller):
 
         return tf_ctxs
 
-    def _run_transform(self, doc_name: str, shell: str, root_doc: str, config: dict):
+    def _get_transform_args(
+        self, doc_name: str, shell: str, root_doc: str, config: dict
+    ) -> dict:
+        from .compress import precompress_enabled
+        from .search_index import shard_search_enabled
+
         args = {}
         name = self.app.pargs.repo_name
         repo_version = self.app.pargs.repo_version
@@ -529,10 +935,9 @@ class LocalController(Controller):
             )
 
         if len(gather) > 0:
-            gather_repos(gather)
             args.update({"gather": gather})
 
-        image_name = f"{os.environ.get('HMD_CONTAINER_REGISTRY', 'ghcr.io/neuronsphere')}/hmd-tf-bartleby:{os.environ.get('HMD_TF_BARTLEBY_VERSION', 'stable')}"
+        image_name = _get_image_name()
 
         transform_instance_context = {
             "name": doc_name,
@@ -554,12 +959,23 @@ class LocalController(Controller):
                 "pdf_default_logo": pdf_default_logo,
                 "document_title": self.app.pargs.document_title,
                 "timestamp_title": self.app.pargs.timestamp_title,
+                "venv_cache": self.app.pargs.venv_cache,
+                "full_context": self.app.pargs.full_context,
+                "tmpfs_size": self.app.pargs.tmpfs_size,
+                "optimize_images": self.app.pargs.optimize_images,
+                "prerender_uml": self.app.pargs.prerender_uml,
+                "precompress": self.app.pargs.precompress or precompress_enabled(),
+                "shard_search_index": self.app.pargs.shard_search_index
+                or shard_search_enabled(),
             }
         )
 
+        return args
+
+    def _run_transform(self, doc_name: str, shell: str, root_doc: str, config: dict):
         from .hmd_cli_bartleby import transform
 
-        transform(**args)
+        return transform(**self._get_transform_args(doc_name, shell, root_doc, config))
 
     @ex(help="Render HTML documentation", arguments=[])
     def html(self):
@@ -596,7 +1012,7 @@ class LocalController(Controller):
 
         input_path = Path(os.getcwd()) / "docs"
         output_path = Path(os.getcwd()) / "target" / "bartleby" / "puml_images"
-        image_name = f"{os.environ.get('HMD_CONTAINER_REGISTRY', 'ghcr.io/neuronsphere')}/hmd-tf-bartleby:{os.environ.get('HMD_TF_BARTLEBY_VERSION', 'stable')}"
+        image_name = _get_image_name()
 
         if not output_path.exists():
             os.makedirs(output_path)
@@ -612,6 +1028,106 @@ class LocalController(Controller):
                         "No puml files found in the docs folder of the current directory."
                     )
 
+    @ex(
+        help="Run a local build server that queues and coalesces build requests",
+        arguments=[
+            (
+                ["--port"],
+                {
+                    "action": "store",
+                    "dest": "port",
+                    "type": int,
+                    "help": "The localhost port to listen on.",
+                    "default": 8765,
+                },
+            ),
+            (
+                ["--socket"],
+                {
+                    "action": "store",
+                    "dest": "socket",
+                    "help": "A Unix socket path to listen on instead of a TCP port.",
+                    "default": None,
+                },
+            ),
+        ],
+    )
+    def serve(self):
+        load_hmd_env(override=False)
+        from .server import BuildServer, make_http_server
+
+        build_server = BuildServer(self, _get_image_name())
+        build_server.warm()
+        build_server.start()
+
+        httpd = make_http_server(
+            build_server, port=self.app.pargs.port, socket_path=self.app.pargs.socket
+        )
+        print(
+            f"Bartleby build server listening on "
+            f"{self.app.pargs.socket or f'http://127.0.0.1:{self.app.pargs.port}'}"
+        )
+
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            build_server.stop()
+            if self.app.pargs.socket and os.path.exists(self.app.pargs.socket):
+                os.remove(self.app.pargs.socket)
+
+    @ex(
+        help="Upload changed build output to S3-compatible storage",
+        arguments=[
+            (
+                ["destination"],
+                {
+                    "action": "store",
+                    "nargs": "?",
+                    "help": "The s3://bucket/prefix to publish to. Defaults to "
+                    "HMD_BARTLEBY_PUBLISH_URL.",
+                    "default": None,
+                },
+            ),
+            (
+                ["--delete"],
+                {
+                    "action": "store_true",
+                    "dest": "delete",
+                    "help": "Remove published objects no longer in the build output.",
+                    "default": False,
+                },
+            ),
+            (
+                ["--uploads"],
+                {
+                    "action": "store",
+                    "dest": "uploads",
+                    "type": int,
+                    "help": "The number of files to upload concurrently.",
+                    "default": 8,
+                },
+            ),
+        ],
+    )
+    def publish(self):
+        load_hmd_env(override=False)
+        from .publish import S3Publisher, parse_destination
+
+        output_path = Path(os.getcwd()) / "target" / "bartleby"
+        if not output_path.is_dir():
+            raise SystemExit(f"Error: no build output found at {output_path}.")
+
+        bucket, prefix = parse_destination(self.app.pargs.destination)
+        publisher = S3Publisher(bucket, prefix, jobs=self.app.pargs.uploads)
+        result = publisher.publish(output_path, delete=self.app.pargs.delete)
+        print(
+            f"Published to s3://{bucket}/{prefix}: {len(result.uploaded)} uploaded, "
+            f"{len(result.deleted)} deleted, {result.unchanged} unchanged"
+        )
+
     @ex(help="Configure Bartleby environment variables", arguments=[])
     def configure(self):
         load_hmd_env()
@@ -0,0 +1,160 @@
+"""Content-addressed deduplication of static assets in the build output.
+
+Every root and builder gets its own copy of theme files, logos and global
+styles. After builds are published, identical assets across
+``target/bartleby`` are hard-linked to a single copy kept in a store
+addressed by content hash, so each asset is stored once on disk.
+"""
+
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from .changes import STATE_DIR, hash_file
+
+ASSETS_DIR = "assets"
+ASSET_DIRS = {"_static", "_images", "_downloads"}
+ASSET_SUFFIXES = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".ico",
+    ".webp",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".eot",
+    ".otf",
+    ".css",
+    ".js",
+    ".map",
+}
+
+
+class DedupResult(NamedTuple):
+    files: int
+    linked: int
+    bytes_saved: int
+
+
+def get_store_path(output_path: Path) -> Path:
+    return Path(output_path).parent / STATE_DIR / ASSETS_DIR
+
+
+def is_asset(relative: Path) -> bool:
+    return relative.suffix.lower() in ASSET_SUFFIXES or any(
+        part in ASSET_DIRS for part in relative.parts[:-1]
+    )
+
+
+def find_assets(output_path: Path) -> List[Path]:
+    assets = []
+    for root, _, names in os.walk(output_path):
+        for name in names:
+            path = Path(root) / name
+            if not path.is_symlink() and is_asset(path.relative_to(output_path)):
+                assets.append(path)
+    return assets
+
+
+def _hash_assets(assets: List[Path], jobs: int = None) -> Dict[Path, Tuple[str, int]]:
+    """Hash every asset, reading files that are already linked only once."""
+    by_inode: Dict[Tuple[int, int], List[Path]] = {}
+    sizes = {}
+    for path in assets:
+        stat = path.stat()
+        by_inode.setdefault((stat.st_dev, stat.st_ino), []).append(path)
+        sizes[path] = stat.st_size
+
+    inodes = list(by_inode.values())
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        hashes = executor.map(hash_file, [paths[0] for paths in inodes])
+        return {
+            path: (file_hash, sizes[path])
+            for paths, file_hash in zip(inodes, hashes)
+            for path in paths
+        }
+
+
+def _link(source: Path, dest: Path):
+    temp_path = dest.with_name(f".{dest.name}.dedup")
+    os.link(source, temp_path)
+    os.replace(temp_path, dest)
+
+
+def _count_store_links(store_paths: List[Path]) -> Counter:
+    links = Counter()
+    for store_path in store_paths:
+        for stored in Path(store_path).glob("*/*"):
+            stat = stored.stat()
+            links[(stat.st_dev, stat.st_ino)] += 1
+    return links
+
+
+def collect_garbage(store_path: Path, linked_stores: List[Path] = ()) -> int:
+    """Remove stored assets no longer used by any output file.
+
+    ``linked_stores`` are other stores that can hold hard links to the same
+    files, such as deduplicated compressed siblings. Their links are not
+    counted as uses, so a file only kept by the stores is removed from each.
+    """
+    removed = 0
+    if not store_path.is_dir():
+        return removed
+    store_links = _count_store_links([store_path, *linked_stores])
+    for stored in store_path.glob("*/*"):
+        stat = stored.stat()
+        if stat.st_nlink <= store_links[(stat.st_dev, stat.st_ino)]:
+            stored.unlink()
+            removed += 1
+    return removed
+
+
+def dedup_output(output_path: Path, jobs: int = None) -> DedupResult:
+    """Hard-link identical assets under ``output_path`` to one stored copy.
+
+    Returns:
+        The number of assets, how many were newly linked and the bytes
+        saved by sharing copies
+    """
+    store_path = get_store_path(output_path)
+    assets = find_assets(output_path)
+    hashes = _hash_assets(assets, jobs=jobs)
+
+    linked = 0
+    seen = set()
+    bytes_saved = 0
+    for path in assets:
+        file_hash, size = hashes[path]
+        stored = store_path / file_hash[:2] / file_hash
+        try:
+            if stored.exists():
+                if not os.path.samefile(stored, path):
+                    _link(stored, path)
+                    linked += 1
+            else:
+                stored.parent.mkdir(parents=True, exist_ok=True)
+                os.link(path, stored)
+        except OSError as e:
+            print(f"Unable to deduplicate {path}: {e}")
+            continue
+
+        if file_hash in seen:
+            bytes_saved += size
+        seen.add(file_hash)
+
+    from .compress import get_compressed_store_path
+
+    collect_garbage(store_path, [get_compressed_store_path(output_path)])
+    return DedupResult(len(assets), linked, bytes_saved)
+
+
+def format_size(size: int) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
@@ -0,0 +1,313 @@
+"""Distributed execution of bartleby builds across several Docker hosts.
+
+Builds are pulled from a shared queue by every configured ``DOCKER_HOST``
+endpoint, up to a per-host concurrency limit. Remote daemons cannot see the
+local filesystem, so instead of bind mounts the inputs are shipped into the
+container as tar streams and the rendered output is pulled back the same
+way.
+"""
+
+import asyncio
+import os
+import posixpath
+import subprocess
+import tarfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .hmd_cli_bartleby import (
+    FONT_CACHE_TARGET,
+    LATEX_CACHE_TARGET,
+    PIP_CACHE_TARGET,
+    VENV_TARGET,
+    get_build_id,
+    transform_config,
+)
+from .output import (
+    OUTPUT_TARGET,
+    get_staging_path,
+    publish_build,
+    split_publish_options,
+)
+from .runner import BuildResult, get_logs_path, run_transforms, stream_command
+from .scheduler import BuildHistory
+
+DOCKER_HOSTS_ENV = "HMD_BARTLEBY_DOCKER_HOSTS"
+REMOTE_SECRETS_DIR = "/hmd_transform/secrets"
+EXCLUDED_INPUTS = [".git"]
+# Local caches are not worth shipping to a remote daemon
+LOCAL_ONLY_TARGETS = [
+    PIP_CACHE_TARGET,
+    VENV_TARGET,
+    LATEX_CACHE_TARGET,
+    FONT_CACHE_TARGET,
+]
+LOCAL_ONLY_ENV_VARS = [
+    "PIP_CACHE_DIR",
+    "BARTLEBY_VENV",
+    "BARTLEBY_LATEX_CACHE",
+    "XDG_CACHE_HOME",
+    "TEXMFVAR",
+]
+
+
+def parse_docker_hosts(value: Optional[str]) -> List[Tuple[str, int]]:
+    """Parse a comma-separated list of Docker hosts.
+
+    Each entry is a ``DOCKER_HOST`` value with an optional ``=N`` suffix
+    giving the number of builds the host runs at once, e.g.
+    ``tcp://builder-1:2375=4,ssh://builder-2``.
+
+    Returns:
+        List of (host, concurrency) tuples
+    """
+    hosts = []
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, concurrency = entry.rpartition("=")
+        if host and concurrency.isdigit():
+            hosts.append((host, max(1, int(concurrency))))
+        else:
+            hosts.append((entry, 1))
+    return hosts
+
+
+def get_docker_hosts(value: Optional[str] = None) -> List[Tuple[str, int]]:
+    """Return the configured Docker hosts, falling back to the environment."""
+    return parse_docker_hosts(value or os.environ.get(DOCKER_HOSTS_ENV))
+
+
+def get_container_args(compose: Dict) -> Tuple[List[str], List[Dict]]:
+    """Translate a transform compose file into ``docker create`` arguments.
+
+    Bind mounts and secrets cannot be used on a remote daemon, so they are
+    returned as copies to make into the container instead.
+
+    Returns:
+        Tuple of (``docker create`` arguments, copies) where each copy has a
+        local ``source`` and a container ``target``
+    """
+    service = compose["services"]["bartleby_transform"]
+    environment = dict(service["environment"])
+    copies = []
+
+    for secret in service.get("secrets", []):
+        target = posixpath.join(REMOTE_SECRETS_DIR, secret)
+        copies.append({"source": compose["secrets"][secret]["file"], "target": target})
+        for key, value in environment.items():
+            if value == f"/run/secrets/{secret}":
+                environment[key] = target
+
+    for key in LOCAL_ONLY_ENV_VARS:
+        environment.pop(key, None)
+
+    args = ["--name", service["container_name"]]
+    for key, value in environment.items():
+        if value is not None:
+            args += ["-e", f"{key}={value}"]
+
+    for volume in service["volumes"]:
+        if volume.get("type") == "tmpfs":
+            args += ["--tmpfs", f"{volume['target']}:size={volume['tmpfs']['size']}"]
+        elif volume["target"] not in [OUTPUT_TARGET, *LOCAL_ONLY_TARGETS]:
+            copies.append({"source": volume["source"], "target": volume["target"]})
+
+    args.append(service["image"])
+    return args, copies
+
+
+def _tar_filter(source: Path, arcname: str, exclude: List[Path]):
+    excluded = {
+        posixpath.join(arcname, Path(os.path.relpath(p, source)).as_posix())
+        for p in exclude
+    }
+
+    def tar_filter(tarinfo: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        return None if tarinfo.name in excluded else tarinfo
+
+    return tar_filter
+
+
+def write_copies(fileobj, copies: List[Dict], exclude: List[Path] = ()):
+    """Write copies as a single tar archive rooted at the container's ``/``.
+
+    Entries use the full container path of each target, and the parent
+    directories are added first, since a new container does not have them.
+    """
+    added = set()
+    with tarfile.open(fileobj=fileobj, mode="w|") as tar:
+        for copy in copies:
+            arcname = copy["target"].strip("/")
+            parts = arcname.split("/")[:-1]
+            for depth in range(1, len(parts) + 1):
+                parent = "/".join(parts[:depth])
+                if parent not in added:
+                    info = tarfile.TarInfo(parent)
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    info.mtime = int(time.time())
+                    tar.addfile(info)
+                    added.add(parent)
+            tar.add(
+                copy["source"],
+                arcname=arcname,
+                filter=_tar_filter(Path(copy["source"]), arcname, list(exclude)),
+            )
+
+
+def copy_into_container(
+    env: Dict, container: str, copies: List[Dict], exclude: List[Path] = ()
+):
+    """Stream the copies into a container as one tar archive."""
+    process = subprocess.Popen(
+        ["docker", "cp", "-", f"{container}:/"],
+        stdin=subprocess.PIPE,
+        env=env,
+    )
+    try:
+        write_copies(process.stdin, copies, exclude)
+    finally:
+        process.stdin.close()
+
+    return_code = process.wait()
+    if return_code != 0:
+        raise Exception(
+            f"Copying inputs into {container} completed with non-zero exit code: "
+            f"{return_code}"
+        )
+
+
+def copy_from_container(env: Dict, container: str, source: str, dest: Path):
+    """Stream the contents of ``source`` in a container into ``dest``."""
+    dest.mkdir(parents=True, exist_ok=True)
+    process = subprocess.Popen(
+        ["docker", "cp", f"{container}:{source}/.", "-"],
+        stdout=subprocess.PIPE,
+        env=env,
+    )
+    with tarfile.open(fileobj=process.stdout, mode="r|") as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(dest, filter="data")
+        else:
+            tar.extractall(dest)
+
+    return_code = process.wait()
+    if return_code != 0:
+        raise Exception(
+            f"Copying output from {container} completed with non-zero exit code: "
+            f"{return_code}"
+        )
+
+
+async def transform_remote(host: str, **transform_args) -> BuildResult:
+    """Run a single transform on the Docker daemon at ``host``.
+
+    See :func:`transform` for the arguments.
+    """
+    transform_instance_context = transform_args["transform_instance_context"]
+    prefix = (
+        f"{transform_instance_context.get('name', '')}/"
+        f"{transform_instance_context['shell']}@{host}"
+    )
+    build_id = get_build_id(transform_instance_context)
+    log_path = get_logs_path() / f"{build_id}.log"
+    env = {**os.environ, "DOCKER_HOST": host}
+    transform_args, publish_options = split_publish_options(transform_args)
+    start = time.monotonic()
+    target_path = Path(os.getcwd()) / "target"
+
+    try:
+        with transform_config(**transform_args, build_id=build_id) as (_, compose):
+            args, copies = get_container_args(compose)
+            container = args[1]
+
+            await stream_command(
+                ["docker", "rm", "-f", container],
+                prefix,
+                log_path.with_suffix(".rm.log"),
+                env=env,
+            )
+            return_code = await stream_command(
+                ["docker", "create", *args], prefix, log_path, env=env
+            )
+            if return_code != 0:
+                raise Exception(
+                    f"Creating container completed with non-zero exit code: {return_code}"
+                )
+
+            try:
+                exclude = [
+                    Path(copy["source"]) / name
+                    for copy in copies
+                    for name in EXCLUDED_INPUTS
+                ]
+                exclude.append(target_path)
+                await asyncio.to_thread(
+                    copy_into_container, env, container, copies, exclude
+                )
+
+                return_code = await stream_command(
+                    ["docker", "start", "--attach", container],
+                    prefix,
+                    log_path,
+                    env=env,
+                )
+                if return_code != 0:
+                    raise Exception(
+                        f"Process completed with non-zero exit code: {return_code}"
+                    )
+
+                await asyncio.to_thread(
+                    copy_from_container,
+                    env,
+                    container,
+                    OUTPUT_TARGET,
+                    get_staging_path(compose),
+                )
+                publish_build(compose, transform_instance_context, **publish_options)
+            finally:
+                await stream_command(
+                    ["docker", "rm", "-f", container],
+                    prefix,
+                    log_path.with_suffix(".rm.log"),
+                    env=env,
+                )
+
+    except Exception as e:
+        print(f"[{prefix}] Exception occurred running: {e}")
+        return BuildResult(False, time.monotonic() - start)
+
+    return BuildResult(True, time.monotonic() - start)
+
+
+async def run_distributed(
+    transforms: List[Dict],
+    hosts: List[Tuple[str, int]],
+    history: Optional[BuildHistory] = None,
+) -> List[BuildResult]:
+    """Run transforms across a pool of Docker hosts.
+
+    Each host runs at most its configured number of builds at once and
+    picks up the next build as soon as it has a free slot.
+
+    Returns:
+        The result of each build, in the order given
+    """
+    pool: "asyncio.Queue[str]" = asyncio.Queue()
+    for host, concurrency in hosts:
+        for _ in range(concurrency):
+            pool.put_nowait(host)
+
+    async def run_on_host(**transform_args) -> BuildResult:
+        host = await pool.get()
+        try:
+            return await transform_remote(host, **transform_args)
+        finally:
+            pool.put_nowait(host)
+
+    return await run_transforms(
+        transforms, jobs=pool.qsize(), history=history, run_one=run_on_host
+    )
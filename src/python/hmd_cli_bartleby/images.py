@@ -0,0 +1,183 @@
+"""Host-side optimization of raster images in the docs.
+
+Before builds start, a view of ``docs`` is assembled in
+``target/bartleby-docs`` with hard links to the original files, except for
+PNG and JPEG images, which are replaced by copies resized to the configured
+limits and recompressed with Pillow. The view is mounted as the docs
+directory of the transform. Optimized images are cached by the hash of the
+source image and the settings used, and missing ones are produced in
+parallel worker processes.
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, NamedTuple
+
+from .cache import get_cache_path
+from .changes import STATE_DIR, hash_tree
+
+OVERLAY_DIR = "bartleby-docs"
+IMAGES_MANIFEST = "images.json"
+IMAGE_MAX_SIZE_ENV = "HMD_BARTLEBY_IMAGE_MAX_SIZE"
+IMAGE_QUALITY_ENV = "HMD_BARTLEBY_IMAGE_QUALITY"
+DEFAULT_MAX_SIZE = 2000
+DEFAULT_QUALITY = 85
+IMAGE_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG"}
+
+
+class ImageSettings(NamedTuple):
+    max_size: int
+    quality: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.max_size}-{self.quality}"
+
+
+class OverlayResult(NamedTuple):
+    images: int
+    optimized: int
+    bytes_saved: int
+
+
+def check_pillow():
+    """Make sure Pillow is available to optimize images.
+
+    Raises:
+        SystemExit: If Pillow is not installed
+    """
+    if importlib.util.find_spec("PIL") is None:
+        raise SystemExit(
+            "Error: image optimization needs Pillow. Install it with "
+            "'pip install hmd-cli-bartleby[images]'."
+        )
+
+
+def get_image_settings() -> ImageSettings:
+    return ImageSettings(
+        int(os.environ.get(IMAGE_MAX_SIZE_ENV, DEFAULT_MAX_SIZE)),
+        int(os.environ.get(IMAGE_QUALITY_ENV, DEFAULT_QUALITY)),
+    )
+
+
+def get_overlay_path(repo_path: Path = None) -> Path:
+    return Path(repo_path or os.getcwd()) / "target" / OVERLAY_DIR
+
+
+def optimize_image(source: Path, dest: Path, settings: ImageSettings) -> bool:
+    """Write a resized and recompressed copy of ``source`` to ``dest``.
+
+    The resolution recorded in the image is scaled with it so the printed
+    size does not change.
+
+    Returns:
+        Whether the copy is smaller than the original
+    """
+    from PIL import Image
+
+    image_format = IMAGE_FORMATS[source.suffix.lower()]
+    with Image.open(source) as image:
+        width = image.width
+        image.thumbnail((settings.max_size, settings.max_size))
+        options = {"optimize": True}
+        if "dpi" in image.info:
+            scale = image.width / width
+            options["dpi"] = tuple(d * scale for d in image.info["dpi"])
+        if image_format == "JPEG":
+            options.update(quality=settings.quality, progressive=True)
+        temp_path = dest.with_name(f".{dest.name}.{os.getpid()}")
+        image.save(temp_path, image_format, **options)
+
+    if temp_path.stat().st_size >= source.stat().st_size:
+        temp_path.unlink()
+        return False
+    os.replace(temp_path, dest)
+    return True
+
+
+def _optimize(source: Path, dest: Path, settings: ImageSettings) -> bool:
+    try:
+        return optimize_image(source, dest, settings)
+    except Exception as e:
+        print(f"Unable to optimize {source}: {e}")
+        return False
+
+
+def _link(source: Path, dest: Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+
+def build_overlay(
+    docs_path: Path, overlay_path: Path, jobs: int = None, optimize: bool = True
+) -> OverlayResult:
+    """Assemble the docs view with optimized images.
+
+    Without ``optimize`` every file of the view links to its original, for
+    callers that only need a view to rewrite.
+
+    Returns:
+        The number of images, how many were replaced by optimized copies and
+        the bytes saved
+    """
+    settings = get_image_settings()
+    cache_path = get_cache_path("images", settings.key)
+    cache_path.mkdir(exist_ok=True)
+
+    state_file = overlay_path.parent / STATE_DIR / IMAGES_MANIFEST
+    try:
+        previous = json.loads(state_file.read_text())
+    except (OSError, ValueError):
+        previous = {}
+    manifest = hash_tree(docs_path, previous, jobs=jobs)
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state_file.write_text(json.dumps(manifest, sort_keys=True))
+
+    images: Dict[str, Path] = {}
+    for relative, entry in manifest.items():
+        suffix = Path(relative).suffix.lower()
+        if optimize and suffix in IMAGE_FORMATS:
+            images[relative] = cache_path / f"{entry['sha256']}{suffix}"
+
+    missing = {
+        relative: cached
+        for relative, cached in images.items()
+        if not cached.exists()
+        and not cached.with_name(cached.name + ".original").exists()
+    }
+    if missing:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                relative: executor.submit(
+                    _optimize, docs_path / relative, cached, settings
+                )
+                for relative, cached in missing.items()
+            }
+        for relative, future in futures.items():
+            if not future.result():
+                # Remember images that do not get smaller
+                missing[relative].with_name(
+                    missing[relative].name + ".original"
+                ).touch()
+
+    if overlay_path.exists():
+        shutil.rmtree(overlay_path)
+    optimized = 0
+    bytes_saved = 0
+    for relative, entry in manifest.items():
+        cached = images.get(relative)
+        if cached is not None and cached.exists():
+            _link(cached, overlay_path / relative)
+            optimized += 1
+            bytes_saved += entry["size"] - cached.stat().st_size
+        else:
+            _link(docs_path / relative, overlay_path / relative)
+
+    return OverlayResult(len(images), optimized, bytes_saved)
@@ -5,10 +5,13 @@ Discovers and loads agents for use with the hmd ai command.
 
 import re
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import yaml
 
+from .catalog import PACKAGE_DIR, load_catalog
+from .name_index import NameIndex
+
 
 def _get_skills_location() -> Path:
     """Get the path to the skills directory.
@@ -64,13 +67,68 @@ class AILoader:
         self,
         agents_location: Path = DEFAULT_AGENTS_LOCATION,
         skills_location: Path = DEFAULT_SKILLS_LOCATION,
+        index_path: Optional[Path] = None,
+        use_catalog: bool = True,
     ) -> None:
+        """Create a loader.
+
+        Args:
+            agents_location: Directory containing agents
+            skills_location: Directory containing skills
+            index_path: Optional file to persist the agent name index to
+            use_catalog: Read bundled components from the packaged catalog
+                instead of scanning the package directories
+        """
         self.agents_location = Path(agents_location)
         self.skills_location = Path(skills_location)
         # Keep default_location for backwards compatibility
         self.default_location = self.agents_location
 
-    def _parse_frontmatter(self, content: str) -> Tuple[Dict, str]:
+        catalog = load_catalog() if use_catalog else None
+        self._agent_catalog = self._catalog_section(
+            catalog, "agents", self.agents_location
+        )
+        self._skill_catalog = self._catalog_section(
+            catalog, "skills", self.skills_location
+        )
+
+        if self._agent_catalog:
+            self.agent_index = NameIndex.from_entries(
+                self.agents_location, "AGENT.md", **self._agent_catalog["index"]
+            )
+        else:
+            self.agent_index = NameIndex(self.agents_location, "AGENT.md", index_path)
+
+        if self._skill_catalog:
+            self.skill_index = NameIndex.from_entries(
+                self.skills_location, "SKILL.md", **self._skill_catalog["index"]
+            )
+        else:
+            self.skill_index = NameIndex(self.skills_location, "SKILL.md")
+
+    @staticmethod
+    def _catalog_section(
+        catalog: Optional[Dict], kind: str, location: Path
+    ) -> Optional[Dict]:
+        """Return the catalog section for ``location`` if it is the bundled one."""
+        if not catalog or kind not in catalog:
+            return None
+        if location.resolve() != (PACKAGE_DIR / kind).resolve():
+            return None
+        return catalog[kind]
+
+    @staticmethod
+    def _catalog_components(section: Dict, location: Path) -> List[Dict]:
+        """Build component metadata from a catalog section."""
+        components = []
+        for entry in section["entries"]:
+            metadata = dict(entry["metadata"])
+            metadata["_file"] = str(location.parent / entry["file"])
+            components.append(metadata)
+        return components
+
+    @staticmethod
+    def _parse_frontmatter(content: str) -> Tuple[Dict, str]:
         """Parse YAML frontmatter from markdown content.
 
         Returns:
@@ -91,6 +149,32 @@ class AILoader:
         else:
             return {}, content
 
+    def _read_metadata(self, path: Path) -> Dict:
+        """Read only the YAML frontmatter of a component file.
+
+        The body after the closing ``---`` marker is never read, so listing
+        components stays cheap for large files.
+
+        Returns:
+            Metadata dict, empty if the file has no frontmatter
+        """
+        marker = re.compile(r"^---\s*$")
+        with open(path, "r") as f:
+            if not marker.match(f.readline()):
+                return {}
+            lines = []
+            for line in f:
+                if marker.match(line):
+                    break
+                lines.append(line)
+            else:
+                return {}
+
+        try:
+            return yaml.safe_load("".join(lines)) or {}
+        except yaml.YAMLError:
+            return {}
+
     def list_commands(self) -> List[Dict]:
         """List all available commands.
 
@@ -109,24 +193,17 @@ class AILoader:
         Returns:
             List of skill metadata dictionaries
         """
+        if self._skill_catalog:
+            return self._catalog_components(self._skill_catalog, self.skills_location)
+
         skills = []
 
         if not self.skills_location.exists():
             return skills
 
-        # Find file-based skills (*.md directly in skills/)
-        file_based = list(self.skills_location.glob("*.md"))
-
-        # Find directory-based skills (*/SKILL.md)
-        dir_based = list(self.skills_location.glob("*/SKILL.md"))
-
-        skill_files = list(set(file_based + dir_based))  # Deduplicate
-
-        for skill_file in sorted(skill_files):
+        for skill_file in self.skill_index.paths():
             try:
-                with open(skill_file, "r") as f:
-                    content = f.read()
-                metadata, _ = self._parse_frontmatter(content)
+                metadata = self._read_metadata(skill_file)
 
                 # Add filename-based name if not in metadata
                 if "name" not in metadata:
@@ -156,25 +233,17 @@ class AILoader:
         Returns:
             List of agent metadata dictionaries
         """
+        if self._agent_catalog:
+            return self._catalog_components(self._agent_catalog, self.agents_location)
+
         agents = []
 
         if not self.default_location.exists():
             return agents
 
-        # Find file-based agents (*.md or *AGENT.md directly in agents/)
-        file_based = list(self.default_location.glob("*.md"))
-        file_based.extend(list(self.default_location.glob("*AGENT.md")))
-
-        # Find directory-based agents (*/AGENT.md)
-        dir_based = list(self.default_location.glob("*/AGENT.md"))
-
-        agent_files = list(set(file_based + dir_based))  # Deduplicate
-
-        for agent_file in sorted(agent_files):
+        for agent_file in self.agent_index.paths():
             try:
-                with open(agent_file, "r") as f:
-                    content = f.read()
-                metadata, _ = self._parse_frontmatter(content)
+                metadata = self._read_metadata(agent_file)
 
                 # Add filename-based name if not in metadata
                 if "name" not in metadata:
@@ -230,31 +299,11 @@ class AILoader:
         Raises:
             FileNotFoundError: If agent doesn't exist
         """
-        # Try file-based format first: {name}.md
-        agent_path = self.default_location / f"{name}.md"
-        if agent_path.exists():
-            return agent_path
-
-        # Try AGENT.md file format: {name}.AGENT.md
-        agent_path = self.default_location / f"{name}.AGENT.md"
-        if agent_path.exists():
+        # Exact names are resolved first, then prefix and substring matches
+        agent_path = self.agent_index.find(name)
+        if agent_path is not None:
             return agent_path
 
-        # Try directory-based format: {name}/AGENT.md
-        dir_agent_path = self.default_location / name / "AGENT.md"
-        if dir_agent_path.exists():
-            return dir_agent_path
-
-        # Try finding by glob pattern (file-based)
-        matches = list(self.default_location.glob(f"*{name}*.md"))
-        if matches:
-            return matches[0]
-
-        # Try finding by glob pattern (directory-based)
-        dir_matches = list(self.default_location.glob(f"*{name}*/AGENT.md"))
-        if dir_matches:
-            return dir_matches[0]
-
         raise FileNotFoundError(f"Agent '{name}' not found in {self.default_location}")
 
     def agent_exists(self, name: str) -> bool:
@@ -0,0 +1,84 @@
+"""Precompiled catalog of the agents and skills bundled with the package.
+
+The catalog is generated by ``setup.py`` when the package is built so that
+listing bundled components is a single small file read at runtime.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+CATALOG_FILENAME = "catalog.json"
+CATALOG_VERSION = 1
+
+PACKAGE_DIR = Path(__file__).parent.parent
+
+
+def _catalog_components(package_dir: Path, components, index) -> Dict:
+    files, dirs = index.entries()
+    entries = []
+    for metadata in components:
+        component_file = Path(metadata.pop("_file"))
+        entries.append(
+            {
+                "metadata": metadata,
+                "file": component_file.relative_to(package_dir).as_posix(),
+            }
+        )
+    return {"entries": entries, "index": {"files": files, "dirs": dirs}}
+
+
+def build_catalog(package_dir: Path = PACKAGE_DIR) -> Dict:
+    """Build the catalog for the agents and skills under ``package_dir``.
+
+    Args:
+        package_dir: Package directory containing ``agents/`` and ``skills/``
+
+    Returns:
+        Catalog dictionary with metadata and relative file paths for every
+        component
+    """
+    from .ai_loader import AILoader
+
+    package_dir = Path(package_dir)
+    loader = AILoader(package_dir / "agents", package_dir / "skills", use_catalog=False)
+
+    return {
+        "version": CATALOG_VERSION,
+        "agents": _catalog_components(
+            package_dir, loader.list_agents(), loader.agent_index
+        ),
+        "skills": _catalog_components(
+            package_dir, loader.list_skills(), loader.skill_index
+        ),
+    }
+
+
+def write_catalog(package_dir: Path = PACKAGE_DIR) -> Path:
+    """Generate the catalog and write it into ``package_dir``.
+
+    Returns:
+        Path to the written catalog file
+    """
+    catalog_path = Path(package_dir) / CATALOG_FILENAME
+    with open(catalog_path, "w") as f:
+        json.dump(build_catalog(package_dir), f, indent=2, sort_keys=True, default=str)
+    return catalog_path
+
+
+def load_catalog(package_dir: Path = PACKAGE_DIR) -> Optional[Dict]:
+    """Load the catalog from ``package_dir``.
+
+    Returns:
+        Catalog dictionary, or None if no usable catalog is present
+    """
+    try:
+        with open(Path(package_dir) / CATALOG_FILENAME, "r") as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if catalog.get("version") != CATALOG_VERSION:
+        return None
+
+    return catalog
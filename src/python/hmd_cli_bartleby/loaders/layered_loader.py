@@ -0,0 +1,180 @@
+"""Layered AI component loader for hmd-cli-bartleby.
+
+Merges agents and skills from several component locations, e.g. bundled,
+org-wide and per-project directories.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .ai_loader import DEFAULT_AGENTS_LOCATION, AILoader
+
+DEFAULT_COMPONENTS_LOCATION = DEFAULT_AGENTS_LOCATION.parent
+
+
+class LayeredAILoader:
+    """Loader that merges components from an ordered list of locations.
+
+    Each location is a directory containing ``agents/`` and ``skills/``.
+    Locations are listed from lowest to highest precedence: when two
+    locations provide a component with the same name, the later location
+    wins. Listing only reads component frontmatter; bodies are read by
+    ``load_agent``. The merged view is rebuilt when components are added to
+    or removed from any location.
+    """
+
+    def __init__(
+        self,
+        locations: Sequence[Path] = (DEFAULT_COMPONENTS_LOCATION,),
+        index_dir: Optional[Path] = None,
+    ) -> None:
+        """Create a layered loader.
+
+        Args:
+            locations: Component directories, lowest precedence first
+            index_dir: Optional directory to persist agent name indexes to
+        """
+        self.locations = [Path(location) for location in locations]
+        self.loaders = [
+            AILoader(
+                location / "agents",
+                location / "skills",
+                index_path=(
+                    Path(index_dir) / f"agents-{i}.json" if index_dir else None
+                ),
+            )
+            for i, location in enumerate(self.locations)
+        ]
+        self._agents: Optional[Dict[str, Dict]] = None
+        self._skills: Optional[Dict[str, Dict]] = None
+        self._layer_agents: List[Dict[str, Dict]] = []
+        self._generations: Optional[List[Tuple[int, int]]] = None
+
+    @staticmethod
+    def _scan(loader: AILoader) -> Tuple[List[Dict], List[Dict]]:
+        return loader.list_agents(), loader.list_skills()
+
+    def _current_generations(self) -> List[Tuple[int, int]]:
+        return [
+            (loader.agent_index.generation, loader.skill_index.generation)
+            for loader in self.loaders
+        ]
+
+    def refresh(self):
+        """Rescan all locations concurrently and rebuild the merged view."""
+        generations = self._current_generations()
+        agents: Dict[str, Dict] = {}
+        skills: Dict[str, Dict] = {}
+        layer_agents: List[Dict[str, Dict]] = []
+
+        if self.loaders:
+            with ThreadPoolExecutor(max_workers=len(self.loaders)) as executor:
+                results = list(executor.map(self._scan, self.loaders))
+        else:
+            results = []
+
+        # Results are in location order, so later locations override earlier
+        for location, (location_agents, location_skills) in zip(
+            self.locations, results
+        ):
+            layer = {
+                agent["name"]: {**agent, "_location": str(location)}
+                for agent in location_agents
+            }
+            layer_agents.append(layer)
+            agents.update(layer)
+            for skill in location_skills:
+                skills[skill["name"]] = {**skill, "_location": str(location)}
+
+        self._agents = agents
+        self._skills = skills
+        self._layer_agents = layer_agents
+        self._generations = generations
+
+    def _merged(self) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        if self._generations != self._current_generations():
+            self.refresh()
+        return self._agents, self._skills
+
+    def list_commands(self) -> List[Dict]:
+        """List all available commands.
+
+        Returns:
+            Empty list (no commands defined)
+        """
+        return []
+
+    def list_agents(self) -> List[Dict]:
+        """List the merged agents of all locations.
+
+        Returns:
+            List of agent metadata dictionaries sorted by name
+        """
+        agents, _ = self._merged()
+        return [agents[name] for name in sorted(agents)]
+
+    def list_skills(self) -> List[Dict]:
+        """List the merged skills of all locations.
+
+        Returns:
+            List of skill metadata dictionaries sorted by name
+        """
+        _, skills = self._merged()
+        return [skills[name] for name in sorted(skills)]
+
+    def get_agent_path(self, name: str) -> Path:
+        """Get the path to an agent file.
+
+        Locations are checked in precedence order, looking for an exact file
+        name and then a frontmatter name in each location before moving on
+        to the next. Prefix and substring matches are only tried when no
+        location has the exact name.
+
+        Raises:
+            FileNotFoundError: If agent doesn't exist in any location
+        """
+        self._merged()
+        layers = list(reversed(list(zip(self.loaders, self._layer_agents))))
+
+        for loader, layer_agents in layers:
+            agent_path = loader.agent_index.exact(name)
+            if agent_path is not None:
+                return agent_path
+            if name in layer_agents:
+                return Path(layer_agents[name]["_file"])
+
+        for loader, _ in layers:
+            agent_path = loader.agent_index.find(name)
+            if agent_path is not None:
+                return agent_path
+
+        locations = ", ".join(str(location) for location in self.locations)
+        if not locations:
+            raise FileNotFoundError(f"Agent '{name}' not found, no locations given")
+        raise FileNotFoundError(f"Agent '{name}' not found in {locations}")
+
+    def load_agent(self, name: str) -> Tuple[Dict, str]:
+        """Load an agent by name.
+
+        Returns:
+            Tuple of (metadata dict, full content including frontmatter)
+        """
+        agent_path = self.get_agent_path(name)
+
+        with open(agent_path, "r") as f:
+            content = f.read()
+
+        metadata, _ = AILoader._parse_frontmatter(content)
+        if "name" not in metadata:
+            metadata["name"] = name
+
+        return metadata, content
+
+    def agent_exists(self, name: str) -> bool:
+        """Check if an agent exists in any location."""
+        try:
+            self.get_agent_path(name)
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,259 @@
+"""Name index for AI component directories.
+
+Maps component names to their files so lookups do not need to glob the
+directory on every call.
+"""
+
+import bisect
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+INDEX_VERSION = 2
+# Seconds for which lookups trust the index without checking the directory
+FRESHNESS_TTL = 2.0
+
+
+class NameIndex:
+    """In-memory name to path index for a component directory.
+
+    A single scan of ``location`` records file-based components
+    (``{name}.md``) and directory-based components (``{name}/{marker}``).
+    The index is rebuilt when the modification time of ``location`` or of
+    one of its subdirectories changes. Modification times are checked at
+    most once every ``ttl`` seconds, so lookups in between are answered
+    from memory without touching the filesystem. The index can optionally
+    be persisted to ``index_path`` so later processes skip the scan.
+    """
+
+    def __init__(
+        self,
+        location: Path,
+        marker: str,
+        index_path: Optional[Path] = None,
+        ttl: float = FRESHNESS_TTL,
+    ) -> None:
+        self.location = Path(location)
+        self.marker = marker
+        self.index_path = Path(index_path) if index_path else None
+        self.ttl = ttl
+        self._checked_at: Optional[float] = None
+        self._mtimes: Optional[Dict[str, int]] = None
+        self._files: Dict[str, str] = {}
+        self._dirs: Dict[str, str] = {}
+        self._sorted_files: List[str] = []
+        self._sorted_dirs: List[str] = []
+        self._matches: Dict[str, Optional[Path]] = {}
+        self._static = False
+        self._generation = 0
+
+        if self.index_path is not None:
+            self._load()
+
+    @classmethod
+    def from_entries(
+        cls, location: Path, marker: str, files: Dict[str, str], dirs: Dict[str, str]
+    ) -> "NameIndex":
+        """Create an index from precomputed entries that is never rescanned."""
+        index = cls(location, marker)
+        index._set_entries(None, dict(files), dict(dirs))
+        index._static = True
+        return index
+
+    def _current_mtimes(self) -> Optional[Dict[str, int]]:
+        """Return the modification times of ``location`` and its subdirectories.
+
+        Adding or removing the marker of a directory-based component only
+        changes the modification time of the component's own directory.
+        """
+        try:
+            mtimes = {".": os.stat(self.location).st_mtime_ns}
+            with os.scandir(self.location) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        mtimes[entry.name] = entry.stat().st_mtime_ns
+        except OSError:
+            return None
+        return mtimes
+
+    def _set_entries(
+        self,
+        mtimes: Optional[Dict[str, int]],
+        files: Dict[str, str],
+        dirs: Dict[str, str],
+    ):
+        self._mtimes = mtimes
+        self._files = files
+        self._dirs = dirs
+        self._sorted_files = sorted(files)
+        self._sorted_dirs = sorted(dirs)
+        self._matches = {}
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if (
+            data.get("version") != INDEX_VERSION
+            or data.get("location") != str(self.location)
+            or data.get("marker") != self.marker
+        ):
+            return
+
+        self._set_entries(data.get("mtimes"), data["files"], data["dirs"])
+
+    def _save(self):
+        data = {
+            "version": INDEX_VERSION,
+            "location": str(self.location),
+            "marker": self.marker,
+            "mtimes": self._mtimes,
+            "files": self._files,
+            "dirs": self._dirs,
+        }
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # A persisted index is an optimization only
+            pass
+
+    def refresh(self):
+        """Rescan the directory and rebuild the index."""
+        mtimes = self._current_mtimes()
+        files = {}
+        dirs = {}
+
+        if mtimes is not None:
+            with os.scandir(self.location) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".md"):
+                        files[entry.name[: -len(".md")]] = entry.name
+                    elif entry.is_dir() and os.path.isfile(
+                        os.path.join(entry.path, self.marker)
+                    ):
+                        dirs[entry.name] = f"{entry.name}/{self.marker}"
+
+        if (files, dirs) != (self._files, self._dirs):
+            self._generation += 1
+        self._set_entries(mtimes, files, dirs)
+        self._checked_at = time.monotonic()
+
+        if self.index_path is not None:
+            self._save()
+
+    def _ensure_fresh(self):
+        if self._static:
+            return
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.ttl:
+            return
+        mtimes = self._current_mtimes()
+        if self._mtimes is None or mtimes != self._mtimes:
+            self.refresh()
+        else:
+            self._checked_at = now
+
+    @property
+    def generation(self) -> int:
+        """A number that changes whenever the indexed components change."""
+        self._ensure_fresh()
+        return self._generation
+
+    def entries(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Return the file-based and directory-based entries of the index."""
+        self._ensure_fresh()
+        return dict(self._files), dict(self._dirs)
+
+    def _path(self, relative: str) -> Path:
+        return self.location / relative
+
+    def paths(self) -> List[Path]:
+        """Return all indexed component files in sorted order."""
+        self._ensure_fresh()
+        relatives = list(self._files.values()) + list(self._dirs.values())
+        return sorted(self._path(r) for r in relatives)
+
+    def names(self) -> List[str]:
+        """Return the names of all directory-based and file-based components."""
+        self._ensure_fresh()
+        return sorted(set(self._sorted_files) | set(self._sorted_dirs))
+
+    def exact(self, name: str) -> Optional[Path]:
+        """Find a component by exact name.
+
+        Checks ``{name}.md``, ``{name}.{marker}`` and ``{name}/{marker}`` in
+        that order.
+        """
+        self._ensure_fresh()
+        marker_stem = self.marker[: -len(".md")]
+        for key, entries in (
+            (name, self._files),
+            (f"{name}.{marker_stem}", self._files),
+            (name, self._dirs),
+        ):
+            if key in entries:
+                return self._path(entries[key])
+        return None
+
+    @staticmethod
+    def _rank(candidates: List[str]) -> List[str]:
+        return sorted(candidates, key=lambda key: (len(key), key))
+
+    def _prefix_matches(self, keys: List[str], name: str) -> List[str]:
+        start = bisect.bisect_left(keys, name)
+        matches = []
+        for key in keys[start:]:
+            if not key.startswith(name):
+                break
+            matches.append(key)
+        return self._rank(matches)
+
+    def _substring_matches(self, keys: List[str], name: str) -> List[str]:
+        return self._rank([key for key in keys if name in key])
+
+    def ranked_matches(self, name: str) -> List[Path]:
+        """Return all components matching ``name``, best match first.
+
+        Matches are ranked exact, then prefix, then substring. Within a tier
+        file-based components come before directory-based ones, then shorter
+        names before longer ones, then alphabetically.
+        """
+        self._ensure_fresh()
+        ranked: List[Path] = []
+
+        def add(path: Path):
+            if path not in ranked:
+                ranked.append(path)
+
+        exact = self.exact(name)
+        if exact is not None:
+            add(exact)
+
+        tiers: List[Tuple[List[str], Dict[str, str]]] = [
+            (self._prefix_matches(self._sorted_files, name), self._files),
+            (self._prefix_matches(self._sorted_dirs, name), self._dirs),
+            (self._substring_matches(self._sorted_files, name), self._files),
+            (self._substring_matches(self._sorted_dirs, name), self._dirs),
+        ]
+        for keys, entries in tiers:
+            for key in keys:
+                add(self._path(entries[key]))
+
+        return ranked
+
+    def find(self, name: str) -> Optional[Path]:
+        """Return the best match for ``name`` or None if nothing matches."""
+        self._ensure_fresh()
+        if name not in self._matches:
+            matches = self.ranked_matches(name)
+            self._matches[name] = matches[0] if matches else None
+        return self._matches[name]
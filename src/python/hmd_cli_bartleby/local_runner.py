@@ -0,0 +1,274 @@
+"""Run the bartleby transform without Docker.
+
+When the ``hmd-tf-bartleby`` transform package and Sphinx are installed on
+the host, the transform entry point can be called directly with the same
+environment the container would get, avoiding container startup entirely.
+A single build runs in-process; several builds run in a pool of worker
+processes.
+
+This relies on an assumed contract with the transform package: the entry
+point (``hmd_tf_bartleby.entry:main`` unless ``HMD_BARTLEBY_LOCAL_ENTRY``
+says otherwise) takes no arguments, and reads its input, output and global
+style directories from the ``HMD_TRANSFORM_*_PATH`` variables in
+:data:`PATH_ENV_VARS` rather than the fixed container paths. A transform
+that does not honor them cannot be run this way.
+"""
+
+import importlib
+import importlib.util
+import os
+import shutil
+import sys
+import time
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .hmd_cli_bartleby import INPUT_TARGET, get_build_id, transform_config
+from .output import publish_build, split_publish_options
+from .runner import BuildResult, get_logs_path
+from .scheduler import BuildHistory
+
+LOCAL_ENTRY_ENV = "HMD_BARTLEBY_LOCAL_ENTRY"
+DEFAULT_LOCAL_ENTRY = "hmd_tf_bartleby.entry:main"
+
+# Environment variables pointing the transform at the host paths that are
+# mounted at these container paths
+PATH_ENV_VARS = {
+    INPUT_TARGET: "HMD_TRANSFORM_INPUT_PATH",
+    "/hmd_transform/output": "HMD_TRANSFORM_OUTPUT_PATH",
+    "/hmd_transform/global_styles": "HMD_TRANSFORM_GLOBAL_STYLES_PATH",
+}
+
+
+def get_entry_point() -> str:
+    return os.environ.get(LOCAL_ENTRY_ENV, DEFAULT_LOCAL_ENTRY)
+
+
+def check_local_transform(entry_point: str = None):
+    """Make sure the transform package is importable on the host.
+
+    Raises:
+        SystemExit: If the entry point module is not installed
+    """
+    module = (entry_point or get_entry_point()).split(":")[0]
+    if importlib.util.find_spec(module.split(".")[0]) is None:
+        raise SystemExit(
+            f"Error: the transform module '{module}' is not installed. Install "
+            f"hmd-tf-bartleby or use the default docker runner."
+        )
+
+
+def make_input_view(mounts: Dict[str, str], view_path: Path) -> Path:
+    """Create a directory of symlinks matching the input directories mounted
+    below the container input path.
+
+    Returns:
+        The view directory
+    """
+    if view_path.exists():
+        shutil.rmtree(view_path)
+    view_path.mkdir(parents=True)
+
+    prefix = f"{INPUT_TARGET}/"
+    for target, source in mounts.items():
+        if target.startswith(prefix):
+            link = view_path / target[len(prefix) :]
+            link.parent.mkdir(parents=True, exist_ok=True)
+            link.symlink_to(source, target_is_directory=os.path.isdir(source))
+    return view_path
+
+
+def get_local_env(compose: Dict, view_path: Path = None) -> Dict:
+    """Build the host environment for a transform from its compose file.
+
+    Container paths of mounts and secrets are replaced with the host paths
+    they are mounted from. When only some input directories are mounted, a
+    view of them is created at ``view_path`` to use as the input path.
+    """
+    service = compose["services"]["bartleby_transform"]
+    mounts = {
+        volume["target"]: volume["source"]
+        for volume in service["volumes"]
+        if volume.get("type") == "bind"
+    }
+    if INPUT_TARGET not in mounts and view_path is not None:
+        mounts[INPUT_TARGET] = str(make_input_view(mounts, view_path))
+    for secret in service.get("secrets", []):
+        mounts[f"/run/secrets/{secret}"] = compose["secrets"][secret]["file"]
+    # The transform uses its default scratch location instead of a tmpfs
+    scratch = [v["target"] for v in service["volumes"] if v.get("type") == "tmpfs"]
+
+    def host_path(value: str) -> str:
+        for target, source in mounts.items():
+            if value == target or value.startswith(f"{target}/"):
+                return source + value[len(target) :]
+        return value
+
+    env = {}
+    for key, value in service["environment"].items():
+        if value is None or value in scratch:
+            continue
+        parts = str(value).split(":")
+        if len(parts) > 1 and all(p.startswith("/hmd_transform/") for p in parts):
+            # A search path of container directories
+            env[key] = os.pathsep.join(host_path(p) for p in parts)
+        else:
+            env[key] = host_path(str(value))
+
+    for target, env_var in PATH_ENV_VARS.items():
+        if target in mounts:
+            env[env_var] = mounts[target]
+
+    return env
+
+
+class _PrefixedWriter:
+    """Writes lines to the console with a prefix and to a log file."""
+
+    def __init__(self, prefix: str, console, log) -> None:
+        self.prefix = prefix
+        self.console = console
+        self.log = log
+        self._buffer = ""
+
+    def write(self, text: str) -> int:
+        self.log.write(text)
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self.console.write(f"[{self.prefix}] {line}\n")
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self.console.write(f"[{self.prefix}] {self._buffer}\n")
+            self._buffer = ""
+        self.console.flush()
+        self.log.flush()
+
+
+def run_entry_point(
+    entry_point: str, env: Dict, cwd: str, prefix: str, log_path: str
+) -> int:
+    """Call the transform entry point with ``env`` applied.
+
+    The process environment, working directory and standard streams are
+    restored afterwards so the entry point can also run in-process.
+
+    Returns:
+        The exit code of the transform
+    """
+    module_name, _, function_name = entry_point.partition(":")
+    saved_env = dict(os.environ)
+    saved_cwd = os.getcwd()
+    saved_streams = sys.stdout, sys.stderr
+
+    Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "w") as log:
+        writer = _PrefixedWriter(prefix, sys.__stdout__, log)
+        os.environ.update(env)
+        os.chdir(cwd)
+        sys.stdout = sys.stderr = writer
+        try:
+            module = importlib.import_module(module_name)
+            result = getattr(module, function_name or "main")()
+            return result if isinstance(result, int) else 0
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            print(f"Exception occurred running: {e}")
+            return 1
+        finally:
+            writer.flush()
+            sys.stdout, sys.stderr = saved_streams
+            os.chdir(saved_cwd)
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+def _run_timed(*args) -> Tuple[int, float]:
+    """Call :func:`run_entry_point` and return its exit code and duration."""
+    start = time.monotonic()
+    return run_entry_point(*args), time.monotonic() - start
+
+
+def run_local(
+    transforms: List[Dict],
+    jobs: int = 1,
+    history: Optional[BuildHistory] = None,
+) -> List[BuildResult]:
+    """Run transforms on the host without Docker.
+
+    Args:
+        transforms: Keyword arguments for each :func:`transform` call
+        jobs: Number of worker processes; one runs in-process
+        history: Optional build history to record durations in
+
+    Returns:
+        The result of each build, in the order given
+    """
+    entry_point = get_entry_point()
+    check_local_transform(entry_point)
+    logs_path = get_logs_path()
+
+    def entry_args(stack: ExitStack, transform_args: Dict):
+        context = transform_args["transform_instance_context"]
+        build_id = get_build_id(context)
+        config_args, _ = split_publish_options(transform_args)
+        _, compose = stack.enter_context(
+            transform_config(**config_args, build_id=build_id)
+        )
+        view_path = Path(os.getcwd()) / "target" / "input" / build_id
+        stack.callback(shutil.rmtree, view_path, ignore_errors=True)
+        env = get_local_env(compose, view_path)
+        return compose, (
+            entry_point,
+            env,
+            env.get(PATH_ENV_VARS[INPUT_TARGET], os.getcwd()),
+            f"{context.get('name', '')}/{context['shell']}",
+            str(logs_path / f"{build_id}.log"),
+        )
+
+    def finish(compose: Dict, transform_args: Dict, timed: Tuple[int, float]):
+        return_code, duration = timed
+        if return_code == 0:
+            _, publish_options = split_publish_options(transform_args)
+            publish_build(
+                compose, transform_args["transform_instance_context"], **publish_options
+            )
+        results.append(BuildResult(return_code == 0, duration))
+
+    results = []
+    if jobs > 1 and len(transforms) > 1:
+        # The compose config, including any pip secret, lives until all
+        # workers are done
+        with ExitStack() as stack, ProcessPoolExecutor(
+            max_workers=jobs, mp_context=get_context("spawn")
+        ) as executor:
+            submitted = []
+            for transform_args in transforms:
+                compose, args = entry_args(stack, transform_args)
+                future = executor.submit(_run_timed, *args)
+                submitted.append((compose, transform_args, future))
+            for compose, transform_args, future in submitted:
+                finish(compose, transform_args, future.result())
+    else:
+        for transform_args in transforms:
+            with ExitStack() as stack:
+                compose, args = entry_args(stack, transform_args)
+                finish(compose, transform_args, _run_timed(*args))
+
+    if history is not None:
+        for transform_args, result in zip(transforms, results):
+            context = transform_args["transform_instance_context"]
+            history.record(
+                context.get("name", ""),
+                context["shell"],
+                result.duration,
+                success=result.success,
+            )
+
+    return results
@@ -0,0 +1,181 @@
+"""Atomic publishing of build output.
+
+Each build renders into a private staging directory under
+``target/bartleby-staging``. Only when the build succeeds is its output
+swapped into ``target/bartleby/<root>/<shell>``, so readers of
+``target/bartleby`` never see a partially written or failed build.
+"""
+
+import ctypes
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .compress import precompress_tree
+from .dedup import format_size
+from .search_index import shard_search_index
+from .changes import get_state_path, reuse_unchanged, summarize, write_state
+
+OUTPUT_TARGET = "/hmd_transform/output"
+STAGING_DIR = "bartleby-staging"
+# Arguments of a transform run that apply to publishing its output
+PUBLISH_OPTIONS = ["precompress", "shard_search_index"]
+
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+
+
+def get_output_path(repo_path: Path = None) -> Path:
+    return Path(repo_path or os.getcwd()) / "target" / "bartleby"
+
+
+def make_staging_path(build_id: str, repo_path: Path = None) -> Path:
+    """Create a private staging directory for a build.
+
+    It is created under ``target`` next to ``target/bartleby`` so that it is
+    on the same filesystem as the published output.
+    """
+    staging_root = Path(repo_path or os.getcwd()) / "target" / STAGING_DIR
+    staging_root.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=f"{build_id}-", dir=staging_root))
+
+
+def get_staging_path(compose: Dict) -> Path:
+    """Return the host directory mounted as the transform output."""
+    for volume in compose["services"]["bartleby_transform"]["volumes"]:
+        if volume["target"] == OUTPUT_TARGET:
+            return Path(volume["source"])
+    raise Exception("No output mount found in the transform configuration.")
+
+
+def find_build_output(staging_path: Path, root: str, shell: str) -> Path:
+    """Return the directory in the staging output holding the build.
+
+    Transforms that already nest their output under ``<root>/<shell>`` or
+    ``<shell>`` are unwrapped so the published tree is not nested twice.
+    """
+    entries = os.listdir(staging_path)
+    nested = staging_path / root / shell
+    if entries == [root] and nested.is_dir() and os.listdir(nested.parent) == [shell]:
+        return nested
+    if entries == [shell] and (staging_path / shell).is_dir():
+        return staging_path / shell
+    return staging_path
+
+
+def _rename_exchange(source: Path, dest: Path) -> bool:
+    """Atomically exchange two paths with ``renameat2``, where available."""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+
+    result = renameat2(
+        _AT_FDCWD,
+        os.fsencode(source),
+        _AT_FDCWD,
+        os.fsencode(dest),
+        _RENAME_EXCHANGE,
+    )
+    return result == 0
+
+
+def swap_directory(source: Path, dest: Path):
+    """Replace ``dest`` with ``source``.
+
+    A new ``dest`` is created with a single rename. An existing one is
+    exchanged atomically where the platform supports it, and otherwise
+    moved aside immediately before the rename.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if not dest.exists():
+        os.replace(source, dest)
+        return
+
+    if _rename_exchange(source, dest):
+        shutil.rmtree(source)
+        return
+
+    previous = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}")
+    os.replace(dest, previous)
+    os.replace(source, dest)
+    shutil.rmtree(previous)
+
+
+def publish_output(
+    staging_path: Path,
+    root: str,
+    shell: str,
+    output_path: Optional[Path] = None,
+    precompress: bool = False,
+    shard_search: bool = False,
+) -> Path:
+    """Swap a successful build's output into ``target/bartleby/<root>/<shell>``.
+
+    Html output first has its search index sharded with ``shard_search`` and
+    compressed siblings added with ``precompress``. Files unchanged since the
+    previous publish are kept as they were, and the added, modified and
+    removed files are recorded in the build's state directory.
+
+    Returns:
+        The published output directory
+    """
+    output_path = output_path or get_output_path()
+    dest = output_path / root / shell
+    source = find_build_output(staging_path, root, shell)
+    state_path = get_state_path(output_path, root, shell)
+
+    if shell == "html" and shard_search:
+        for sharded in shard_search_index(source):
+            print(
+                f"[{root}/{shell}] Split search index into {sharded.shards} shards, "
+                f"{format_size(sharded.original_size)} to {format_size(sharded.index_size)}"
+            )
+
+    if shell == "html" and precompress:
+        compressed = precompress_tree(source, output_path)
+        print(
+            f"[{root}/{shell}] Precompressed {compressed.files} files, "
+            f"{compressed.reused} unchanged"
+        )
+
+    manifest, changes = reuse_unchanged(source, dest, state_path)
+    swap_directory(source, dest)
+    write_state(state_path, manifest, changes)
+    print(f"[{root}/{shell}] Published {dest}: {summarize(changes)}")
+    return dest
+
+
+def split_publish_options(transform_args: Dict) -> Tuple[Dict, Dict]:
+    """Separate the publishing options from the arguments of a transform run.
+
+    Returns:
+        Tuple of (arguments for :func:`transform_config`, options for
+        :func:`publish_build`)
+    """
+    config_args = {k: v for k, v in transform_args.items() if k not in PUBLISH_OPTIONS}
+    options = {k: v for k, v in transform_args.items() if k in PUBLISH_OPTIONS}
+    return config_args, options
+
+
+def publish_build(
+    compose: Dict,
+    transform_instance_context: Dict,
+    precompress: bool = False,
+    shard_search_index: bool = False,
+) -> Path:
+    """Publish the output of a transform run from its compose configuration."""
+    return publish_output(
+        get_staging_path(compose),
+        transform_instance_context.get("name", ""),
+        transform_instance_context["shell"],
+        precompress=precompress,
+        shard_search=shard_search_index,
+    )
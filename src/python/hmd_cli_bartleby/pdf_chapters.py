@@ -0,0 +1,234 @@
+"""Chapter-sharded PDF builds.
+
+A root is split at the entries of its top-level toctrees, including the
+injected ``_sources/<key>`` sections. Each chapter gets a generated root
+document under ``docs/_chapters`` and is rendered as its own pdf build, so
+the LaTeX runs of a large manual can use several cores. The root's own
+content outside its toctrees is rendered as chapter 0, the only one with a
+title page, from a copy next to the root so that relative paths still
+resolve. The chapter PDFs are then merged with ``pypdf`` into the root's
+PDF, with one outline entry per chapter and continuous page labels.
+"""
+
+import importlib.util
+import re
+import shutil
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, NamedTuple, Optional
+
+from .changes import STATE_DIR
+from .output import get_output_path, make_staging_path, publish_output
+from .validate import DIRECTIVE, SOURCE_SUFFIXES, index_files, scan_document
+
+CHAPTERS_DIR = "_chapters"
+FRONT_MATTER_PREFIX = "_bartleby-front-"
+UNDERLINE = re.compile(r"^([=\-`:'\"~^_*+#<>])\1+\s*$")
+
+
+class Chapter(NamedTuple):
+    docname: str
+    title: str
+    build: Dict
+
+
+class ChapterPlan(NamedTuple):
+    build: Dict
+    chapters: List[Chapter]
+
+
+def check_pypdf():
+    """Make sure ``pypdf`` is available to merge chapters.
+
+    Raises:
+        SystemExit: If pypdf is not installed
+    """
+    if importlib.util.find_spec("pypdf") is None:
+        raise SystemExit(
+            "Error: chapter-sharded PDF builds need pypdf to merge chapters. "
+            "Install it with 'pip install hmd-cli-bartleby[pdf-chapters]'."
+        )
+
+
+def _read_source(docs_path: Path, docname: str) -> Optional[str]:
+    for suffix in SOURCE_SUFFIXES:
+        path = docs_path / (docname + suffix)
+        if path.exists():
+            return path.read_text(errors="replace") if suffix == ".rst" else ""
+    return None
+
+
+def get_chapters(docs_path: Path, root_doc: str) -> List[str]:
+    """Return the documents in the toctrees of ``root_doc``, in order."""
+    text = _read_source(docs_path, root_doc)
+    if not text:
+        return []
+    _, children = scan_document(root_doc, text, index_files(docs_path))
+    return list(dict.fromkeys(children))
+
+
+def get_title(docs_path: Path, docname: str) -> str:
+    """Return the first section title of a document, or its name."""
+    lines = (_read_source(docs_path, docname) or "").splitlines()
+    for number in range(len(lines) - 1):
+        title = lines[number].strip()
+        underline = lines[number + 1].strip()
+        if (
+            title
+            and UNDERLINE.match(underline)
+            and len(underline) >= len(title)
+            and not UNDERLINE.match(title)
+        ):
+            return title
+    return docname
+
+
+def get_front_matter(text: str) -> str:
+    """Return a document without its toctrees."""
+    lines = text.splitlines()
+    kept = []
+    number = 0
+    while number < len(lines):
+        match = DIRECTIVE.match(lines[number])
+        if not match or match.group(2) != "toctree":
+            kept.append(lines[number])
+            number += 1
+            continue
+        indent = match.group(1)
+        number += 1
+        while number < len(lines) and (
+            not lines[number].strip()
+            or (
+                lines[number].startswith(indent)
+                and len(lines[number]) - len(lines[number].lstrip()) > len(indent)
+            )
+        ):
+            number += 1
+    return "\n".join(kept).strip("\n") + "\n"
+
+
+def write_front_matter(docs_path: Path, name: str, root_doc: str) -> str:
+    """Write the content of a root outside its toctrees next to the root.
+
+    Returns:
+        The docname of the front matter root
+    """
+    docname = str(PurePosixPath(root_doc).with_name(f"{FRONT_MATTER_PREFIX}{name}"))
+    text = _read_source(docs_path, root_doc) or ""
+    (docs_path / f"{docname}.rst").write_text(get_front_matter(text))
+    return docname
+
+
+def get_chapter_config(config: Dict, number: int) -> Dict:
+    """Return the Sphinx config of a chapter build.
+
+    No chapter gets a table of contents, since the outline of the merged PDF
+    replaces it, and only the front matter keeps the title page. Chapter
+    numbers continue from the previous chapters.
+    """
+    latex_elements = {**config.get("latex_elements", {}), "tableofcontents": ""}
+    if number:
+        latex_elements["maketitle"] = ""
+        latex_elements["preamble"] = (
+            latex_elements.get("preamble", "")
+            + f"\n\\setcounter{{chapter}}{{{number - 1}}}\n"
+        )
+    return {**config, "latex_elements": latex_elements}
+
+
+def write_chapter_root(docs_path: Path, name: str, number: int, docname: str) -> str:
+    """Write a root document holding a single chapter.
+
+    Returns:
+        The docname of the chapter root
+    """
+    chapter_root = f"{CHAPTERS_DIR}/{name}/{number:02d}"
+    path = docs_path / f"{chapter_root}.rst"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f".. toctree::\n   :maxdepth: 4\n\n   /{docname}\n")
+    return chapter_root
+
+
+def plan_chapters(docs_path: Path, build: Dict) -> Optional[ChapterPlan]:
+    """Split a pdf build into its front matter and one build per chapter.
+
+    Returns:
+        The chapter builds, or None when the root has fewer than two chapters
+    """
+    root_doc = build["root_doc"]
+    docnames = get_chapters(docs_path, root_doc)
+    if len(docnames) < 2:
+        return None
+
+    chapters = [
+        Chapter(
+            root_doc,
+            get_title(docs_path, root_doc),
+            {
+                **build,
+                "name": f"{build['name']}-chapter-00",
+                "root_doc": write_front_matter(docs_path, build["name"], root_doc),
+                "config": get_chapter_config(build.get("config", {}), 0),
+            },
+        )
+    ]
+    for number, docname in enumerate(docnames, start=1):
+        chapter_build = {
+            **build,
+            "name": f"{build['name']}-chapter-{number:02d}",
+            "root_doc": write_chapter_root(docs_path, build["name"], number, docname),
+            "config": get_chapter_config(build.get("config", {}), number),
+        }
+        chapters.append(Chapter(docname, get_title(docs_path, docname), chapter_build))
+    return ChapterPlan(build, chapters)
+
+
+def remove_chapter_roots(docs_path: Path):
+    shutil.rmtree(docs_path / CHAPTERS_DIR, ignore_errors=True)
+    for path in docs_path.rglob(f"{FRONT_MATTER_PREFIX}*.rst"):
+        path.unlink()
+
+
+def _find_pdf(path: Path) -> Path:
+    pdfs = sorted(path.glob("*.pdf"))
+    if not pdfs:
+        raise Exception(f"No PDF found in {path}.")
+    return pdfs[0]
+
+
+def merge_chapters(plan: ChapterPlan, output_path: Path = None) -> Path:
+    """Merge the published chapter PDFs and publish them as the root's PDF.
+
+    The chapter outputs are removed once merged.
+
+    Returns:
+        The merged PDF
+    """
+    from pypdf import PdfWriter
+
+    output_path = output_path or get_output_path()
+    name = plan.build["name"]
+    chapter_paths = [output_path / c.build["name"] / "pdf" for c in plan.chapters]
+    # Name the merged PDF like the chapters, after the root rather than the chapter
+    pdf_name = _find_pdf(chapter_paths[0]).name.replace(
+        plan.chapters[0].build["name"], name
+    )
+
+    writer = PdfWriter()
+    for chapter, chapter_path in zip(plan.chapters, chapter_paths):
+        writer.append(str(_find_pdf(chapter_path)), outline_item=chapter.title)
+    writer.set_page_label(0, len(writer.pages) - 1, style="/D", start=1)
+
+    staging_path = make_staging_path(f"{name}-pdf-merge", output_path.parent.parent)
+    try:
+        with open(staging_path / pdf_name, "wb") as f:
+            writer.write(f)
+        dest = publish_output(staging_path, name, "pdf", output_path)
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    for chapter in plan.chapters:
+        shutil.rmtree(output_path / chapter.build["name"], ignore_errors=True)
+        shutil.rmtree(
+            output_path.parent / STATE_DIR / chapter.build["name"], ignore_errors=True
+        )
+    return dest / pdf_name
@@ -0,0 +1,203 @@
+"""Incremental publishing of build output to S3-compatible storage.
+
+A manifest of content hashes for ``target/bartleby`` is compared with the
+manifest stored alongside the previously published objects, and only new or
+changed files are uploaded. Uploads run concurrently and large files use
+multipart uploads. The remote manifest is replaced last, so an interrupted
+publish is retried in full on the next run.
+"""
+
+import json
+import mimetypes
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from .changes import STATE_DIR, hash_tree
+from .compress import COMPRESSIBLE_SUFFIXES
+
+PUBLISH_URL_ENV = "HMD_BARTLEBY_PUBLISH_URL"
+PUBLISH_ENDPOINT_ENV = "HMD_BARTLEBY_PUBLISH_ENDPOINT"
+REMOTE_MANIFEST = ".bartleby-manifest.json"
+LOCAL_MANIFEST = "publish.json"
+EXCLUDED_OUTPUTS = ["logs/*", "docker-compose-*.yaml"]
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
+CONTENT_TYPES = {
+    ".js": "application/javascript",
+    ".mjs": "application/javascript",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".map": "application/json",
+    ".txt": "text/plain; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+}
+CONTENT_ENCODINGS = {".gz": "gzip", ".br": "br"}
+
+
+class PublishResult(NamedTuple):
+    uploaded: List[str]
+    deleted: List[str]
+    unchanged: int
+
+
+def parse_destination(url: Optional[str] = None):
+    """Split an ``s3://bucket/prefix`` destination into bucket and prefix.
+
+    Raises:
+        SystemExit: If no destination is configured or it is not an S3 URL
+    """
+    url = url or os.environ.get(PUBLISH_URL_ENV)
+    if not url:
+        raise SystemExit(
+            f"Error: no publish destination given. Pass s3://bucket/prefix or set {PUBLISH_URL_ENV}."
+        )
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme != "s3" or not parsed.netloc:
+        raise SystemExit(
+            f"Error: publish destination '{url}' must be an s3://bucket/prefix URL."
+        )
+    return parsed.netloc, parsed.path.strip("/")
+
+
+def get_content_type(path: str) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix in CONTENT_TYPES:
+        return CONTENT_TYPES[suffix]
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def get_upload_args(path: str) -> Dict:
+    """Return the object metadata to upload a file with.
+
+    Precompressed siblings of text assets are served with the content type of
+    the original file and their encoding, so clients decompress them.
+    """
+    original, suffix = os.path.splitext(path)
+    encoding = CONTENT_ENCODINGS.get(suffix.lower())
+    if encoding and Path(original).suffix.lower() in COMPRESSIBLE_SUFFIXES:
+        return {"ContentType": get_content_type(original), "ContentEncoding": encoding}
+    return {"ContentType": get_content_type(path)}
+
+
+def get_local_manifest(output_path: Path, jobs: int = None) -> Dict:
+    """Hash the publishable files under ``output_path``.
+
+    Hashes from the last publish are reused while size and modification
+    time are unchanged.
+    """
+    state_file = output_path.parent / STATE_DIR / LOCAL_MANIFEST
+    try:
+        previous = json.loads(state_file.read_text())
+    except (OSError, ValueError):
+        previous = {}
+
+    manifest = {
+        relative: entry
+        for relative, entry in hash_tree(output_path, previous, jobs=jobs).items()
+        if not any(fnmatch(relative, pattern) for pattern in EXCLUDED_OUTPUTS)
+    }
+
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state_file.write_text(json.dumps(manifest, sort_keys=True))
+    return manifest
+
+
+class S3Publisher:
+    """Publishes a directory to a bucket and prefix.
+
+    Args:
+        bucket: Destination bucket
+        prefix: Key prefix the output is published under
+        client: boto3 S3 client, created from ``HMD_BARTLEBY_PUBLISH_ENDPOINT``
+            when not given
+        jobs: Number of files uploaded at once
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, jobs: int = 8):
+        if client is None:
+            import boto3
+
+            client = boto3.client(
+                "s3", endpoint_url=os.environ.get(PUBLISH_ENDPOINT_ENV)
+            )
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client
+        self.jobs = jobs
+
+    def _key(self, relative: str) -> str:
+        return f"{self.prefix}/{relative}" if self.prefix else relative
+
+    def get_remote_manifest(self) -> Dict:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self._key(REMOTE_MANIFEST)
+            )
+        except self.client.exceptions.NoSuchKey:
+            return {}
+        with response["Body"] as body:
+            return json.loads(body.read())
+
+    def _upload(self, output_path: Path, relative: str):
+        from boto3.s3.transfer import TransferConfig
+
+        self.client.upload_file(
+            str(output_path / relative),
+            self.bucket,
+            self._key(relative),
+            ExtraArgs=get_upload_args(relative),
+            Config=TransferConfig(multipart_threshold=MULTIPART_THRESHOLD),
+        )
+        print(f"[publish] Uploaded {relative}")
+
+    def publish(self, output_path: Path, delete: bool = False) -> PublishResult:
+        """Upload new and changed files and, with ``delete``, remove stale ones."""
+        local = get_local_manifest(output_path, jobs=self.jobs)
+        remote = self.get_remote_manifest()
+
+        uploads = sorted(
+            relative
+            for relative, entry in local.items()
+            if remote.get(relative, {}).get("sha256") != entry["sha256"]
+        )
+        deletes = sorted(set(remote) - set(local)) if delete else []
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            list(executor.map(lambda r: self._upload(output_path, r), uploads))
+
+        for start in range(0, len(deletes), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [
+                        {"Key": self._key(r)} for r in deletes[start : start + 1000]
+                    ]
+                },
+            )
+
+        published = {
+            relative: {"sha256": entry["sha256"], "size": entry["size"]}
+            for relative, entry in local.items()
+        }
+        if not delete:
+            # Objects left in place stay in the manifest so a later --delete
+            # still finds them
+            published = {
+                **{k: v for k, v in remote.items() if k not in local},
+                **published,
+            }
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(REMOTE_MANIFEST),
+            Body=json.dumps(published, sort_keys=True).encode(),
+            ContentType="application/json",
+        )
+
+        return PublishResult(uploads, deletes, len(local) - len(uploads))
@@ -0,0 +1,220 @@
+"""Remote build cache shared between machines.
+
+Published outputs are stored as compressed tar bundles keyed by the hash of
+the build inputs, the resolved transform arguments and the transform image
+digest. Before a build runs, a bundle with the same key is downloaded and
+published instead. Bundles can be kept on a shared filesystem path, behind a
+plain HTTP server accepting ``GET`` and ``PUT``, or in an S3-compatible
+bucket.
+"""
+
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional
+
+from .build_cache import get_build_key
+from .output import get_output_path, make_staging_path, publish_output
+
+BUILD_CACHE_ENV = "HMD_BARTLEBY_BUILD_CACHE"
+BUILD_CACHE_ENDPOINT_ENV = "HMD_BARTLEBY_BUILD_CACHE_ENDPOINT"
+BUNDLE_SUFFIX = ".tar.gz"
+# Environment read by the transform that changes its output
+KEY_ENV_VARS = [
+    "HMD_DOC_COMPANY_NAME",
+    "HMD_BARTLEBY_CONFIDENTIALITY_STATEMENT",
+    "HMD_BARTLEBY_IMAGE_MAX_SIZE",
+    "HMD_BARTLEBY_IMAGE_QUALITY",
+]
+
+
+class FileCacheBackend:
+    """Bundles stored in a directory, e.g. a shared network mount."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def get(self, name: str) -> Optional[BinaryIO]:
+        try:
+            return open(self.path / name, "rb")
+        except FileNotFoundError:
+            return None
+
+    def put(self, name: str, fileobj: BinaryIO):
+        self.path.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path / f".{name}.{os.getpid()}"
+        with open(temp_path, "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+        os.replace(temp_path, self.path / name)
+
+
+class HttpCacheBackend:
+    """Bundles stored behind an HTTP server supporting ``GET`` and ``PUT``."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+
+    def get(self, name: str) -> Optional[BinaryIO]:
+        try:
+            return urllib.request.urlopen(f"{self.url}/{name}")
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def put(self, name: str, fileobj: BinaryIO):
+        size = os.fstat(fileobj.fileno()).st_size
+        request = urllib.request.Request(
+            f"{self.url}/{name}",
+            data=fileobj,
+            method="PUT",
+            headers={
+                "Content-Length": str(size),
+                "Content-Type": "application/gzip",
+            },
+        )
+        with urllib.request.urlopen(request):
+            pass
+
+
+class S3CacheBackend:
+    """Bundles stored in an S3-compatible bucket."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def get(self, name: str) -> Optional[BinaryIO]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(name))[
+                "Body"
+            ]
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def put(self, name: str, fileobj: BinaryIO):
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(name))
+
+
+def get_cache_backend(url: Optional[str] = None):
+    """Create the backend for a build cache URL.
+
+    ``s3://bucket/prefix`` and ``http(s)://`` URLs use those stores, anything
+    else is a filesystem path. The URL falls back to
+    ``HMD_BARTLEBY_BUILD_CACHE``.
+
+    Returns:
+        The backend, or None when no cache is configured
+    """
+    url = url or os.environ.get(BUILD_CACHE_ENV)
+    if not url:
+        return None
+
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme == "s3":
+        return S3CacheBackend(
+            parsed.netloc,
+            parsed.path,
+            endpoint_url=os.environ.get(BUILD_CACHE_ENDPOINT_ENV),
+        )
+    if parsed.scheme in ("http", "https"):
+        return HttpCacheBackend(url)
+    if parsed.scheme == "file":
+        return FileCacheBackend(urllib.request.url2pathname(parsed.path))
+    return FileCacheBackend(url)
+
+
+def get_image_digest(image_name: str, runner: str = "docker") -> Optional[str]:
+    """Identify the transform that renders a build.
+
+    This is the image id for container builds and the installed transform
+    package version for the local runner. Returns None when there is no
+    immutable identifier, e.g. the image has not been pulled yet, since a
+    tag can point at a different image by the time the key is reused.
+    """
+    if runner == "local":
+        try:
+            return f"hmd-tf-bartleby=={version('hmd-tf-bartleby')}"
+        except PackageNotFoundError:
+            return None
+
+    inspect = subprocess.run(
+        ["docker", "image", "inspect", "--format", "{{.Id}}", image_name],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if inspect.returncode == 0 and inspect.stdout.strip():
+        return inspect.stdout.strip()
+    return None
+
+
+def get_remote_key(input_hash: str, transform_args: Dict, image_digest: str) -> str:
+    """Key a build on its inputs, resolved arguments and transform image."""
+    args = {k: v for k, v in transform_args.items() if k != "image_name"}
+    args["image_digest"] = image_digest
+    args["environment"] = {k: os.environ.get(k) for k in KEY_ENV_VARS}
+    return get_build_key(input_hash, args)
+
+
+class RemoteBuildCache:
+    """Restores and stores published build outputs in a cache backend."""
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+
+    def restore(self, key: str, root: str, shell: str) -> bool:
+        """Publish the cached output for ``key``, if there is one.
+
+        Returns:
+            Whether the build was restored from the cache
+        """
+        try:
+            bundle = self.backend.get(f"{key}{BUNDLE_SUFFIX}")
+        except Exception as e:
+            print(f"[{root}/{shell}] Build cache unavailable: {e}")
+            return False
+        if bundle is None:
+            return False
+
+        staging_path = make_staging_path(f"{root}-{shell}-cache")
+        try:
+            with bundle, tarfile.open(fileobj=bundle, mode="r|gz") as tar:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(staging_path, filter="data")
+                else:
+                    tar.extractall(staging_path)
+            publish_output(staging_path, root, shell)
+        except Exception as e:
+            print(f"[{root}/{shell}] Unable to restore from build cache: {e}")
+            return False
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+        print(f"[{root}/{shell}] Restored from build cache")
+        return True
+
+    def store(self, key: str, root: str, shell: str):
+        """Upload the published output of a build."""
+        output_path = get_output_path() / root / shell
+        try:
+            with tempfile.TemporaryFile() as bundle:
+                with tarfile.open(fileobj=bundle, mode="w:gz") as tar:
+                    tar.add(str(output_path), arcname=".")
+                bundle.seek(0)
+                self.backend.put(f"{key}{BUNDLE_SUFFIX}", bundle)
+        except Exception as e:
+            print(f"[{root}/{shell}] Unable to store in build cache: {e}")
@@ -0,0 +1,231 @@
+"""Asyncio runner for bartleby transforms.
+
+Runs transform containers as asyncio subprocesses so several builds can wait
+on their containers at the same time. Each build's output is streamed to the
+console line by line with a ``[root/shell]`` prefix and written in full to
+``target/bartleby/logs/<root>-<shell>.log``.
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from .hmd_cli_bartleby import (
+    get_build_id,
+    get_puml_command,
+    transform_config,
+)
+from .output import publish_build, split_publish_options
+from .scheduler import BuildHistory, run_scheduled, sample_peak_memory
+
+LOGS_DIR = "logs"
+
+
+class BuildResult(NamedTuple):
+    success: bool
+    duration: float
+    peak_memory: Optional[int] = None
+
+
+def get_logs_path() -> Path:
+    return Path(os.getcwd()) / "target" / "bartleby" / LOGS_DIR
+
+
+async def stream_command(
+    command: List[str],
+    prefix: str,
+    log_path: Path,
+    env: Optional[Dict] = None,
+) -> int:
+    """Run a command, streaming its combined output with a prefix.
+
+    Args:
+        command: Command and arguments to execute
+        prefix: Label printed in brackets before every output line
+        log_path: File the unprefixed output is written to
+        env: Optional environment for the process
+
+    Returns:
+        The exit code of the process
+    """
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    process = await asyncio.create_subprocess_exec(
+        *[str(c) for c in command],
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+    )
+
+    with open(log_path, "w") as log:
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            text = line.decode(errors="replace").rstrip("\r\n")
+            print(f"[{prefix}] {text}", flush=True)
+            log.write(f"{text}\n")
+
+    return await process.wait()
+
+
+async def transform_async(**transform_args) -> BuildResult:
+    """Run a single transform, see :func:`transform` for the arguments.
+
+    Returns:
+        Whether the build completed, its duration and peak container memory
+    """
+    transform_instance_context = transform_args["transform_instance_context"]
+    prefix = (
+        f"{transform_instance_context.get('name', '')}/"
+        f"{transform_instance_context['shell']}"
+    )
+    build_id = get_build_id(transform_instance_context)
+    log_path = get_logs_path() / f"{build_id}.log"
+    transform_args, publish_options = split_publish_options(transform_args)
+    project_name = f"bartleby-{build_id}"
+    start = time.monotonic()
+    peak_memory = None
+
+    try:
+        with transform_config(**transform_args, build_id=build_id) as (
+            inst_config,
+            compose,
+        ):
+            command = [
+                "docker-compose",
+                "--project-name",
+                project_name,
+                "--file",
+                inst_config,
+                "up",
+                "--force-recreate",
+            ]
+
+            container_name = compose["services"]["bartleby_transform"]["container_name"]
+            stop_sampling = asyncio.Event()
+            sampler = asyncio.ensure_future(
+                sample_peak_memory(container_name, stop_sampling)
+            )
+            try:
+                return_code = await stream_command(command, prefix, log_path)
+            finally:
+                stop_sampling.set()
+                peak_memory = await sampler
+
+            if return_code != 0:
+                raise Exception(
+                    f"Process completed with non-zero exit code: {return_code}"
+                )
+
+            publish_build(compose, transform_instance_context, **publish_options)
+
+        rm_command = [
+            "docker-compose",
+            "--project-name",
+            project_name,
+            "--file",
+            inst_config,
+            "rm",
+            "-f",
+        ]
+        return_code = await stream_command(
+            rm_command, prefix, log_path.with_suffix(".rm.log")
+        )
+
+        if return_code != 0:
+            raise Exception(
+                f"Docker compose remove finished with non-zero exit code: {return_code}."
+                f"Cleanup can be done manually with the following command: "
+                f"docker-compose --project-name {project_name} --file {inst_config} rm -f"
+            )
+
+    except Exception as e:
+        print(f"[{prefix}] Exception occurred running: {e}")
+        return BuildResult(False, time.monotonic() - start, peak_memory)
+
+    return BuildResult(True, time.monotonic() - start, peak_memory)
+
+
+async def run_transforms(
+    transforms: List[Dict],
+    jobs: int = 1,
+    memory_budget: Optional[int] = None,
+    history: Optional[BuildHistory] = None,
+    run_one: Optional[Callable[..., Awaitable[BuildResult]]] = None,
+) -> List[BuildResult]:
+    """Run several transforms with at most ``jobs`` running at once.
+
+    With a build history, builds are started longest-first, packed under
+    ``memory_budget`` using their estimated peak memory, and their duration
+    and peak memory are recorded once they finish.
+
+    Args:
+        transforms: Keyword arguments for each :func:`transform_async` call
+        jobs: Maximum number of concurrent builds
+        memory_budget: Optional total memory budget in MB
+        history: Optional build history used for ordering and recording
+        run_one: Coroutine function running a single build, defaults to
+            :func:`transform_async`
+
+    Returns:
+        The result of each build, in the order given
+    """
+
+    def key(transform_args: Dict) -> Dict:
+        context = transform_args["transform_instance_context"]
+        return {"name": context.get("name", ""), "shell": context["shell"]}
+
+    # Estimates are taken once so recording finished builds does not change
+    # the memory accounted to builds that are still running
+    estimates = {}
+    if history is not None:
+        for index, transform_args in enumerate(transforms):
+            build = key(transform_args)
+            estimates[index] = history.estimate(build["name"], build["shell"])
+
+    items = sorted(
+        range(len(transforms)),
+        key=lambda index: estimates.get(index, (0, 0))[0],
+        reverse=True,
+    )
+
+    def memory_of(index: int) -> int:
+        return estimates.get(index, (0, 0))[1]
+
+    run_one = run_one or transform_async
+
+    async def run(index: int) -> BuildResult:
+        result = await run_one(**transforms[index])
+        if history is not None:
+            build = key(transforms[index])
+            history.record(
+                build["name"],
+                build["shell"],
+                result.duration,
+                result.peak_memory,
+                result.success,
+            )
+        return result
+
+    results = await run_scheduled(
+        items, run, memory_of, cpus=jobs, memory_budget=memory_budget
+    )
+
+    ordered = [None] * len(transforms)
+    for index, result in zip(items, results):
+        ordered[index] = result
+    return ordered
+
+
+async def transform_puml_async(
+    files: List, input_path: Path, output_path: Path, image_name: str
+) -> int:
+    """Render puml files, streaming output with a ``[puml]`` prefix.
+
+    Returns:
+        The exit code of the container
+    """
+    command = get_puml_command(files, input_path, output_path, image_name)
+    return await stream_command(command, "puml", get_logs_path() / "puml.log")
@@ -0,0 +1,220 @@
+"""Cost-aware scheduling of bartleby builds.
+
+Build durations and peak memory are recorded per repository, root and shell
+in a local SQLite history. When builds run in parallel they are started
+longest-first and packed under a CPU and memory budget, which keeps slow PDF
+builds from being left until the end.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .cache import get_cache_path
+
+HISTORY_FILE = "history.sqlite"
+HISTORY_SAMPLES = 5
+
+# (duration in seconds, peak memory in MB) used until a build has history
+DEFAULT_ESTIMATES = {
+    "pdf": (600.0, 2048),
+    "html": (120.0, 1024),
+    "revealjs": (60.0, 512),
+}
+DEFAULT_ESTIMATE = (120.0, 1024)
+
+MEMORY_UNITS = {
+    "b": 1,
+    "kb": 1000,
+    "mb": 1000**2,
+    "gb": 1000**3,
+    "kib": 1024,
+    "mib": 1024**2,
+    "gib": 1024**3,
+}
+
+
+class BuildHistory:
+    """SQLite record of past build durations and peak memory."""
+
+    def __init__(self, db_path: Path, repo: str = None) -> None:
+        self.db_path = Path(db_path)
+        self.repo = repo or os.getcwd()
+        self._conn = sqlite3.connect(str(self.db_path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS builds ("
+            "repo TEXT NOT NULL, "
+            "root TEXT NOT NULL, "
+            "shell TEXT NOT NULL, "
+            "duration REAL NOT NULL, "
+            "peak_memory INTEGER, "
+            "success INTEGER NOT NULL, "
+            "finished_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS builds_key ON builds (repo, root, shell)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def open_default(cls) -> "BuildHistory":
+        """Open the history in the bartleby cache directory."""
+        return cls(get_cache_path(HISTORY_FILE))
+
+    def close(self):
+        self._conn.close()
+
+    def record(
+        self,
+        root: str,
+        shell: str,
+        duration: float,
+        peak_memory: Optional[int] = None,
+        success: bool = True,
+    ):
+        """Record a finished build.
+
+        Args:
+            root: Root document name
+            shell: Builder shell
+            duration: Wall clock duration in seconds
+            peak_memory: Peak memory of the build in MB, if measured
+            success: Whether the build completed
+        """
+        self._conn.execute(
+            "INSERT INTO builds VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.repo, root, shell, duration, peak_memory, int(success), time.time()),
+        )
+        self._conn.commit()
+
+    def estimate(self, root: str, shell: str) -> Tuple[float, int]:
+        """Estimate the duration and peak memory of a build.
+
+        Averages the most recent successful builds, falling back to
+        per-shell defaults for builds without history.
+
+        Returns:
+            Tuple of (duration in seconds, peak memory in MB)
+        """
+        rows = self._conn.execute(
+            "SELECT duration, peak_memory FROM builds "
+            "WHERE repo = ? AND root = ? AND shell = ? AND success = 1 "
+            "ORDER BY finished_at DESC LIMIT ?",
+            (self.repo, root, shell, HISTORY_SAMPLES),
+        ).fetchall()
+
+        default_duration, default_memory = DEFAULT_ESTIMATES.get(
+            shell, DEFAULT_ESTIMATE
+        )
+        if not rows:
+            return default_duration, default_memory
+
+        duration = sum(row[0] for row in rows) / len(rows)
+        memories = [row[1] for row in rows if row[1] is not None]
+        memory = max(memories) if memories else default_memory
+        return duration, memory
+
+
+def parse_memory(value: str) -> Optional[int]:
+    """Parse a memory size like ``512MiB`` or ``1.5GB`` into MB."""
+    match = re.match(r"^\s*([\d.]+)\s*([a-zA-Z]*)\s*$", value)
+    if not match:
+        return None
+    unit = MEMORY_UNITS.get(match.group(2).lower() or "b")
+    if unit is None:
+        return None
+    return int(float(match.group(1)) * unit / 1024**2)
+
+
+async def sample_peak_memory(
+    container_name: str, stop: asyncio.Event, interval: float = 2.0
+) -> Optional[int]:
+    """Poll ``docker stats`` for a container until ``stop`` is set.
+
+    Returns:
+        The highest memory usage seen in MB, or None if never measured
+    """
+    peak = None
+    while not stop.is_set():
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "docker",
+                "stats",
+                "--no-stream",
+                "--format",
+                "{{.MemUsage}}",
+                container_name,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            stdout, _ = await process.communicate()
+        except OSError:
+            return peak
+
+        if process.returncode == 0 and stdout:
+            usage = parse_memory(stdout.decode().split("/")[0])
+            if usage is not None:
+                peak = usage if peak is None else max(peak, usage)
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+    return peak
+
+
+async def run_scheduled(
+    items: List,
+    run: Callable[[object], Awaitable],
+    memory_of: Callable[[object], int],
+    cpus: int = 1,
+    memory_budget: Optional[int] = None,
+) -> List:
+    """Run items concurrently under a CPU and memory budget.
+
+    Items are started in the given order whenever a CPU slot is free and
+    their estimated memory fits in what is left of ``memory_budget``. An item
+    that exceeds the whole budget is run on its own rather than never.
+
+    Args:
+        items: Items to run, in priority order
+        run: Coroutine function running a single item
+        memory_of: Estimated memory of an item in MB
+        cpus: Maximum number of items running at once
+        memory_budget: Optional total memory budget in MB
+
+    Returns:
+        The results of ``run`` in the order of ``items``
+    """
+    cpus = max(1, cpus)
+    results = [None] * len(items)
+    pending = list(range(len(items)))
+    running: Dict[asyncio.Task, int] = {}
+    memory_in_use = 0
+
+    def fits(index: int) -> bool:
+        if len(running) >= cpus:
+            return False
+        if memory_budget is None or not running:
+            return True
+        return memory_in_use + memory_of(items[index]) <= memory_budget
+
+    while pending or running:
+        for index in list(pending):
+            if fits(index):
+                pending.remove(index)
+                memory_in_use += memory_of(items[index])
+                running[asyncio.ensure_future(run(items[index]))] = index
+
+        done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index = running.pop(task)
+            memory_in_use -= memory_of(items[index])
+            results[index] = task.result()
+
+    return results
@@ -0,0 +1,149 @@
+"""Sharded Sphinx search index for large HTML builds.
+
+Sphinx writes the whole search index to ``searchindex.js``, which every
+search page loads. With sharding enabled, the ``terms`` and ``titleterms``
+of the index are split into shards by the first characters of each term
+and written to ``_searchindex/``. ``searchindex.js`` keeps the rest of the
+index behind a small loader that fetches only the shards for the words
+in a query before running it.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+SHARD_SEARCH_ENV = "HMD_BARTLEBY_SHARD_SEARCH_INDEX"
+SEARCH_INDEX_FILENAME = "searchindex.js"
+SHARDS_DIR = "_searchindex"
+PREFIX_LENGTH = 2
+SHARDED_KEYS = ["terms", "titleterms"]
+
+_SET_INDEX = "Search.setIndex("
+_ADD_SHARD = "Search.addIndexShard("
+
+LOADER = """
+(function () {
+  var base = document.currentScript.src.replace(/[^/]*$/, "%(shards_dir)s/");
+  var loaded = {};
+  var toHex = function (prefix) {
+    return Array.from(new TextEncoder().encode(prefix))
+      .map(function (b) { return b.toString(16).padStart(2, "0"); })
+      .join("");
+  };
+  var load = function (prefix) {
+    if (!loaded[prefix]) {
+      loaded[prefix] = new Promise(function (resolve) {
+        var script = document.createElement("script");
+        script.src = base + toHex(prefix) + ".js";
+        script.onload = resolve;
+        script.onerror = resolve;
+        document.head.appendChild(script);
+      });
+    }
+    return loaded[prefix];
+  };
+  Search.addIndexShard = function (shard) {
+    %(sharded_keys)s.forEach(function (key) {
+      Object.assign(Search._index[key], shard[key]);
+    });
+  };
+  var query = Search.query;
+  Search.query = function (text) {
+    var prefixes = text
+      .toLowerCase()
+      .split(/[^\\p{L}\\p{N}_]+/u)
+      .filter(function (word) { return word; })
+      .map(function (word) { return Array.from(word).slice(0, %(prefix_length)d).join(""); });
+    Promise.all(prefixes.map(load)).then(function () {
+      query.call(Search, text);
+    });
+  };
+})();
+"""
+
+
+class ShardResult(NamedTuple):
+    shards: int
+    original_size: int
+    index_size: int
+
+
+def shard_search_enabled() -> bool:
+    return os.environ.get(SHARD_SEARCH_ENV, "false").lower() in ("true", "1", "yes")
+
+
+def get_shard_prefix(term: str) -> str:
+    return term[:PREFIX_LENGTH].lower()
+
+
+def get_shard_name(prefix: str) -> str:
+    return f"{prefix.encode('utf-8').hex()}.js"
+
+
+def read_search_index(path: Path) -> Dict:
+    """Parse the index from a ``searchindex.js`` written by Sphinx.
+
+    Raises:
+        ValueError: If the file is not a ``Search.setIndex`` call
+    """
+    content = path.read_text(encoding="utf-8").strip()
+    if not content.startswith(_SET_INDEX) or not content.endswith(")"):
+        raise ValueError(f"{path} is not a Sphinx search index.")
+    return json.loads(content[len(_SET_INDEX) : -1])
+
+
+def split_index(index: Dict) -> Dict[str, Dict]:
+    """Split the sharded keys of ``index`` by term prefix.
+
+    The sharded keys are emptied in ``index``.
+    """
+    shards: Dict[str, Dict] = {}
+    for key in SHARDED_KEYS:
+        for term, docs in index.get(key, {}).items():
+            shard = shards.setdefault(
+                get_shard_prefix(term), {k: {} for k in SHARDED_KEYS}
+            )
+            shard[key][term] = docs
+        index[key] = {}
+    return shards
+
+
+def _dump(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def shard_search_index(html_path: Path) -> List[ShardResult]:
+    """Shard every Sphinx search index in an html build.
+
+    Returns:
+        The number of shards and the size of each index before and after
+    """
+    results = []
+    for index_path in sorted(Path(html_path).rglob(SEARCH_INDEX_FILENAME)):
+        try:
+            index = read_search_index(index_path)
+        except ValueError as e:
+            print(f"Unable to shard search index: {e}")
+            continue
+
+        original_size = index_path.stat().st_size
+        shards = split_index(index)
+        shards_path = index_path.parent / SHARDS_DIR
+        shards_path.mkdir(exist_ok=True)
+        for prefix, shard in shards.items():
+            (shards_path / get_shard_name(prefix)).write_text(
+                f"{_ADD_SHARD}{_dump(shard)})", encoding="utf-8"
+            )
+
+        loader = LOADER % {
+            "shards_dir": SHARDS_DIR,
+            "sharded_keys": _dump(SHARDED_KEYS),
+            "prefix_length": PREFIX_LENGTH,
+        }
+        # The loader must wrap Search.query before setIndex runs a queued query
+        index_path.write_text(f"{loader}{_SET_INDEX}{_dump(index)})", encoding="utf-8")
+        results.append(
+            ShardResult(len(shards), original_size, index_path.stat().st_size)
+        )
+    return results
@@ -0,0 +1,300 @@
+"""Local build server for bartleby.
+
+Keeps configuration, input file hashes and the results of previous builds
+resident and accepts build requests over a local HTTP or Unix socket API.
+Requests are queued, and requests for the same root, shell and input hash
+share a single run. Inputs are hashed again when a build starts, so a build
+is keyed on the files it actually reads. The transform image has no
+long-running mode, so no containers are kept warm between builds; only the
+image is pulled ahead of the first request.
+"""
+
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Dict, List, Optional, Tuple
+
+from hmd_cli_tools.hmd_cli_tools import read_manifest
+
+from .build_cache import InputHasher, get_build_key, hash_inputs
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class BuildServer:
+    """Queue of build jobs run by a background worker.
+
+    Args:
+        controller: The bartleby controller used to resolve and run builds
+        image_name: Transform image used by the builds
+    """
+
+    def __init__(self, controller, image_name: str) -> None:
+        self.controller = controller
+        self.image_name = image_name
+        self.repo_path = Path(os.getcwd())
+        self.hasher = InputHasher()
+        self._jobs: Dict[str, Dict] = {}
+        # (root, shell) to id of the queued job for it
+        self._queued: Dict[Tuple[str, str], str] = {}
+        # Build key to id of the running job for it
+        self._active: Dict[str, str] = {}
+        # (root, shell) to (build key, job id) of the last successful build
+        self._completed: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def warm(self):
+        """Make sure the transform image is available before the first request."""
+        inspect = subprocess.run(
+            ["docker", "image", "inspect", self.image_name],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if inspect.returncode != 0:
+            subprocess.run(["docker", "pull", self.image_name])
+
+    def start(self):
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._queue.put(None)
+        if self._worker is not None:
+            self._worker.join()
+
+    def _input_hash(self) -> str:
+        return hash_inputs(
+            self.repo_path,
+            self.controller.app.pargs.autodoc,
+            read_manifest().get("bartleby", {}).get("sources", {}),
+            self.hasher,
+            full_context=self.controller.app.pargs.full_context,
+        )
+
+    def resolve_builds(self, root_doc: str = "all", shell: str = "all") -> List[Dict]:
+        """Resolve a request into individual root and shell builds.
+
+        Raises:
+            ValueError: If none of the requested roots exist
+        """
+        try:
+            docs = self.controller._get_documents(root_doc=root_doc, shell=shell)
+        except SystemExit as e:
+            raise ValueError(str(e))
+        return self.controller._get_shells(docs, shell=shell)
+
+    def submit(self, root_doc: str = "all", shell: str = "all") -> List[Dict]:
+        """Queue builds for a request.
+
+        Builds join a queued job of the same root and shell, which hashes
+        its inputs when it starts, or a running job with the same inputs.
+        Builds whose inputs match the last successful build of the same root
+        and shell are answered from it without running again.
+
+        Returns:
+            The job for each resolved build
+        """
+        builds = self.resolve_builds(root_doc, shell)
+        input_hash = self._input_hash()
+        jobs = []
+
+        with self._lock:
+            for build in builds:
+                key = get_build_key(input_hash, build)
+                build_name = (build["name"], build["shell"])
+
+                if build_name in self._queued:
+                    job = self._jobs[self._queued[build_name]]
+                    job["requests"] += 1
+                elif key in self._active:
+                    job = self._jobs[self._active[key]]
+                    job["requests"] += 1
+                elif self._completed.get(build_name, (None,))[0] == key:
+                    job = self._jobs[self._completed[build_name][1]]
+                    job["requests"] += 1
+                else:
+                    job = {
+                        "id": uuid.uuid4().hex,
+                        "key": None,
+                        "root": build["name"],
+                        "shell": build["shell"],
+                        "status": QUEUED,
+                        "requests": 1,
+                        "submitted_at": time.time(),
+                        "finished_at": None,
+                        "_build": build,
+                    }
+                    self._jobs[job["id"]] = job
+                    self._queued[build_name] = job["id"]
+                    self._queue.put(job["id"])
+                jobs.append(self._public(job))
+
+        return jobs
+
+    @staticmethod
+    def _public(job: Dict) -> Dict:
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def jobs(self) -> List[Dict]:
+        with self._lock:
+            return [self._public(job) for job in self._jobs.values()]
+
+    def _next_batch(self) -> Optional[List[str]]:
+        job_id = self._queue.get()
+        if job_id is None:
+            return None
+
+        # Everything queued meanwhile runs together so sources are staged once
+        batch = [job_id]
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job_id is None:
+                self._queue.put(None)
+                break
+            batch.append(job_id)
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            with self._lock:
+                jobs = [self._jobs[job_id] for job_id in batch]
+                for job in jobs:
+                    self._queued.pop((job["root"], job["shell"]), None)
+
+            try:
+                input_hash = self._input_hash()
+            except Exception as e:
+                print(f"[serve] Unable to hash build inputs: {e}")
+                input_hash = uuid.uuid4().hex
+
+            with self._lock:
+                pending = []
+                for job in jobs:
+                    job["key"] = get_build_key(input_hash, job["_build"])
+                    completed = self._completed.get((job["root"], job["shell"]))
+                    if completed and completed[0] == job["key"]:
+                        # Inputs changed back while the job was queued
+                        job["status"] = SUCCEEDED
+                        job["finished_at"] = time.time()
+                        continue
+                    job["status"] = RUNNING
+                    self._active[job["key"]] = job["id"]
+                    pending.append(job)
+                jobs = pending
+            if not jobs:
+                continue
+
+            try:
+                results = self.controller._run_builds([job["_build"] for job in jobs])
+            except (Exception, SystemExit) as e:
+                print(f"[serve] Exception occurred running builds: {e}")
+                results = [False] * len(jobs)
+
+            results = results or [False] * len(jobs)
+            with self._lock:
+                for job, success in zip(jobs, results):
+                    job["status"] = SUCCEEDED if success else FAILED
+                    job["finished_at"] = time.time()
+                    self._active.pop(job["key"], None)
+                    if success:
+                        self._completed[(job["root"], job["shell"])] = (
+                            job["key"],
+                            job["id"],
+                        )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "bartleby"
+
+    def _send(self, status: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        build_server: BuildServer = self.server.build_server
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+
+        if parts == ["health"]:
+            self._send(200, {"status": "ok"})
+        elif parts == ["jobs"]:
+            self._send(200, build_server.jobs())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = build_server.job(parts[1])
+            if job is None:
+                self._send(404, {"error": f"Job '{parts[1]}' not found"})
+            else:
+                self._send(200, job)
+        else:
+            self._send(404, {"error": f"Unknown path '{self.path}'"})
+
+    def do_POST(self):
+        build_server: BuildServer = self.server.build_server
+        if self.path.split("?")[0].rstrip("/") != "/builds":
+            self._send(404, {"error": f"Unknown path '{self.path}'"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            jobs = build_server.submit(
+                root_doc=request.get("root", "all"), shell=request.get("shell", "all")
+            )
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+
+        self._send(202, jobs)
+
+    def log_message(self, format, *args):
+        print(f"[serve] {format % args}")
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_http_server(
+    build_server: BuildServer, port: int = 8765, socket_path: str = None
+):
+    """Create the HTTP server for the build API.
+
+    Listens on ``socket_path`` if given, otherwise on ``127.0.0.1:port``.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        httpd = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        httpd.daemon_threads = True
+
+    httpd.build_server = build_server
+    return httpd
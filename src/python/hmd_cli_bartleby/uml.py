@@ -0,0 +1,266 @@
+"""Host-side rendering of inline PlantUML diagrams.
+
+Inline ``.. uml::`` blocks in the RST sources are otherwise rendered inside
+every build's container, once per builder and root document. With
+pre-rendering, the diagrams are collected from the docs view in
+``target/bartleby-docs`` before builds start, the ones missing from the
+cache are rendered once with the puml transform, split across parallel
+containers, and the blocks are replaced in the view by images of the
+rendered diagrams. Rendered diagrams are cached by the hash of their source
+and the transform image, so html, pdf and slides builds all use the same
+images.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import textwrap
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from .cache import get_cache_path
+from .hmd_cli_bartleby import get_image_key
+from .validate import DIRECTIVE, LITERAL_DIRECTIVES
+
+UML_DIR = "_uml"
+WORK_DIR = "bartleby-uml"
+IMAGE_SUFFIXES = [".png", ".svg"]
+# Options of the uml directive that the image directive understands
+IMAGE_OPTIONS = {"alt", "align", "height", "scale", "width", "name", "class"}
+# PlantUML names its output after the argument of the start line
+START_LINE = re.compile(r"^(\s*@start\w+)\b.*$")
+# Includes resolve against the document's directory, which the renderer lacks
+INCLUDE = re.compile(r"^\s*!(include|import)", re.MULTILINE)
+
+
+class Diagram(NamedTuple):
+    start: int
+    end: int
+    indent: str
+    source: str
+    options: Dict[str, str]
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha256(self.source.encode()).hexdigest()
+
+
+class UmlResult(NamedTuple):
+    diagrams: int
+    rendered: int
+    documents: int
+
+
+def _body_end(lines: List[str], start: int, indent: str) -> int:
+    """Return the line after the last non-blank line of a directive body."""
+    end = start + 1
+    for number in range(start + 1, len(lines)):
+        line = lines[number]
+        if not line.strip():
+            continue
+        if not (
+            line.startswith(indent) and len(line) - len(line.lstrip()) > len(indent)
+        ):
+            break
+        end = number + 1
+    return end
+
+
+def get_diagram_source(body: str) -> str:
+    """Wrap the body of a uml block in ``@startuml``/``@enduml`` if needed.
+
+    A name given on the start line is dropped, so that the rendered image is
+    named after the diagram's key.
+    """
+    body = body.strip("\n")
+    if not body.lstrip().startswith("@start"):
+        body = f"@startuml\n{body}\n@enduml"
+    start, _, rest = body.partition("\n")
+    return START_LINE.sub(r"\1", start) + "\n" + rest + "\n"
+
+
+def find_diagrams(text: str) -> List[Diagram]:
+    """Find the inline uml blocks of a document.
+
+    Blocks that name a file instead of having a body are skipped, as are
+    blocks shown inside literal directives and diagrams with ``!include``
+    or ``!import`` lines.
+    """
+    lines = text.splitlines()
+    diagrams = []
+    number = 0
+    while number < len(lines):
+        match = DIRECTIVE.match(lines[number])
+        if not match:
+            number += 1
+            continue
+        indent, directive, argument = match.groups()
+        end = _body_end(lines, number, indent)
+        if directive == "uml" and not argument:
+            options = {}
+            body = number + 1
+            while body < end and lines[body].strip().startswith(":"):
+                _, name, value = lines[body].strip().split(":", 2)
+                options[name] = value.strip()
+                body += 1
+            source = textwrap.dedent("\n".join(lines[body:end]))
+            if source.strip() and not INCLUDE.search(source):
+                diagrams.append(
+                    Diagram(number, end, indent, get_diagram_source(source), options)
+                )
+        if directive in LITERAL_DIRECTIVES:
+            number = end
+        else:
+            number += 1
+    return diagrams
+
+
+def replace_diagrams(text: str, diagrams: List[Diagram], images: Dict[str, str]):
+    """Replace uml blocks with references to their rendered images.
+
+    Blocks without an entry in ``images`` are left as they are. A caption
+    turns the image into a figure.
+    """
+    lines = text.splitlines()
+    for diagram in sorted(diagrams, key=lambda d: d.start, reverse=True):
+        if diagram.key not in images:
+            continue
+        indent = diagram.indent
+        caption = diagram.options.get("caption")
+        directive = "figure" if caption else "image"
+        block = [f"{indent}.. {directive}:: /{images[diagram.key]}"]
+        block += [
+            f"{indent}   :{name}: {value}".rstrip()
+            for name, value in diagram.options.items()
+            if name in IMAGE_OPTIONS
+        ]
+        if caption:
+            block += ["", f"{indent}   {caption}"]
+        lines[diagram.start : diagram.end] = block
+    return "\n".join(lines) + ("\n" if text.endswith("\n") else "")
+
+
+def _find_image(path: Path, key: str) -> Optional[Path]:
+    for suffix in IMAGE_SUFFIXES:
+        matches = list(path.rglob(f"{key}{suffix}"))
+        if matches:
+            return matches[0]
+    return None
+
+
+def _cached_image(cache_path: Path, key: str) -> Optional[Path]:
+    for suffix in IMAGE_SUFFIXES:
+        if (cache_path / f"{key}{suffix}").exists():
+            return cache_path / f"{key}{suffix}"
+    return None
+
+
+async def _render(sources: Dict[str, str], work_path: Path, image_name: str, jobs):
+    from .runner import transform_puml_async
+
+    input_path = work_path / "input"
+    output_path = work_path / "output"
+    for path in (input_path, output_path):
+        path.mkdir(parents=True, exist_ok=True)
+    for key, source in sources.items():
+        (input_path / f"{key}.puml").write_text(source)
+
+    files = sorted(f"{key}.puml" for key in sources)
+    batches = [files[i::jobs] for i in range(min(jobs, len(files)))]
+    return await asyncio.gather(
+        *[
+            transform_puml_async(batch, input_path, output_path, image_name)
+            for batch in batches
+        ]
+    )
+
+
+def render_diagrams(
+    sources: Dict[str, str], image_name: str, jobs: int = 1
+) -> Dict[str, Path]:
+    """Render the diagrams missing from the cache.
+
+    Args:
+        sources: Diagram sources by key
+        image_name: Transform image used to render the diagrams
+        jobs: Maximum number of puml containers to run at the same time
+
+    Returns:
+        The cached image of each diagram that could be rendered
+    """
+    cache_path = get_cache_path("uml", get_image_key(image_name))
+    cache_path.mkdir(exist_ok=True)
+
+    missing = {
+        key: source
+        for key, source in sources.items()
+        if _cached_image(cache_path, key) is None
+    }
+    if missing:
+        work_path = Path(os.getcwd()) / "target" / WORK_DIR
+        if work_path.exists():
+            shutil.rmtree(work_path)
+        asyncio.run(_render(missing, work_path, image_name, max(jobs or 1, 1)))
+        for key in missing:
+            rendered = _find_image(work_path / "output", key)
+            if rendered is None:
+                print(f"Unable to render inline diagram {key[:12]}")
+                continue
+            temp_path = cache_path / f".{key}{rendered.suffix}.{os.getpid()}"
+            shutil.copyfile(rendered, temp_path)
+            os.replace(temp_path, cache_path / f"{key}{rendered.suffix}")
+        shutil.rmtree(work_path)
+
+    images = {key: _cached_image(cache_path, key) for key in sources}
+    return {key: path for key, path in images.items() if path is not None}
+
+
+def prerender_uml(docs_path: Path, image_name: str, jobs: int = 1) -> UmlResult:
+    """Render the inline diagrams of a docs view and reference the images.
+
+    Documents with diagrams are rewritten by replacing the file, so that
+    hard links back to the original sources are left untouched.
+
+    Returns:
+        The number of distinct diagrams, how many had to be rendered and the
+        number of documents rewritten
+    """
+    documents = {}
+    for path in sorted(docs_path.rglob("*.rst")):
+        text = path.read_text()
+        diagrams = find_diagrams(text) if ".. uml::" in text else []
+        if diagrams:
+            documents[path] = (text, diagrams)
+
+    sources = {
+        diagram.key: diagram.source
+        for _, diagrams in documents.values()
+        for diagram in diagrams
+    }
+    if not sources:
+        return UmlResult(0, 0, 0)
+
+    cache_path = get_cache_path("uml", get_image_key(image_name))
+    cached = sum(1 for key in sources if _cached_image(cache_path, key))
+    images = render_diagrams(sources, image_name, jobs)
+
+    uml_path = docs_path / UML_DIR
+    uml_path.mkdir(exist_ok=True)
+    references = {}
+    for key, image in images.items():
+        dest = uml_path / image.name
+        if not dest.exists():
+            try:
+                os.link(image, dest)
+            except OSError:
+                shutil.copy2(image, dest)
+        references[key] = f"{UML_DIR}/{image.name}"
+
+    for path, (text, diagrams) in documents.items():
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+        temp_path.write_text(replace_diagrams(text, diagrams, references))
+        os.replace(temp_path, path)
+
+    return UmlResult(len(sources), len(images) - cached, len(documents))
@@ -0,0 +1,231 @@
+"""Pre-flight validation of RST sources on the host.
+
+Checks that toctree entries, includes, images and figures point at files
+that exist before any container is started. Documents are followed from
+the root documents of the requested builds through their toctrees, and
+each level of the tree is read in parallel against a single index of the
+docs directory. Paths that leave the docs directory are checked on the
+filesystem, and documents Sphinx generates during the build are not
+reported.
+"""
+
+import glob as globbing
+import os
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+SOURCE_SUFFIXES = [".rst", ".md", ".txt", ".ipynb"]
+IGNORED_DIRS = {"_build", "__pycache__", ".git"}
+
+DIRECTIVE = re.compile(r"^(\s*)\.\.\s+([\w:-]+)::\s*(.*?)\s*$")
+TOCTREE_ENTRY = re.compile(r"^(?:.*<(?P<target>[^<>]+)>|(?P<name>.+))$")
+PATH_DIRECTIVES = {"include", "literalinclude", "image", "figure"}
+# Directives whose bodies are not RST
+LITERAL_DIRECTIVES = {"code-block", "code", "sourcecode", "raw", "uml", "math"}
+# Documents Sphinx creates itself
+RESERVED_DOCNAMES = {"genindex", "modindex", "py-modindex", "search"}
+AUTOSUMMARY_TOCTREE = re.compile(r"^:toctree:\s*(.*?)\s*$")
+
+
+class ValidationError(NamedTuple):
+    path: str
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line}: {self.message}"
+
+
+def index_files(docs_path: Path) -> Set[str]:
+    """Return the paths of all files under ``docs_path``, relative and posix."""
+    files = set()
+    for root, dirs, names in os.walk(docs_path):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+        relative_root = Path(os.path.relpath(root, docs_path)).as_posix()
+        for name in names:
+            files.add(posixpath.normpath(posixpath.join(relative_root, name)))
+    return files
+
+
+def _resolve(docname: str, target: str) -> str:
+    if target.startswith("/"):
+        return posixpath.normpath(target.lstrip("/"))
+    return posixpath.normpath(posixpath.join(posixpath.dirname(docname), target))
+
+
+def _is_external(target: str) -> bool:
+    return "://" in target or target.startswith("data:")
+
+
+def _path_exists(target: str, files: Set[str], docs_path: Optional[Path]) -> bool:
+    """Check a resolved path, on the filesystem if it leaves the docs directory."""
+    if target == ".." or target.startswith("../"):
+        if docs_path is None:
+            return True
+        if "*" in target:
+            return bool(globbing.glob(str(docs_path / target)))
+        return (docs_path / target).exists()
+    if "*" in target:
+        return any(fnmatch(f, target) for f in files)
+    return target in files
+
+
+def _block(lines: List[str], start: int, indent: str) -> Iterable[Tuple[int, str]]:
+    """Yield the lines of the directive body starting after ``start``."""
+    for number in range(start + 1, len(lines)):
+        line = lines[number]
+        if line.strip() and not (
+            line.startswith(indent) and len(line) - len(line.lstrip()) > len(indent)
+        ):
+            return
+        yield number, line.strip()
+
+
+def scan_document(
+    docname: str, text: str, files: Set[str], docs_path: Path = None
+) -> Tuple[List[ValidationError], List[str]]:
+    """Check the directives of a single document.
+
+    Toctree entries for Sphinx's own pages and for pages generated by an
+    ``autosummary`` directive of the document are not reported.
+
+    Args:
+        docname: Path of the document relative to the docs directory,
+            without suffix
+        text: Content of the document
+        files: Index of the docs directory from :func:`index_files`
+        docs_path: The docs directory, to check paths outside of it; these
+            are assumed to exist when not given
+
+    Returns:
+        Tuple of (errors, docnames referenced from toctrees)
+    """
+    errors = []
+    children = []
+    # Missing toctree entries, kept until all generated directories are known
+    missing = []
+    generated = set()
+    source = next(
+        (docname + s for s in SOURCE_SUFFIXES if docname + s in files), docname
+    )
+    lines = text.splitlines()
+
+    skip_to = 0
+    for number, line in enumerate(lines):
+        if number < skip_to:
+            continue
+        match = DIRECTIVE.match(line)
+        if not match:
+            if line.rstrip().endswith("::") and not line.lstrip().startswith(".."):
+                indent = line[: len(line) - len(line.lstrip())]
+                skip_to = max([n + 1 for n, _ in _block(lines, number, indent)] or [0])
+            continue
+        indent, directive, argument = match.groups()
+
+        if directive in LITERAL_DIRECTIVES:
+            skip_to = max([n + 1 for n, _ in _block(lines, number, indent)] or [0])
+        elif directive == "autosummary":
+            for _, entry in _block(lines, number, indent):
+                toctree = AUTOSUMMARY_TOCTREE.match(entry)
+                if toctree:
+                    generated.add(_resolve(docname, toctree.group(1) or "."))
+        elif directive == "toctree":
+            glob = False
+            for entry_number, entry in _block(lines, number, indent):
+                if entry == ":glob:":
+                    glob = True
+                if not entry or entry.startswith(":"):
+                    continue
+                entry_match = TOCTREE_ENTRY.match(entry)
+                target = entry_match.group("target") or entry_match.group("name")
+                if (
+                    target == "self"
+                    or target in RESERVED_DOCNAMES
+                    or _is_external(target)
+                ):
+                    continue
+                child = _resolve(docname, target)
+                for suffix in SOURCE_SUFFIXES:
+                    child = child.removesuffix(suffix)
+
+                if glob and any(c in target for c in "*?["):
+                    matched = sorted(
+                        f.rsplit(".", 1)[0]
+                        for f in files
+                        if any(f.endswith(s) for s in SOURCE_SUFFIXES)
+                        and fnmatch(f.rsplit(".", 1)[0], child)
+                    )
+                    children.extend(m for m in matched if m != docname)
+                elif any(child + s in files for s in SOURCE_SUFFIXES):
+                    children.append(child)
+                else:
+                    missing.append((child, entry_number, target))
+
+        elif directive in PATH_DIRECTIVES:
+            # Standard docutils includes such as <isonum.txt>
+            if not argument or argument.startswith("<") or _is_external(argument):
+                continue
+            if not _path_exists(_resolve(docname, argument), files, docs_path):
+                errors.append(
+                    ValidationError(
+                        source, number + 1, f"{directive} path '{argument}' not found"
+                    )
+                )
+
+    for child, entry_number, target in missing:
+        if any(
+            directory == "." or child.startswith(f"{directory}/")
+            for directory in generated
+        ):
+            continue
+        errors.append(
+            ValidationError(
+                source,
+                entry_number + 1,
+                f"toctree references missing document '{target}'",
+            )
+        )
+
+    return errors, children
+
+
+def _read_document(docs_path: Path, files: Set[str], docname: str):
+    for suffix in SOURCE_SUFFIXES:
+        if docname + suffix in files:
+            if suffix != ".rst":
+                return [], []
+            text = (docs_path / (docname + suffix)).read_text(errors="replace")
+            return scan_document(docname, text, files, docs_path)
+    return [ValidationError(docname, 0, f"root document '{docname}' not found")], []
+
+
+def validate_docs(
+    docs_path: Path, root_docs: Iterable[str], jobs: int = None
+) -> List[ValidationError]:
+    """Validate every document reachable from ``root_docs``.
+
+    Returns:
+        The errors found, ordered by file and line
+    """
+    files = index_files(docs_path)
+    seen = set()
+    frontier = sorted(set(root_docs))
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while frontier:
+            seen.update(frontier)
+            results = executor.map(
+                lambda docname: _read_document(docs_path, files, docname), frontier
+            )
+            children = set()
+            for document_errors, document_children in results:
+                errors.extend(document_errors)
+                children.update(document_children)
+            frontier = sorted(children - seen)
+
+    return sorted(set(errors))
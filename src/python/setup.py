@@ -1,5 +1,6 @@
 import pathlib
 import shutil
+import sys
 
 from setuptools import find_packages, setup
 
@@ -33,6 +34,17 @@ if src_skills.exists() and src_skills.is_dir():
         shutil.rmtree(pkg_skills)
     shutil.copytree(src_skills, pkg_skills)
 
+# Generate the agent/skill catalog so bundled components are listed without
+# scanning the package directories at runtime
+sys.path.insert(0, str(pathlib.Path(__file__).parent))
+try:
+    from hmd_cli_bartleby.loaders.catalog import write_catalog
+except ImportError:
+    # PyYAML is required to parse component frontmatter
+    print("Warning: unable to generate agent/skill catalog, PyYAML not available.")
+else:
+    write_catalog(pathlib.Path(__file__).parent / "hmd_cli_bartleby")
+
 setup(
     name="hmd-cli-bartleby",
     version=version,
@@ -48,7 +60,12 @@ setup(
             "agents/*",
             "skills/**/*",
             "skills/*",
+            "catalog.json",
         ],
     },
     install_requires=[],
+    extras_require={
+        "images": ["Pillow"],
+        "pdf-chapters": ["pypdf"],
+    },
 )
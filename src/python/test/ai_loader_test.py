@@ -0,0 +1,243 @@
+import os
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+from hmd_cli_bartleby.loaders.ai_loader import AILoader
+from hmd_cli_bartleby.loaders.catalog import build_catalog, load_catalog, write_catalog
+from hmd_cli_bartleby.loaders.layered_loader import LayeredAILoader
+from hmd_cli_bartleby.loaders.name_index import NameIndex
+
+
+def _write_agent(path: Path, name: str = None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frontmatter = f"---\nname: {name}\n---\n" if name else ""
+    path.write_text(f"{frontmatter}Agent body\n")
+
+
+class TestNameIndex:
+    def test_exact_lookup_order(self, tmp_path):
+        _write_agent(tmp_path / "doc.md")
+        _write_agent(tmp_path / "doc.AGENT.md")
+        _write_agent(tmp_path / "doc" / "AGENT.md")
+        index = NameIndex(tmp_path, "AGENT.md")
+        assert index.find("doc") == tmp_path / "doc.md"
+
+    def test_directory_based_exact(self, tmp_path):
+        _write_agent(tmp_path / "rst-doc-expert" / "AGENT.md")
+        index = NameIndex(tmp_path, "AGENT.md")
+        assert index.find("rst-doc-expert") == tmp_path / "rst-doc-expert" / "AGENT.md"
+
+    def test_prefix_ranked_before_substring(self, tmp_path):
+        _write_agent(tmp_path / "my-rst-helper.md")
+        _write_agent(tmp_path / "rst-doc-expert.md")
+        _write_agent(tmp_path / "rst-a.md")
+        index = NameIndex(tmp_path, "AGENT.md")
+        assert index.ranked_matches("rst") == [
+            tmp_path / "rst-a.md",
+            tmp_path / "rst-doc-expert.md",
+            tmp_path / "my-rst-helper.md",
+        ]
+
+    def test_directory_without_marker_ignored(self, tmp_path):
+        (tmp_path / "empty").mkdir()
+        index = NameIndex(tmp_path, "AGENT.md")
+        assert index.find("empty") is None
+
+    def test_invalidated_on_mtime_change(self, tmp_path):
+        index = NameIndex(tmp_path, "AGENT.md", ttl=0)
+        assert index.find("late") is None
+        _write_agent(tmp_path / "late.md")
+        stat = os.stat(tmp_path)
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert index.find("late") == tmp_path / "late.md"
+
+    def test_invalidated_on_component_directory_change(self, tmp_path):
+        (tmp_path / "late").mkdir()
+        index = NameIndex(tmp_path, "AGENT.md", ttl=0)
+        assert index.find("late") is None
+        parent = os.stat(tmp_path)
+        _write_agent(tmp_path / "late" / "AGENT.md")
+        os.utime(tmp_path, ns=(parent.st_atime_ns, parent.st_mtime_ns))
+        stat = os.stat(tmp_path / "late")
+        os.utime(
+            tmp_path / "late", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000)
+        )
+        assert index.find("late") == tmp_path / "late" / "AGENT.md"
+
+    def test_lookups_within_ttl_skip_filesystem(self, tmp_path):
+        _write_agent(tmp_path / "doc.md")
+        index = NameIndex(tmp_path, "AGENT.md", ttl=60)
+        assert index.find("doc") == tmp_path / "doc.md"
+        with patch("os.scandir", side_effect=AssertionError("scanned")), patch(
+            "os.stat", side_effect=AssertionError("stat")
+        ):
+            assert index.find("doc") == tmp_path / "doc.md"
+            assert index.exact("doc") == tmp_path / "doc.md"
+
+    def test_persisted_index_reused(self, tmp_path):
+        agents = tmp_path / "agents"
+        _write_agent(agents / "doc.md")
+        index_path = tmp_path / "index.json"
+        NameIndex(agents, "AGENT.md", index_path).find("doc")
+        assert index_path.exists()
+
+        reloaded = NameIndex(agents, "AGENT.md", index_path)
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(
+                NameIndex, "refresh", lambda self: pytest.fail("index rescanned")
+            )
+            assert reloaded.find("doc") == agents / "doc.md"
+
+
+class TestAILoader:
+    def test_get_agent_path_fuzzy(self, tmp_path):
+        _write_agent(tmp_path / "agents" / "rst-doc-expert" / "AGENT.md")
+        loader = AILoader(tmp_path / "agents", tmp_path / "skills")
+        assert loader.get_agent_path("doc-exp").name == "AGENT.md"
+        assert loader.agent_exists("rst-doc-expert")
+        assert not loader.agent_exists("missing")
+
+    def test_get_agent_path_missing_raises(self, tmp_path):
+        loader = AILoader(tmp_path / "agents", tmp_path / "skills")
+        with pytest.raises(FileNotFoundError):
+            loader.get_agent_path("missing")
+
+    def test_list_agents_and_skills(self, tmp_path):
+        _write_agent(tmp_path / "agents" / "a.md", name="alpha")
+        _write_agent(tmp_path / "agents" / "b" / "AGENT.md")
+        _write_agent(tmp_path / "skills" / "s" / "SKILL.md")
+        loader = AILoader(tmp_path / "agents", tmp_path / "skills")
+        assert [a["name"] for a in loader.list_agents()] == ["alpha", "b"]
+        assert [s["name"] for s in loader.list_skills()] == ["s"]
+
+
+class TestCatalog:
+    def _make_package(self, tmp_path):
+        package_dir = tmp_path / "pkg"
+        _write_agent(package_dir / "agents" / "rst-doc-expert" / "AGENT.md", "rst")
+        _write_agent(package_dir / "skills" / "add-nerd" / "SKILL.md")
+        return package_dir
+
+    def test_build_catalog(self, tmp_path):
+        package_dir = self._make_package(tmp_path)
+        catalog = build_catalog(package_dir)
+        agent = catalog["agents"]["entries"][0]
+        assert agent == {
+            "metadata": {"name": "rst"},
+            "file": "agents/rst-doc-expert/AGENT.md",
+        }
+        assert catalog["skills"]["index"]["dirs"] == {"add-nerd": "add-nerd/SKILL.md"}
+
+    def test_loader_reads_bundled_components_from_catalog(self, tmp_path):
+        package_dir = self._make_package(tmp_path)
+        write_catalog(package_dir)
+        with patch("hmd_cli_bartleby.loaders.ai_loader.PACKAGE_DIR", package_dir):
+            with patch(
+                "hmd_cli_bartleby.loaders.ai_loader.load_catalog",
+                return_value=load_catalog(package_dir),
+            ):
+                loader = AILoader(package_dir / "agents", package_dir / "skills")
+
+        with patch("builtins.open", side_effect=AssertionError("file read")):
+            agents = loader.list_agents()
+            skills = loader.list_skills()
+            agent_path = loader.get_agent_path("rst-doc")
+
+        assert agents == [
+            {
+                "name": "rst",
+                "_file": str(package_dir / "agents" / "rst-doc-expert" / "AGENT.md"),
+            }
+        ]
+        assert skills[0]["name"] == "add-nerd"
+        assert agent_path == package_dir / "agents" / "rst-doc-expert" / "AGENT.md"
+
+    def test_user_locations_are_scanned(self, tmp_path):
+        package_dir = self._make_package(tmp_path)
+        write_catalog(package_dir)
+        _write_agent(tmp_path / "user" / "custom.md")
+        with patch("hmd_cli_bartleby.loaders.ai_loader.PACKAGE_DIR", package_dir):
+            loader = AILoader(tmp_path / "user", tmp_path / "skills")
+        assert [a["name"] for a in loader.list_agents()] == ["custom"]
+
+
+class TestLayeredAILoader:
+    def _make_locations(self, tmp_path):
+        bundled = tmp_path / "bundled"
+        project = tmp_path / "project"
+        _write_agent(bundled / "agents" / "shared.md", "shared")
+        _write_agent(bundled / "agents" / "bundled-only.md")
+        _write_agent(bundled / "skills" / "s" / "SKILL.md")
+        _write_agent(project / "agents" / "shared" / "AGENT.md", "shared")
+        return bundled, project
+
+    def test_later_locations_override(self, tmp_path):
+        bundled, project = self._make_locations(tmp_path)
+        loader = LayeredAILoader([bundled, project])
+        agents = {a["name"]: a for a in loader.list_agents()}
+        assert set(agents) == {"shared", "bundled-only"}
+        assert agents["shared"]["_location"] == str(project)
+        shared_path = project / "agents" / "shared" / "AGENT.md"
+        assert loader.get_agent_path("shared") == shared_path
+        bundled_path = bundled / "agents" / "bundled-only.md"
+        assert loader.get_agent_path("bundled") == bundled_path
+        assert [s["name"] for s in loader.list_skills()] == ["s"]
+
+    def test_listing_reads_only_frontmatter(self, tmp_path):
+        bundled, project = self._make_locations(tmp_path)
+        (project / "agents" / "big.md").write_text(
+            "---\nname: big\n---\n" + "x" * 100000
+        )
+        loader = LayeredAILoader([bundled, project])
+        read_sizes = []
+        real_open = open
+
+        def tracking_open(*args, **kwargs):
+            f = real_open(*args, **kwargs)
+            original_read = f.read
+            f.read = lambda *a: read_sizes.append(a) or original_read(*a)
+            return f
+
+        with patch("builtins.open", side_effect=tracking_open):
+            loader.list_agents()
+        assert read_sizes == []
+
+        metadata, content = loader.load_agent("big")
+        assert metadata["name"] == "big"
+        assert content.endswith("x" * 10)
+
+    def test_frontmatter_name_in_higher_layer_wins(self, tmp_path):
+        bundled, project = self._make_locations(tmp_path)
+        _write_agent(bundled / "agents" / "bar.md")
+        _write_agent(project / "agents" / "custom.md", "bar")
+        loader = LayeredAILoader([bundled, project])
+        agents = {a["name"]: a for a in loader.list_agents()}
+        assert agents["bar"]["_file"] == str(project / "agents" / "custom.md")
+        assert loader.get_agent_path("bar") == project / "agents" / "custom.md"
+
+    def test_merged_view_follows_layer_changes(self, tmp_path):
+        bundled, project = self._make_locations(tmp_path)
+        loader = LayeredAILoader([bundled, project])
+        for location in loader.loaders:
+            location.agent_index.ttl = 0
+        assert "late" not in {a["name"] for a in loader.list_agents()}
+
+        _write_agent(project / "agents" / "late.md")
+        stat = os.stat(project / "agents")
+        os.utime(
+            project / "agents",
+            ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000),
+        )
+        assert "late" in {a["name"] for a in loader.list_agents()}
+
+    def test_no_locations(self):
+        loader = LayeredAILoader([])
+        assert loader.list_agents() == []
+        with pytest.raises(FileNotFoundError):
+            loader.load_agent("missing")
+
+    def test_missing_agent_raises(self, tmp_path):
+        loader = LayeredAILoader([tmp_path])
+        assert not loader.agent_exists("missing")
+        with pytest.raises(FileNotFoundError):
+            loader.get_agent_path("missing")
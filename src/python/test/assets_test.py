@@ -0,0 +1,92 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+from hmd_cli_bartleby.assets import fetch_asset, get_asset_name
+from hmd_cli_bartleby.hmd_cli_bartleby import transform_config
+
+
+class _LogoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def logo_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _LogoHandler)
+    server.requests = []
+    server.etag = '"v1"'
+    server.body = b"logo-v1"
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/assets/logo.PNG"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestFetchAsset:
+    def test_revalidates_with_etag(self, tmp_path, logo_server):
+        url = logo_server.url
+        path = fetch_asset(url, tmp_path)
+        assert path.name == get_asset_name(url) and path.suffix == ".png"
+        assert path.read_bytes() == b"logo-v1"
+
+        assert fetch_asset(url, tmp_path) == path
+        assert logo_server.requests == [None]
+
+        assert fetch_asset(url, tmp_path, max_age=0) == path
+        assert logo_server.requests == [None, '"v1"']
+
+        logo_server.etag = '"v2"'
+        logo_server.body = b"logo-v2"
+        assert fetch_asset(url, tmp_path, max_age=0).read_bytes() == b"logo-v2"
+
+    def test_offline_uses_cached_copy(self, tmp_path, logo_server):
+        url = logo_server.url
+        path = fetch_asset(url, tmp_path)
+        logo_server.shutdown()
+        logo_server.server_close()
+
+        assert fetch_asset(url, tmp_path, max_age=0) == path
+        missing = url.replace("logo", "other")
+        assert fetch_asset(missing, tmp_path, max_age=0) is None
+
+
+class TestTransformConfigAssets:
+    def test_logos_mounted_from_cache(self, tmp_path, monkeypatch, logo_server):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("HMD_BARTLEBY_CACHE_DIR", str(tmp_path / "cache"))
+        context = {"name": "index", "shell": "html", "root_doc": "index"}
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+            with transform_config(
+                name="repo",
+                version="1.0",
+                transform_instance_context=context,
+                image_name="image",
+                default_logo=logo_server.url,
+                html_default_logo="logo.png",
+            ) as (_, compose):
+                service = compose["services"]["bartleby_transform"]
+
+        name = get_asset_name(logo_server.url)
+        assert service["environment"]["DEFAULT_LOGO"] == f"/hmd_transform/assets/{name}"
+        assert service["environment"]["HTML_DEFAULT_LOGO"] == "logo.png"
+        assert {
+            "type": "bind",
+            "source": str(tmp_path / "cache" / "assets"),
+            "target": "/hmd_transform/assets",
+            "read_only": True,
+        } in service["volumes"]
@@ -0,0 +1,126 @@
+import json
+import textwrap
+from unittest.mock import patch
+from hmd_cli_bartleby.autodoc import (
+    build_stubs,
+    extract_module,
+    get_root_names,
+    render_stub,
+)
+
+SOURCE = textwrap.dedent('''
+    """Example module."""
+    import numpy as np
+    from .types import Frame
+
+    LIMIT = 10
+    FACTOR = np.float32(2)
+
+
+    def load(path: Frame, scale: float = FACTOR, *, strict=True) -> np.ndarray:
+        """Load a frame."""
+        return np.load(path)
+
+
+    class Loader(Frame):
+        """Loads frames."""
+
+        cache: dict = {}
+
+        @property
+        def size(self) -> int:
+            """Number of frames."""
+            return 0
+
+        @size.setter
+        def size(self, value):
+            pass
+
+        async def fetch(self, key):
+            return await key
+
+
+    class CachedLoader(Loader, np.ndarray):
+        pass
+
+
+    class LoadError(ValueError):
+        pass
+    ''')
+
+
+class TestExtractModule:
+    def test_signatures_and_docstrings(self):
+        module = extract_module(SOURCE)
+        assert module["docstring"] == "Example module."
+        members = {m["name"]: m for m in module["members"]}
+        assert members["LIMIT"]["value"] == "10"
+        assert members["FACTOR"]["value"] == "..."
+        assert members["load"]["signature"] == (
+            "path: Frame, scale: float=..., *, strict=True"
+        )
+        assert members["load"]["returns"] == "np.ndarray"
+        assert members["Loader"]["bases"] == ["Frame"]
+        assert members["Loader"]["docstring"] == "Loads frames."
+
+    def test_stub_imports_without_dependencies(self):
+        namespace = {}
+        exec(render_stub(extract_module(SOURCE)), namespace)
+
+        assert namespace["__doc__"] == "Example module."
+        assert namespace["LIMIT"] == 10
+        assert namespace["load"].__doc__ == "Load a frame."
+        assert namespace["load"].__annotations__["return"] == "np.ndarray"
+        assert namespace["Loader"].size.__doc__ == "Number of frames."
+
+    def test_stub_keeps_bases(self):
+        namespace = {}
+        exec(render_stub(extract_module(SOURCE), "pkg.loader"), namespace)
+
+        (frame,) = namespace["Loader"].__bases__
+        assert (frame.__module__, frame.__qualname__) == ("pkg.types", "Frame")
+        loader, array = namespace["CachedLoader"].__bases__
+        assert loader is namespace["Loader"]
+        assert (array.__module__, array.__qualname__) == ("numpy", "ndarray")
+        assert namespace["LoadError"].__bases__ == (ValueError,)
+
+
+class TestBuildStubs:
+    def test_writes_tree_and_reuses_cache(self, tmp_path):
+        python_path = tmp_path / "repo" / "src" / "python"
+        package = python_path / "pkg"
+        package.mkdir(parents=True)
+        (package / "__init__.py").write_text('"""Package."""\n')
+        (package / "loader.py").write_text(SOURCE)
+        stubs_path = tmp_path / "stubs"
+
+        build_stubs([python_path], stubs_path)
+        assert (stubs_path / "repo" / "pkg" / "loader.py").exists()
+        index = json.loads((stubs_path / "api.json").read_text())
+        assert sorted(index["repo"]) == ["pkg", "pkg.loader"]
+
+        (package / "loader.py").unlink()
+        with patch("hmd_cli_bartleby.autodoc._extract_file") as mock_extract:
+            build_stubs([python_path], stubs_path)
+        mock_extract.assert_not_called()
+        assert not (stubs_path / "repo" / "pkg" / "loader.py").exists()
+        assert (stubs_path / "repo" / "pkg" / "__init__.py").exists()
+
+    def test_gathered_roots_kept_apart(self, tmp_path):
+        python_paths = []
+        for repo in ("first", "second"):
+            package = tmp_path / repo / "src" / "python" / "pkg"
+            package.mkdir(parents=True)
+            (package / "__init__.py").write_text(f'"""{repo}."""\n')
+            python_paths.append(package.parent)
+        stubs_path = tmp_path / "stubs"
+
+        build_stubs(python_paths, stubs_path)
+        for repo in ("first", "second"):
+            init = (stubs_path / repo / "pkg" / "__init__.py").read_text()
+            assert init.startswith(f"'{repo}.'")
+        assert get_root_names(python_paths + [tmp_path / "first"]) == [
+            "first",
+            "second",
+            "first-2",
+        ]
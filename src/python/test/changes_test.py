@@ -0,0 +1,44 @@
+import json
+import os
+from hmd_cli_bartleby.changes import CHANGES_FILENAME, get_state_path
+from hmd_cli_bartleby.output import make_staging_path, publish_output
+
+
+def _publish(tmp_path, files):
+    staging = make_staging_path("index-html", tmp_path)
+    for name, content in files.items():
+        (staging / name).parent.mkdir(parents=True, exist_ok=True)
+        (staging / name).write_text(content)
+    return publish_output(staging, "index", "html", tmp_path / "target" / "bartleby")
+
+
+class TestPublishChanges:
+    def test_unchanged_files_keep_previous_copy(self, tmp_path):
+        dest = _publish(
+            tmp_path,
+            {"index.html": "v1", "_static/logo.png": "logo", "old.html": "old"},
+        )
+        logo = os.stat(dest / "_static" / "logo.png")
+
+        dest = _publish(
+            tmp_path,
+            {"index.html": "v2", "_static/logo.png": "logo", "new.html": "new"},
+        )
+
+        new_logo = os.stat(dest / "_static" / "logo.png")
+        assert (new_logo.st_ino, new_logo.st_mtime_ns) == (
+            logo.st_ino,
+            logo.st_mtime_ns,
+        )
+        assert (dest / "index.html").read_text() == "v2"
+
+        state_path = get_state_path(tmp_path / "target" / "bartleby", "index", "html")
+        changes = json.loads((state_path / CHANGES_FILENAME).read_text())
+        assert changes["added"] == ["new.html"]
+        assert changes["modified"] == ["index.html"]
+        assert changes["removed"] == ["old.html"]
+        assert changes["unchanged"] == 1
+
+    def test_first_publish_adds_everything(self, tmp_path, capsys):
+        _publish(tmp_path, {"index.html": "v1"})
+        assert "1 added, 0 modified, 0 removed, 0 unchanged" in capsys.readouterr().out
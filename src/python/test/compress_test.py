@@ -0,0 +1,61 @@
+import gzip
+import os
+from hmd_cli_bartleby.compress import get_compressed_store_path, precompress_tree
+from hmd_cli_bartleby.output import make_staging_path, publish_output
+
+PAGE = "<html>" + "documentation " * 200 + "</html>"
+
+
+def _build(staging, files):
+    for name, content in files.items():
+        path = staging / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+class TestPrecompressTree:
+    def test_writes_and_reuses_siblings(self, tmp_path):
+        output_path = tmp_path / "target" / "bartleby"
+        files = {"index.html": PAGE, "_static/small.css": "a {}", "logo.png": PAGE}
+
+        first = tmp_path / "first"
+        _build(first, files)
+        result = precompress_tree(first, output_path)
+        assert (result.files, result.compressed) == (1, 1)
+        assert gzip.decompress((first / "index.html.gz").read_bytes()) == (
+            PAGE.encode()
+        )
+        assert not (first / "_static" / "small.css.gz").exists()
+        assert not (first / "logo.png.gz").exists()
+
+        second = tmp_path / "second"
+        _build(second, files)
+        result = precompress_tree(second, output_path)
+        assert (result.compressed, result.reused) == (0, 1)
+        assert os.path.samefile(first / "index.html.gz", second / "index.html.gz")
+
+    def test_unused_entries_are_removed(self, tmp_path):
+        output_path = tmp_path / "target" / "bartleby"
+        build = tmp_path / "build"
+        _build(build, {"index.html": PAGE})
+        precompress_tree(build, output_path)
+        store_path = get_compressed_store_path(output_path)
+        assert len(list(store_path.glob("*/*"))) == 1
+
+        (build / "index.html.gz").unlink()
+        _build(build, {"index.html": PAGE + "changed"})
+        precompress_tree(build, output_path)
+        assert len(list(store_path.glob("*/*"))) == 1
+
+
+class TestPublishPrecompressed:
+    def test_only_html_builds(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for shell in ("html", "pdf"):
+            staging = make_staging_path(f"index-{shell}")
+            _build(staging, {"index.html": PAGE})
+            publish_output(staging, "index", shell, precompress=True)
+
+        output_path = tmp_path / "target" / "bartleby" / "index"
+        assert (output_path / "html" / "index.html.gz").exists()
+        assert not (output_path / "pdf" / "index.html.gz").exists()
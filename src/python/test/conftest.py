@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def bartleby_cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "bartleby_cache"
+    monkeypatch.setenv("HMD_BARTLEBY_CACHE_DIR", str(cache_dir))
+    return cache_dir
@@ -0,0 +1,58 @@
+import os
+from hmd_cli_bartleby.compress import get_compressed_store_path, precompress_tree
+from hmd_cli_bartleby.dedup import dedup_output, format_size, get_store_path
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+class TestDedupOutput:
+    def test_links_identical_assets(self, tmp_path):
+        output = tmp_path / "target" / "bartleby"
+        logo = b"x" * 1000
+        first = _write(output / "index" / "html" / "_static" / "logo.png", logo)
+        second = _write(output / "guide" / "html" / "_images" / "logo.png", logo)
+        third = _write(output / "index" / "pdf" / "cover.png", logo)
+        page = _write(output / "index" / "html" / "index.html", b"x" * 1000)
+
+        result = dedup_output(output)
+
+        assert result.files == 3
+        assert result.bytes_saved == 2000
+        assert os.path.samefile(first, second) and os.path.samefile(first, third)
+        assert not os.path.samefile(first, page)
+        assert len(list(get_store_path(output).glob("*/*"))) == 1
+
+        assert dedup_output(output).linked == 0
+
+    def test_unused_assets_removed_from_store(self, tmp_path):
+        output = tmp_path / "target" / "bartleby"
+        style = _write(output / "index" / "html" / "_static" / "site.css", b"body {}")
+        dedup_output(output)
+
+        style.unlink()
+        dedup_output(output)
+        assert list(get_store_path(output).glob("*/*")) == []
+
+    def test_links_between_stores_are_not_uses(self, tmp_path):
+        output = tmp_path / "target" / "bartleby"
+        html = output / "index" / "html"
+        script = _write(html / "_static" / "app.js", b"var a = 1;\n" * 200)
+        precompress_tree(html, output)
+        dedup_output(output)
+        sibling = html / "_static" / "app.js.gz"
+        assert sibling.stat().st_nlink == 3
+
+        script.unlink()
+        sibling.unlink()
+        dedup_output(output)
+        precompress_tree(html, output)
+        assert list(get_store_path(output).glob("*/*")) == []
+        assert list(get_compressed_store_path(output).glob("*/*")) == []
+
+    def test_format_size(self):
+        assert format_size(512) == "512 B"
+        assert format_size(3 * 1024 * 1024) == "3.0 MB"
@@ -0,0 +1,180 @@
+import asyncio
+import io
+import tarfile
+from unittest.mock import patch
+from hmd_cli_bartleby.distributed import (
+    _tar_filter,
+    get_container_args,
+    parse_docker_hosts,
+    run_distributed,
+    write_copies,
+)
+from hmd_cli_bartleby.hmd_cli_bartleby import get_compose
+from hmd_cli_bartleby.runner import BuildResult
+
+
+def _compose(tmp_path, pip_secret=None, **kwargs):
+    return get_compose(
+        image_name="image:stable",
+        instance_name="repo_index-html",
+        transform_instance_context={"name": "index", "shell": "html"},
+        environment="local",
+        region="reg1",
+        customer_code="hmd",
+        deployment_id="aaa",
+        account="",
+        autodoc=bool(pip_secret),
+        doc_repo="repo",
+        doc_repo_version="1.0",
+        input_path=str(tmp_path),
+        output_path=str(tmp_path / "target" / "bartleby"),
+        pip_secret=pip_secret,
+        **kwargs,
+    )
+
+
+class TestParseDockerHosts:
+    def test_hosts_with_concurrency(self):
+        assert parse_docker_hosts("tcp://a:2375=4, ssh://b ,") == [
+            ("tcp://a:2375", 4),
+            ("ssh://b", 1),
+        ]
+
+    def test_empty(self):
+        assert parse_docker_hosts(None) == []
+
+
+class TestGetContainerArgs:
+    def test_binds_become_copies(self, tmp_path):
+        args, copies = get_container_args(_compose(tmp_path))
+        assert args[:2] == ["--name", "bartleby-inst_repo_index-html"]
+        assert args[-1] == "image:stable"
+        assert "BARTLEBY_SHELL=html" in args
+        assert copies == [{"source": str(tmp_path), "target": "/hmd_transform/input"}]
+
+    def test_secrets_copied_and_env_rewritten(self, tmp_path):
+        args, copies = get_container_args(_compose(tmp_path, pip_secret="/pip.conf"))
+        assert "PIP_CONF=/hmd_transform/secrets/pip_url" in args
+        assert {
+            "source": "/pip.conf",
+            "target": "/hmd_transform/secrets/pip_url",
+        } in copies
+
+    def test_local_caches_not_copied(self, tmp_path):
+        compose = _compose(tmp_path)
+        service = compose["services"]["bartleby_transform"]
+        service["volumes"].append(
+            {
+                "type": "bind",
+                "source": "/cache/pip",
+                "target": "/hmd_transform/pip_cache",
+            }
+        )
+        service["volumes"].append(
+            {
+                "type": "bind",
+                "source": "/cache/fonts",
+                "target": "/hmd_transform/font_cache",
+            }
+        )
+        service["environment"]["PIP_CACHE_DIR"] = "/hmd_transform/pip_cache"
+        service["environment"]["XDG_CACHE_HOME"] = "/hmd_transform/font_cache"
+        args, copies = get_container_args(compose)
+        assert all(c["target"] != "/hmd_transform/pip_cache" for c in copies)
+        assert all(c["target"] != "/hmd_transform/font_cache" for c in copies)
+        assert not any(a.startswith("PIP_CACHE_DIR=") for a in args)
+        assert not any(a.startswith("XDG_CACHE_HOME=") for a in args)
+
+    def test_tmpfs_becomes_container_tmpfs(self, tmp_path):
+        compose = _compose(tmp_path, tmpfs_size=512 * 1024**2)
+        args, copies = get_container_args(compose)
+        index = args.index("--tmpfs")
+        assert args[index + 1] == f"/hmd_transform/scratch:size={512 * 1024**2}"
+        assert "BARTLEBY_SCRATCH=/hmd_transform/scratch" in args
+        assert all(c["target"] != "/hmd_transform/scratch" for c in copies)
+
+
+class TestWriteCopies:
+    def test_arcnames_match_container_targets(self, tmp_path):
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "index.rst").write_text("Title")
+        (tmp_path / "docs" / ".git").mkdir()
+        (tmp_path / "pip.conf").write_text("[global]")
+        compose = _compose(
+            tmp_path,
+            pip_secret=str(tmp_path / "pip.conf"),
+            input_paths=["docs"],
+        )
+        _, copies = get_container_args(compose)
+
+        buffer = io.BytesIO()
+        write_copies(buffer, copies, [tmp_path / "docs" / ".git"])
+        buffer.seek(0)
+        with tarfile.open(fileobj=buffer) as tar:
+            members = {m.name: m for m in tar.getmembers()}
+            names = list(members)
+
+        for copy in copies:
+            assert copy["target"].lstrip("/") in members
+        assert "hmd_transform/input/docs/index.rst" in names
+        assert "hmd_transform/secrets/pip_url" in names
+        assert not any(".git" in n for n in names)
+        for parent in ("hmd_transform", "hmd_transform/secrets", "hmd_transform/input"):
+            assert members[parent].isdir()
+            children = [n for n in names if n.startswith(parent + "/")]
+            assert all(names.index(parent) < names.index(c) for c in children)
+
+
+class TestTarFilter:
+    def test_excludes_paths(self, tmp_path):
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "index.rst").write_text("Title")
+        (tmp_path / ".git").mkdir()
+        (tmp_path / ".git" / "HEAD").write_text("ref")
+        (tmp_path / "target" / "bartleby").mkdir(parents=True)
+        (tmp_path / "target" / "bartleby" / "index.html").write_text("html")
+
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w|") as tar:
+            tar.add(
+                str(tmp_path),
+                arcname="input",
+                filter=_tar_filter(
+                    tmp_path,
+                    "input",
+                    [tmp_path / ".git", tmp_path / "target" / "bartleby"],
+                ),
+            )
+
+        buffer.seek(0)
+        with tarfile.open(fileobj=buffer) as tar:
+            names = set(tar.getnames())
+        assert "input/docs/index.rst" in names
+        assert "input/target" in names
+        assert not any(n.startswith("input/.git") for n in names)
+        assert not any(n.startswith("input/target/bartleby") for n in names)
+
+
+class TestRunDistributed:
+    def test_respects_per_host_concurrency(self):
+        running = {}
+        peaks = {}
+
+        async def fake_remote(host, **kwargs):
+            running[host] = running.get(host, 0) + 1
+            peaks[host] = max(peaks.get(host, 0), running[host])
+            await asyncio.sleep(0.01)
+            running[host] -= 1
+            return BuildResult(True, 0.0)
+
+        transforms = [
+            {"transform_instance_context": {"name": f"r{i}", "shell": "html"}}
+            for i in range(6)
+        ]
+        with patch("hmd_cli_bartleby.distributed.transform_remote", fake_remote):
+            results = asyncio.run(
+                run_distributed(transforms, [("tcp://a", 2), ("tcp://b", 1)])
+            )
+
+        assert all(r.success for r in results)
+        assert peaks == {"tcp://a": 2, "tcp://b": 1}
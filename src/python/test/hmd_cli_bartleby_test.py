@@ -16,6 +16,7 @@ from hmd_cli_bartleby.controller import (
     _cleanup_staged_sources,
     _validate_source_paths,
 )
+from hmd_cli_bartleby.dedup import DedupResult
 
 
 class TestGetDocuments:
@@ -648,6 +649,18 @@ class TestRunBuilds:
         ctrl.app.pargs.pdf_default_logo = None
         ctrl.app.pargs.document_title = None
         ctrl.app.pargs.timestamp_title = False
+        ctrl.app.pargs.jobs = 1
+        ctrl.app.pargs.docker_hosts = None
+        ctrl.app.pargs.runner = "docker"
+        ctrl.app.pargs.no_preflight = False
+        ctrl.app.pargs.no_dedup = False
+        ctrl.app.pargs.build_cache = None
+        ctrl.app.pargs.precompress = False
+        ctrl.app.pargs.shard_search_index = False
+        ctrl.app.pargs.pdf_chapters = False
+        ctrl.app.pargs.tmpfs_size = None
+        ctrl.app.pargs.optimize_images = False
+        ctrl.app.pargs.prerender_uml = False
         return ctrl
 
     @patch("hmd_cli_bartleby.controller.read_manifest", return_value={})
@@ -785,3 +798,87 @@ class TestRunBuilds:
             ctrl._run_builds(builds)
 
         mock_transform.assert_called_once()
+
+    @patch("hmd_cli_bartleby.controller.read_manifest", return_value={})
+    @patch.object(LocalController, "_run_transform")
+    def test_broken_reference_fails_before_build(
+        self, mock_transform, mock_manifest, tmp_path, capsys
+    ):
+        ctrl = self._make_controller()
+
+        with patch("os.getcwd", return_value=str(tmp_path)):
+            docs_path = tmp_path / "docs"
+            docs_path.mkdir()
+            (docs_path / "index.rst").write_text(".. toctree::\n\n   missing\n")
+
+            builds = [
+                {"name": "index", "shell": "html", "root_doc": "index", "config": {}}
+            ]
+            with pytest.raises(SystemExit):
+                ctrl._run_builds(builds)
+
+        mock_transform.assert_not_called()
+        assert "index.rst:3" in capsys.readouterr().out
+
+    @patch("hmd_cli_bartleby.controller.read_manifest", return_value={})
+    @patch.object(LocalController, "_run_transform", return_value=True)
+    def test_gathered_docs_validated(self, mock_transform, mock_manifest, tmp_path):
+        ctrl = self._make_controller()
+        ctrl.app.pargs.gather = "hmd-lib-demo"
+        ctrl.app.pargs.no_dedup = True
+
+        def fake_gather(gather):
+            (tmp_path / "docs" / "hmd-lib-demo").mkdir()
+            (tmp_path / "docs" / "hmd-lib-demo" / "index.rst").write_text("Demo\n")
+
+        with patch("os.getcwd", return_value=str(tmp_path)), patch(
+            "hmd_cli_bartleby.controller.gather_repos", side_effect=fake_gather
+        ) as mock_gather:
+            docs_path = tmp_path / "docs"
+            docs_path.mkdir()
+            (docs_path / "index.rst").write_text(
+                ".. toctree::\n\n   hmd-lib-demo/index\n"
+            )
+
+            builds = [
+                {"name": "index", "shell": shell, "root_doc": "index", "config": {}}
+                for shell in ("html", "pdf")
+            ]
+            ctrl._run_builds(builds)
+
+        mock_gather.assert_called_once_with("hmd-lib-demo")
+        assert mock_transform.call_count == 2
+
+    @patch.object(LocalController, "_run_transform")
+    def test_invalid_tmpfs_size_fails_before_build(self, mock_transform):
+        ctrl = self._make_controller()
+        ctrl.app.pargs.tmpfs_size = "lots"
+
+        with pytest.raises(SystemExit, match="invalid size 'lots'"):
+            ctrl._run_builds([])
+
+        mock_transform.assert_not_called()
+
+    @patch("hmd_cli_bartleby.controller.read_manifest", return_value={})
+    @patch.object(LocalController, "_run_transform", return_value=True)
+    def test_no_dedup_skips_dedup(self, mock_transform, mock_manifest, tmp_path):
+        ctrl = self._make_controller()
+
+        with patch("os.getcwd", return_value=str(tmp_path)):
+            docs_path = tmp_path / "docs"
+            docs_path.mkdir()
+            (docs_path / "index.rst").write_text("Title\n=====\n")
+
+            builds = [
+                {"name": "index", "shell": "html", "root_doc": "index", "config": {}}
+            ]
+            with patch(
+                "hmd_cli_bartleby.dedup.dedup_output", return_value=DedupResult(1, 0, 0)
+            ) as mock_dedup:
+                ctrl._run_builds(builds)
+                mock_dedup.assert_called_once()
+
+                mock_dedup.reset_mock()
+                ctrl.app.pargs.no_dedup = True
+                ctrl._run_builds(builds)
+                mock_dedup.assert_not_called()
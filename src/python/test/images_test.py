@@ -0,0 +1,82 @@
+import os
+import random
+from unittest.mock import patch
+import pytest
+from hmd_cli_bartleby.hmd_cli_bartleby import transform_config
+from hmd_cli_bartleby.images import build_overlay, check_pillow, get_overlay_path
+
+
+def _noise(size):
+    rng = random.Random(0)
+    return bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3))
+
+
+@pytest.fixture
+def docs_path(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setenv("HMD_BARTLEBY_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("HMD_BARTLEBY_IMAGE_MAX_SIZE", "100")
+    docs = tmp_path / "docs"
+    (docs / "images").mkdir(parents=True)
+    (docs / "index.rst").write_text("Title\n=====\n")
+    image = Image.frombytes("RGB", (400, 200), _noise((400, 200)))
+    image.save(docs / "images" / "large.png", dpi=(144, 144))
+    Image.new("RGB", (10, 10)).save(docs / "images" / "small.png")
+    return docs
+
+
+class TestCheckPillow:
+    def test_missing_pillow_exits(self):
+        with patch("importlib.util.find_spec", return_value=None):
+            with pytest.raises(SystemExit, match="images"):
+                check_pillow()
+
+
+class TestBuildOverlay:
+    def test_optimizes_and_links(self, docs_path):
+        from PIL import Image
+
+        overlay_path = get_overlay_path(docs_path.parent)
+        result = build_overlay(docs_path, overlay_path)
+        assert (result.images, result.optimized) == (2, 1)
+        assert result.bytes_saved > 0
+
+        with Image.open(overlay_path / "images" / "large.png") as image:
+            assert image.size == (100, 50)
+            assert round(image.info["dpi"][0]) == 36
+        assert os.path.samefile(
+            overlay_path / "images" / "small.png", docs_path / "images" / "small.png"
+        )
+        assert os.path.samefile(overlay_path / "index.rst", docs_path / "index.rst")
+
+    def test_cached_by_source_hash(self, docs_path):
+        overlay_path = get_overlay_path(docs_path.parent)
+        build_overlay(docs_path, overlay_path)
+        optimized = (overlay_path / "images" / "large.png").stat().st_ino
+
+        with patch("hmd_cli_bartleby.images.optimize_image") as mock_optimize:
+            result = build_overlay(docs_path, overlay_path)
+        mock_optimize.assert_not_called()
+        assert result.optimized == 1
+        assert (overlay_path / "images" / "large.png").stat().st_ino == optimized
+
+
+class TestTransformConfigOverlay:
+    def test_overlay_mounted_as_docs(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "docs").mkdir()
+        get_overlay_path().mkdir(parents=True)
+        context = {"name": "index", "shell": "html", "root_doc": "index"}
+        for full_context in (False, True):
+            with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+                with transform_config(
+                    name="repo",
+                    version="1.0",
+                    transform_instance_context=context,
+                    image_name="image",
+                    optimize_images=True,
+                    full_context=full_context,
+                ) as (_, compose):
+                    volumes = compose["services"]["bartleby_transform"]["volumes"]
+            docs = [v for v in volumes if v["target"] == "/hmd_transform/input/docs"]
+            assert [v["source"] for v in docs] == [str(get_overlay_path())]
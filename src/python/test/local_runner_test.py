@@ -0,0 +1,273 @@
+import os
+import sys
+import time
+import pytest
+from concurrent.futures import Future
+from contextlib import contextmanager
+from unittest.mock import patch
+from hmd_cli_bartleby.hmd_cli_bartleby import get_compose
+from hmd_cli_bartleby.local_runner import (
+    check_local_transform,
+    get_local_env,
+    run_entry_point,
+    run_local,
+)
+
+
+def _compose(tmp_path, pip_secret=None, **kwargs):
+    return get_compose(
+        image_name="image:stable",
+        instance_name="repo_index-html",
+        transform_instance_context={"name": "index", "shell": "html"},
+        environment="local",
+        region="reg1",
+        customer_code="hmd",
+        deployment_id="aaa",
+        account="",
+        autodoc=bool(pip_secret),
+        doc_repo="repo",
+        doc_repo_version="1.0",
+        input_path=str(tmp_path),
+        output_path=str(tmp_path / "target" / "bartleby"),
+        pip_secret=pip_secret,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def entry_module(tmp_path, monkeypatch):
+    module_path = tmp_path / "modules"
+    module_path.mkdir()
+    (module_path / "fake_bartleby_entry.py").write_text(
+        "import os, sys\n"
+        "def main():\n"
+        "    print('building', os.environ['BARTLEBY_SHELL'])\n"
+        "    return int(os.environ.get('FAKE_EXIT', '0'))\n"
+    )
+    monkeypatch.syspath_prepend(str(module_path))
+    monkeypatch.setenv("HMD_BARTLEBY_LOCAL_ENTRY", "fake_bartleby_entry:main")
+    yield "fake_bartleby_entry:main"
+    sys.modules.pop("fake_bartleby_entry", None)
+
+
+class _InlineExecutor:
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class TestGetLocalEnv:
+    def test_paths_point_at_host(self, tmp_path):
+        env = get_local_env(_compose(tmp_path, pip_secret="/pip.conf"))
+        assert env["BARTLEBY_SHELL"] == "html"
+        assert env["PIP_CONF"] == "/pip.conf"
+        assert env["HMD_TRANSFORM_INPUT_PATH"] == str(tmp_path)
+        assert env["HMD_TRANSFORM_OUTPUT_PATH"] == str(tmp_path / "target" / "bartleby")
+
+    def test_stub_search_path_points_at_host(self, tmp_path):
+        stubs = tmp_path / "target" / "autodoc_stubs"
+        compose = _compose(
+            tmp_path,
+            autodoc_stubs=str(stubs),
+            autodoc_stub_roots=["repo", "other"],
+        )
+        env = get_local_env(compose)
+        assert env["AUTODOC_STUBS_PATH"] == os.pathsep.join(
+            [str(stubs / "repo"), str(stubs / "other")]
+        )
+
+    def test_scratch_tmpfs_not_passed(self, tmp_path):
+        env = get_local_env(_compose(tmp_path, tmpfs_size=1024))
+        assert "BARTLEBY_SCRATCH" not in env
+
+    def test_input_view_for_trimmed_mounts(self, tmp_path):
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "index.rst").write_text("Title\n")
+        compose = _compose(tmp_path)
+        volumes = compose["services"]["bartleby_transform"]["volumes"]
+        volumes[0] = {
+            "type": "bind",
+            "source": str(tmp_path / "docs"),
+            "target": "/hmd_transform/input/docs",
+        }
+
+        env = get_local_env(compose, tmp_path / "view")
+        view = tmp_path / "view"
+        assert env["HMD_TRANSFORM_INPUT_PATH"] == str(view)
+        assert (view / "docs" / "index.rst").read_text() == "Title\n"
+        assert sorted(p.name for p in view.iterdir()) == ["docs"]
+
+
+class TestRunEntryPoint:
+    def test_restores_process_state(self, tmp_path, entry_module, capsys):
+        cwd = os.getcwd()
+        log_path = tmp_path / "logs" / "index-html.log"
+        return_code = run_entry_point(
+            entry_module,
+            {"BARTLEBY_SHELL": "html", "FAKE_EXIT": "2"},
+            str(tmp_path),
+            "index/html",
+            str(log_path),
+        )
+
+        assert return_code == 2
+        assert os.getcwd() == cwd
+        assert "BARTLEBY_SHELL" not in os.environ
+        assert log_path.read_text() == "building html\n"
+
+    def test_missing_module(self):
+        with pytest.raises(SystemExit, match="not installed"):
+            check_local_transform("not_a_real_bartleby_module:main")
+
+
+class TestRunLocal:
+    def test_runs_in_process(self, tmp_path, monkeypatch, entry_module):
+        monkeypatch.chdir(tmp_path)
+        transforms = [
+            {
+                "name": "repo",
+                "version": "1.0",
+                "transform_instance_context": {"name": "index", "shell": shell},
+                "image_name": "image",
+            }
+            for shell in ("html", "pdf")
+        ]
+
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+            results = run_local(transforms)
+
+        assert [r.success for r in results] == [True, True]
+        logs = tmp_path / "target" / "bartleby" / "logs"
+        assert (logs / "index-pdf.log").read_text() == "building pdf\n"
+        assert (tmp_path / "target" / "bartleby" / "index" / "pdf").is_dir()
+        assert not any((tmp_path / "target" / "bartleby-staging").iterdir())
+
+    def test_publish_options_passed_to_publish(
+        self, tmp_path, monkeypatch, entry_module
+    ):
+        monkeypatch.chdir(tmp_path)
+        transforms = [
+            {
+                "name": "repo",
+                "version": "1.0",
+                "transform_instance_context": {"name": "index", "shell": "html"},
+                "image_name": "image",
+                "precompress": True,
+            }
+        ]
+
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"), patch(
+            "hmd_cli_bartleby.local_runner.publish_build"
+        ) as mock_publish:
+            results = run_local(transforms)
+
+        assert results[0].success
+        assert mock_publish.call_args.kwargs == {"precompress": True}
+
+    def test_pool_keeps_configs_open(self, tmp_path, monkeypatch, entry_module):
+        monkeypatch.chdir(tmp_path)
+        open_configs = []
+
+        @contextmanager
+        def fake_config(**kwargs):
+            open_configs.append(kwargs["build_id"])
+            yield None, _compose(tmp_path)
+            open_configs.remove(kwargs["build_id"])
+
+        class CheckingExecutor(_InlineExecutor):
+            def submit(self, fn, *args):
+                # Builds fail unless every config is still open when they run
+                future = Future()
+                future.result = lambda: (int(len(open_configs) != 2), 0.0)
+                return future
+
+        transforms = [
+            {"transform_instance_context": {"name": "index", "shell": shell}}
+            for shell in ("html", "pdf")
+        ]
+        with patch("hmd_cli_bartleby.local_runner.transform_config", fake_config):
+            with patch(
+                "hmd_cli_bartleby.local_runner.ProcessPoolExecutor", CheckingExecutor
+            ), patch("hmd_cli_bartleby.local_runner.publish_build"):
+                results = run_local(transforms, jobs=2)
+
+        assert [r.success for r in results] == [True, True]
+        assert open_configs == []
+
+    def test_input_view_removed_after_build(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "index.rst").write_text("Title\n")
+        compose = _compose(tmp_path)
+        compose["services"]["bartleby_transform"]["volumes"][0] = {
+            "type": "bind",
+            "source": str(tmp_path / "docs"),
+            "target": "/hmd_transform/input/docs",
+        }
+        seen = []
+
+        @contextmanager
+        def fake_config(**kwargs):
+            yield None, compose
+
+        def fake_entry_point(entry_point, env, *args):
+            seen.append(os.listdir(env["HMD_TRANSFORM_INPUT_PATH"]))
+            return 0
+
+        transforms = [
+            {"transform_instance_context": {"name": "index", "shell": "html"}}
+        ]
+        with patch(
+            "hmd_cli_bartleby.local_runner.transform_config", fake_config
+        ), patch(
+            "hmd_cli_bartleby.local_runner.run_entry_point", fake_entry_point
+        ), patch(
+            "hmd_cli_bartleby.local_runner.check_local_transform"
+        ), patch(
+            "hmd_cli_bartleby.local_runner.publish_build"
+        ):
+            results = run_local(transforms)
+
+        assert results[0].success
+        assert seen == [["docs"]]
+        assert not (tmp_path / "target" / "input" / "index-html").exists()
+        assert (tmp_path / "docs" / "index.rst").exists()
+
+    def test_pool_records_each_build_duration(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+
+        def slow_entry_point(*args):
+            time.sleep(0.2)
+            return 0
+
+        transforms = [
+            {
+                "name": "repo",
+                "version": "1.0",
+                "transform_instance_context": {"name": "index", "shell": shell},
+                "image_name": "image",
+            }
+            for shell in ("html", "pdf")
+        ]
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"), patch(
+            "hmd_cli_bartleby.local_runner.ProcessPoolExecutor", _InlineExecutor
+        ), patch(
+            "hmd_cli_bartleby.local_runner.run_entry_point", slow_entry_point
+        ), patch(
+            "hmd_cli_bartleby.local_runner.check_local_transform"
+        ), patch(
+            "hmd_cli_bartleby.local_runner.publish_build"
+        ):
+            results = run_local(transforms, jobs=2)
+
+        assert all(0.2 <= r.duration < 0.35 for r in results)
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+from hmd_cli_bartleby.output import (
+    find_build_output,
+    make_staging_path,
+    publish_output,
+    swap_directory,
+)
+
+
+class TestFindBuildOutput:
+    def test_unwraps_nested_output(self, tmp_path):
+        (tmp_path / "index" / "html").mkdir(parents=True)
+        assert (
+            find_build_output(tmp_path, "index", "html") == tmp_path / "index" / "html"
+        )
+
+    def test_unwraps_shell_output(self, tmp_path):
+        (tmp_path / "html").mkdir()
+        assert find_build_output(tmp_path, "index", "html") == tmp_path / "html"
+
+    def test_flat_output(self, tmp_path):
+        (tmp_path / "html").mkdir()
+        (tmp_path / "index.html").write_text("")
+        assert find_build_output(tmp_path, "index", "html") == tmp_path
+
+
+class TestSwapDirectory:
+    def _tree(self, path, name):
+        path.mkdir(parents=True)
+        (path / name).write_text(name)
+        return path
+
+    def test_replaces_existing(self, tmp_path):
+        dest = self._tree(tmp_path / "out" / "index" / "html", "old.html")
+        source = self._tree(tmp_path / "staging", "new.html")
+
+        swap_directory(source, dest)
+
+        assert sorted(p.name for p in dest.iterdir()) == ["new.html"]
+        assert not source.exists()
+        assert sorted(p.name for p in dest.parent.iterdir()) == ["html"]
+
+    def test_fallback_without_exchange(self, tmp_path):
+        dest = self._tree(tmp_path / "out", "old.html")
+        source = self._tree(tmp_path / "staging", "new.html")
+
+        with patch("hmd_cli_bartleby.output._rename_exchange", return_value=False):
+            swap_directory(source, dest)
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["out"]
+        assert (dest / "new.html").exists()
+
+
+class TestPublishOutput:
+    def test_publishes_root_and_shell(self, tmp_path):
+        staging = make_staging_path("index-pdf", tmp_path)
+        assert staging.parent == tmp_path / "target" / "bartleby-staging"
+        (staging / "pdf").mkdir()
+        (staging / "pdf" / "index.pdf").write_text("pdf")
+
+        dest = publish_output(staging, "index", "pdf", tmp_path / "target" / "bartleby")
+
+        assert dest == tmp_path / "target" / "bartleby" / "index" / "pdf"
+        assert (dest / "index.pdf").read_text() == "pdf"
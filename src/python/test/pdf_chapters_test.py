@@ -0,0 +1,168 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from hmd_cli_bartleby.controller import LocalController
+from hmd_cli_bartleby.pdf_chapters import (
+    CHAPTERS_DIR,
+    FRONT_MATTER_PREFIX,
+    check_pypdf,
+    get_chapters,
+    get_title,
+    merge_chapters,
+    plan_chapters,
+    remove_chapter_roots,
+)
+
+ROOT = """Manual
+======
+
+Read this first.
+
+.. toctree::
+   :maxdepth: 2
+
+   intro
+   Reference <reference/index>
+
+.. toctree::
+   :caption: Sources
+
+   _sources/lib/index
+"""
+
+
+@pytest.fixture
+def docs_path(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "reference").mkdir(parents=True)
+    (docs / "_sources" / "lib").mkdir(parents=True)
+    (docs / "index.rst").write_text(ROOT)
+    (docs / "intro.rst").write_text("Introduction\n============\n\nText.\n")
+    (docs / "reference" / "index.rst").write_text("Reference\n---------\n")
+    (docs / "_sources" / "lib" / "index.rst").write_text("Library\n*******\n")
+    return docs
+
+
+def _build(name="index"):
+    return {"name": name, "shell": "pdf", "root_doc": "index", "config": {}}
+
+
+def _write_pdf(path, pages):
+    from pypdf import PdfWriter
+
+    path.mkdir(parents=True, exist_ok=True)
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    with open(path / "manual.pdf", "wb") as f:
+        writer.write(f)
+
+
+class TestPlanChapters:
+    def test_chapters_follow_toctrees(self, docs_path):
+        assert get_chapters(docs_path, "index") == [
+            "intro",
+            "reference/index",
+            "_sources/lib/index",
+        ]
+        assert get_title(docs_path, "reference/index") == "Reference"
+        assert get_title(docs_path, "missing") == "missing"
+
+    def test_chapter_builds(self, docs_path):
+        plan = plan_chapters(docs_path, _build())
+        assert [c.title for c in plan.chapters] == [
+            "Manual",
+            "Introduction",
+            "Reference",
+            "Library",
+        ]
+        build = plan.chapters[3].build
+        assert build["name"] == "index-chapter-03"
+        assert build["root_doc"] == f"{CHAPTERS_DIR}/index/03"
+        assert (
+            "   /_sources/lib/index"
+            in (docs_path / CHAPTERS_DIR / "index" / "03.rst").read_text()
+        )
+        assert build["config"]["latex_elements"] == {
+            "tableofcontents": "",
+            "maketitle": "",
+            "preamble": "\n\\setcounter{chapter}{2}\n",
+        }
+
+    def test_front_matter_keeps_title_page(self, docs_path):
+        plan = plan_chapters(docs_path, _build())
+        build = plan.chapters[0].build
+        assert build["name"] == "index-chapter-00"
+        assert build["root_doc"] == f"{FRONT_MATTER_PREFIX}index"
+        assert build["config"]["latex_elements"] == {"tableofcontents": ""}
+        front_matter = docs_path / f"{FRONT_MATTER_PREFIX}index.rst"
+        assert front_matter.read_text() == "Manual\n======\n\nRead this first.\n"
+
+        remove_chapter_roots(docs_path)
+        assert not front_matter.exists()
+        assert not (docs_path / CHAPTERS_DIR).exists()
+
+    def test_single_chapter_is_not_split(self, docs_path):
+        (docs_path / "index.rst").write_text(".. toctree::\n\n   intro\n")
+        assert plan_chapters(docs_path, _build()) is None
+
+
+class TestMergeChapters:
+    def test_merge_with_outline_and_page_labels(self, docs_path, monkeypatch):
+        pypdf = pytest.importorskip("pypdf")
+        monkeypatch.chdir(docs_path.parent)
+        output_path = docs_path.parent / "target" / "bartleby"
+        plan = plan_chapters(docs_path, _build())
+        for pages, chapter in zip([1, 2, 3, 1], plan.chapters):
+            _write_pdf(output_path / chapter.build["name"] / "pdf", pages)
+
+        merged = merge_chapters(plan, output_path)
+        assert merged == output_path / "index" / "pdf" / "manual.pdf"
+        reader = pypdf.PdfReader(str(merged))
+        assert len(reader.pages) == 7
+        assert [item.title for item in reader.outline] == [
+            "Manual",
+            "Introduction",
+            "Reference",
+            "Library",
+        ]
+        assert reader.page_labels == ["1", "2", "3", "4", "5", "6", "7"]
+        assert not (output_path / "index-chapter-01").exists()
+
+
+class TestExecuteChapterBuilds:
+    def test_chapters_replace_pdf_builds(self, docs_path, monkeypatch):
+        monkeypatch.chdir(docs_path.parent)
+        ctrl = object.__new__(LocalController)
+        ctrl.app = MagicMock()
+        ctrl.app.pargs.optimize_images = False
+        ctrl.app.pargs.prerender_uml = False
+        ctrl.app.pargs.no_dedup = False
+        builds = [{**_build(), "shell": "html"}, _build()]
+
+        with patch("hmd_cli_bartleby.pdf_chapters.check_pypdf"):
+            with patch(
+                "hmd_cli_bartleby.pdf_chapters.merge_chapters"
+            ) as mock_merge, patch.object(
+                LocalController,
+                "_execute_cached_builds",
+                side_effect=lambda expanded: [True] * len(expanded),
+            ) as mock_execute:
+                assert ctrl._execute_chapter_builds(builds) == [True, True]
+
+        expanded = mock_execute.call_args.args[0]
+        assert [b["name"] for b in expanded] == [
+            "index",
+            "index-chapter-00",
+            "index-chapter-01",
+            "index-chapter-02",
+            "index-chapter-03",
+        ]
+        mock_merge.assert_called_once()
+        assert not (docs_path / CHAPTERS_DIR).exists()
+
+
+class TestCheckPypdf:
+    def test_missing_pypdf_exits(self):
+        with patch("importlib.util.find_spec", return_value=None):
+            with pytest.raises(SystemExit, match="pdf-chapters"):
+                check_pypdf()
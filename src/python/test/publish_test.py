@@ -0,0 +1,127 @@
+import io
+from types import SimpleNamespace
+import pytest
+from hmd_cli_bartleby.publish import (
+    REMOTE_MANIFEST,
+    S3Publisher,
+    get_content_type,
+    get_upload_args,
+    parse_destination,
+)
+
+
+class _NoSuchKey(Exception):
+    pass
+
+
+class _FakeS3:
+    """In-memory stand-in for the parts of the S3 client used by publish."""
+
+    exceptions = SimpleNamespace(NoSuchKey=_NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = []
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise _NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)]["Body"])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = {"Body": Body, **kwargs}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket, Key, f.read(), **ExtraArgs)
+        self.uploads.append(Key)
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objects.pop((Bucket, obj["Key"]), None)
+
+
+@pytest.fixture
+def output_path(tmp_path):
+    output = tmp_path / "target" / "bartleby"
+    (output / "index" / "html").mkdir(parents=True)
+    (output / "index" / "html" / "index.html").write_text("<html></html>")
+    (output / "index" / "html" / "app.js").write_text("var a;")
+    (output / "logs").mkdir()
+    (output / "logs" / "index-html.log").write_text("log")
+    return output
+
+
+class TestParseDestination:
+    def test_destination(self, monkeypatch):
+        assert parse_destination("s3://bucket/docs/site/") == ("bucket", "docs/site")
+        monkeypatch.setenv("HMD_BARTLEBY_PUBLISH_URL", "s3://env-bucket")
+        assert parse_destination() == ("env-bucket", "")
+        with pytest.raises(SystemExit, match="s3://bucket/prefix"):
+            parse_destination("https://example.com/docs")
+
+    def test_content_types(self):
+        assert get_content_type("index.html") == "text/html; charset=utf-8"
+        assert get_content_type("_static/app.js") == "application/javascript"
+        assert get_content_type("data.unknown") == "application/octet-stream"
+
+    def test_precompressed_upload_args(self):
+        assert get_upload_args("index.html.gz") == {
+            "ContentType": "text/html; charset=utf-8",
+            "ContentEncoding": "gzip",
+        }
+        assert get_upload_args("_static/app.js.br") == {
+            "ContentType": "application/javascript",
+            "ContentEncoding": "br",
+        }
+        assert get_upload_args("downloads/docs.tar.gz") == {
+            "ContentType": "application/x-tar"
+        }
+
+
+class TestS3Publisher:
+    def test_uploads_only_changes(self, output_path):
+        s3 = _FakeS3()
+        publisher = S3Publisher("bucket", "docs", client=s3, jobs=2)
+
+        result = publisher.publish(output_path)
+        assert result.uploaded == ["index/html/app.js", "index/html/index.html"]
+        assert ("bucket", "docs/logs/index-html.log") not in s3.objects
+        assert s3.objects[("bucket", "docs/index/html/index.html")]["ContentType"] == (
+            "text/html; charset=utf-8"
+        )
+        assert ("bucket", f"docs/{REMOTE_MANIFEST}") in s3.objects
+
+        (output_path / "index" / "html" / "index.html").write_text("<html>2</html>")
+        result = publisher.publish(output_path)
+        assert result.uploaded == ["index/html/index.html"]
+        assert result.unchanged == 1
+
+    def test_precompressed_siblings(self, output_path):
+        html = output_path / "index" / "html"
+        (html / "index.html.gz").write_bytes(b"gz")
+        (html / "index.html.br").write_bytes(b"br")
+        s3 = _FakeS3()
+        S3Publisher("bucket", "", client=s3).publish(output_path)
+
+        gz = s3.objects[("bucket", "index/html/index.html.gz")]
+        assert gz["ContentType"] == "text/html; charset=utf-8"
+        assert gz["ContentEncoding"] == "gzip"
+        br = s3.objects[("bucket", "index/html/index.html.br")]
+        assert br["ContentType"] == "text/html; charset=utf-8"
+        assert br["ContentEncoding"] == "br"
+        assert "ContentEncoding" not in s3.objects[("bucket", "index/html/index.html")]
+
+    def test_delete_removed(self, output_path):
+        s3 = _FakeS3()
+        publisher = S3Publisher("bucket", "", client=s3)
+        publisher.publish(output_path)
+
+        (output_path / "index" / "html" / "app.js").unlink()
+        assert publisher.publish(output_path).deleted == []
+        assert ("bucket", "index/html/app.js") in s3.objects
+
+        result = publisher.publish(output_path, delete=True)
+        assert result.deleted == ["index/html/app.js"]
+        assert result.uploaded == []
+        assert ("bucket", "index/html/app.js") not in s3.objects
@@ -0,0 +1,201 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+import pytest
+from hmd_cli_bartleby.build_cache import InputHasher, hash_inputs
+from hmd_cli_bartleby.controller import LocalController
+from hmd_cli_bartleby.remote_cache import (
+    FileCacheBackend,
+    HttpCacheBackend,
+    RemoteBuildCache,
+    S3CacheBackend,
+    get_cache_backend,
+    get_image_digest,
+    get_remote_key,
+)
+
+
+class _StoreHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.objects.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        length = int(self.headers["Content-Length"])
+        self.server.objects[self.path] = self.rfile.read(length)
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_store():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StoreHandler)
+    server.objects = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def _publish(repo_path, root, shell, files):
+    output = repo_path / "target" / "bartleby" / root / shell
+    output.mkdir(parents=True)
+    for name, content in files.items():
+        (output / name).write_text(content)
+    return output
+
+
+class TestGetCacheBackend:
+    def test_backends_from_url(self, tmp_path):
+        assert get_cache_backend(None) is None
+        assert isinstance(get_cache_backend(str(tmp_path)), FileCacheBackend)
+        assert get_cache_backend(f"file://{tmp_path}").path == tmp_path
+        assert isinstance(get_cache_backend("http://cache:8080/b"), HttpCacheBackend)
+
+        with patch("boto3.client") as mock_client:
+            backend = get_cache_backend("s3://bucket/builds/")
+        assert isinstance(backend, S3CacheBackend)
+        assert (backend.bucket, backend._key("k")) == ("bucket", "builds/k")
+        mock_client.assert_called_once_with("s3", endpoint_url=None)
+
+
+class TestRemoteKey:
+    def test_key_covers_image_and_arguments(self):
+        args = {"transform_instance_context": {"shell": "html"}, "image_name": "a"}
+        key = get_remote_key("inputs", args, "sha256:1")
+        assert key == get_remote_key("inputs", {**args, "image_name": "b"}, "sha256:1")
+        assert key != get_remote_key("inputs", args, "sha256:2")
+        assert key != get_remote_key(
+            "inputs", {**args, "confidential": True}, "sha256:1"
+        )
+
+    def test_full_context_hashes_repository(self, tmp_path):
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "index.rst").write_text("Title")
+        (tmp_path / "target").mkdir()
+        hasher = InputHasher()
+
+        def hashes():
+            return [
+                hash_inputs(tmp_path, False, {}, hasher, full_context=full_context)
+                for full_context in (False, True)
+            ]
+
+        trimmed, full = hashes()
+        (tmp_path / "target" / "output.html").write_text("built")
+        assert hashes() == [trimmed, full]
+
+        (tmp_path / "README.md").write_text("readme")
+        assert hashes()[0] == trimmed
+        assert hashes()[1] != full
+
+
+class TestGetImageDigest:
+    def test_image_id(self):
+        with patch("hmd_cli_bartleby.remote_cache.subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(returncode=0, stdout="sha256:abc\n")
+            assert get_image_digest("image:stable") == "sha256:abc"
+        assert mock_run.call_args.args[0][-3:] == [
+            "--format",
+            "{{.Id}}",
+            "image:stable",
+        ]
+
+    def test_no_immutable_id(self):
+        with patch("hmd_cli_bartleby.remote_cache.subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(returncode=1, stdout="")
+            assert get_image_digest("image:stable") is None
+
+
+class TestRemoteBuildCache:
+    @pytest.mark.parametrize("backend_type", ["file", "http"])
+    def test_round_trip(self, backend_type, tmp_path, monkeypatch, http_store):
+        if backend_type == "file":
+            backend = FileCacheBackend(tmp_path / "shared")
+        else:
+            backend = HttpCacheBackend(
+                f"http://127.0.0.1:{http_store.server_address[1]}/cache"
+            )
+        agent_1 = tmp_path / "agent-1"
+        agent_2 = tmp_path / "agent-2"
+        agent_2.mkdir()
+
+        _publish(agent_1, "index", "html", {"index.html": "built"})
+        monkeypatch.chdir(agent_1)
+        cache = RemoteBuildCache(backend)
+        assert not cache.restore("key", "index", "html")
+        cache.store("key", "index", "html")
+
+        monkeypatch.chdir(agent_2)
+        assert cache.restore("key", "index", "html")
+        restored = agent_2 / "target" / "bartleby" / "index" / "html" / "index.html"
+        assert restored.read_text() == "built"
+
+
+class TestExecuteCachedBuilds:
+    def test_cache_hits_skip_builds(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        ctrl = object.__new__(LocalController)
+        ctrl.app = MagicMock()
+        ctrl.app.pargs.build_cache = str(tmp_path / "shared")
+        ctrl.app.pargs.gather = ""
+        ctrl.app.pargs.autodoc = False
+        ctrl.app.pargs.runner = "docker"
+        ctrl.app.pargs.full_context = False
+        builds = [
+            {"name": "index", "shell": s, "root_doc": "index", "config": {}}
+            for s in ("html", "pdf")
+        ]
+
+        def fake_execute(to_build):
+            for build in to_build:
+                _publish(tmp_path, build["name"], build["shell"], {"out": "x"})
+            return [True] * len(to_build)
+
+        with patch("hmd_cli_bartleby.controller.read_manifest", return_value={}):
+            with patch(
+                "hmd_cli_bartleby.remote_cache.get_image_digest", return_value="d"
+            ):
+                with patch.object(
+                    LocalController,
+                    "_get_transform_args",
+                    side_effect=lambda name, shell, *a: {"shell": shell},
+                ):
+                    with patch.object(
+                        LocalController, "_execute_builds", side_effect=fake_execute
+                    ) as mock_execute:
+                        assert ctrl._execute_cached_builds(builds) == [True, True]
+                        assert ctrl._execute_cached_builds(builds) == [True, True]
+
+        mock_execute.assert_called_once()
+
+    def test_skipped_without_image_id(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        ctrl = object.__new__(LocalController)
+        ctrl.app = MagicMock()
+        ctrl.app.pargs.build_cache = str(tmp_path / "shared")
+        ctrl.app.pargs.gather = ""
+        ctrl.app.pargs.runner = "docker"
+        builds = [{"name": "index", "shell": "html", "root_doc": "index", "config": {}}]
+
+        with patch(
+            "hmd_cli_bartleby.remote_cache.get_image_digest", return_value=None
+        ), patch(
+            "hmd_cli_bartleby.remote_cache.RemoteBuildCache"
+        ) as mock_cache, patch.object(
+            LocalController, "_execute_builds", return_value=[True]
+        ) as mock_execute:
+            assert ctrl._execute_cached_builds(builds) == [True]
+
+        mock_execute.assert_called_once_with(builds)
+        mock_cache.assert_not_called()
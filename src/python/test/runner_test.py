@@ -0,0 +1,287 @@
+import asyncio
+import sys
+import pytest
+import yaml
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from hmd_cli_bartleby.controller import LocalController
+from hmd_cli_bartleby.hmd_cli_bartleby import (
+    get_build_id,
+    get_image_key,
+    parse_size,
+    transform_config,
+)
+from hmd_cli_bartleby.runner import BuildResult, run_transforms, stream_command
+from hmd_cli_bartleby.scheduler import BuildHistory, DEFAULT_ESTIMATES
+
+
+class TestStreamCommand:
+    def test_prefixes_output_and_writes_log(self, tmp_path, capsys):
+        log_path = tmp_path / "logs" / "index-html.log"
+        command = [sys.executable, "-c", "print('first'); print('second')"]
+        return_code = asyncio.run(stream_command(command, "index/html", log_path))
+
+        assert return_code == 0
+        captured = capsys.readouterr()
+        assert "[index/html] first\n[index/html] second\n" in captured.out
+        assert log_path.read_text() == "first\nsecond\n"
+
+    def test_returns_exit_code(self, tmp_path):
+        command = [sys.executable, "-c", "import sys; sys.exit(3)"]
+        return_code = asyncio.run(stream_command(command, "x", tmp_path / "x.log"))
+        assert return_code == 3
+
+
+class TestRunTransforms:
+    def test_limits_concurrency(self):
+        running = 0
+        peak = 0
+
+        async def fake_transform(**kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return BuildResult(kwargs["ok"], 0.0)
+
+        with patch("hmd_cli_bartleby.runner.transform_async", fake_transform):
+            results = asyncio.run(
+                run_transforms([{"ok": True}, {"ok": False}, {"ok": True}], jobs=2)
+            )
+
+        assert [r.success for r in results] == [True, False, True]
+        assert peak == 2
+
+
+class TestTransformConfig:
+    def test_build_id_makes_names_unique(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        context = {"name": "User Guide", "shell": "pdf", "root_doc": "index"}
+        build_id = get_build_id(context)
+        assert build_id == "user-guide-pdf"
+
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+            with transform_config(
+                name="repo",
+                version="1.0",
+                transform_instance_context=context,
+                image_name="image",
+                build_id=build_id,
+            ) as (inst_config, compose):
+                assert yaml.safe_load(inst_config.read_text()) == compose
+
+        assert inst_config.name == "docker-compose-user-guide-pdf.yaml"
+        service = compose["services"]["bartleby_transform"]
+        assert service["container_name"] == "bartleby-inst_repo_user-guide-pdf"
+
+        staging = [
+            v["source"]
+            for v in service["volumes"]
+            if v["target"] == "/hmd_transform/output"
+        ][0]
+        assert Path(staging).parent == tmp_path / "target" / "bartleby-staging"
+        assert not Path(staging).exists()
+
+    def _input_mounts(self, full_context):
+        context = {"name": "index", "shell": "html", "root_doc": "index"}
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+            with transform_config(
+                name="repo",
+                version="1.0",
+                transform_instance_context=context,
+                image_name="image",
+                full_context=full_context,
+            ) as (_, compose):
+                volumes = compose["services"]["bartleby_transform"]["volumes"]
+        return {
+            v["target"]: v["source"]
+            for v in volumes
+            if v["target"].startswith("/hmd_transform/input")
+        }
+
+    def test_only_build_inputs_mounted(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for path in ("docs", "meta-data", "src/python", "node_modules"):
+            (tmp_path / path).mkdir(parents=True)
+
+        assert self._input_mounts(full_context=False) == {
+            "/hmd_transform/input/docs": str(tmp_path / "docs"),
+            "/hmd_transform/input/meta-data": str(tmp_path / "meta-data"),
+        }
+        assert self._input_mounts(full_context=True) == {
+            "/hmd_transform/input": str(tmp_path)
+        }
+
+    def _autodoc_compose(self, venv_cache=True, image_name="image"):
+        context = {"name": "index", "shell": "html", "root_doc": "index"}
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+            with transform_config(
+                name="repo",
+                version="1.0",
+                transform_instance_context=context,
+                image_name=image_name,
+                autodoc=True,
+                venv_cache=venv_cache,
+            ) as (_, compose):
+                return compose["services"]["bartleby_transform"]
+
+    def test_autodoc_mounts_pip_cache_and_venv(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "src" / "python").mkdir(parents=True)
+        requirements = tmp_path / "src" / "python" / "requirements.txt"
+        requirements.write_text("requests\n")
+
+        service = self._autodoc_compose()
+        mounts = {v["target"]: v["source"] for v in service["volumes"]}
+        assert service["environment"]["PIP_CACHE_DIR"] == "/hmd_transform/pip_cache"
+        assert Path(mounts["/hmd_transform/pip_cache"]).is_dir()
+        venv = mounts["/hmd_transform/venv"]
+        assert service["environment"]["BARTLEBY_VENV"] == "/hmd_transform/venv"
+        assert service["environment"]["AUTODOC_STUBS"] == "/hmd_transform/autodoc_stubs"
+        assert service["environment"]["AUTODOC_STUBS_PATH"] == (
+            f"/hmd_transform/autodoc_stubs/{tmp_path.name}"
+        )
+        stubs = Path(mounts["/hmd_transform/autodoc_stubs"])
+        assert stubs == tmp_path / "target" / "autodoc_stubs"
+        assert (stubs / "api.json").exists()
+
+        mounts = {v["target"]: v["source"] for v in self._autodoc_compose()["volumes"]}
+        assert mounts["/hmd_transform/venv"] == venv
+        requirements.write_text("requests\npyyaml\n")
+        mounts = {v["target"]: v["source"] for v in self._autodoc_compose()["volumes"]}
+        assert mounts["/hmd_transform/venv"] != venv
+
+    def test_venv_keyed_by_image_and_requirements(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "src" / "python").mkdir(parents=True)
+        (tmp_path / "src" / "python" / "requirements.txt").write_text("requests\n")
+
+        def venv(image_name):
+            service = self._autodoc_compose(image_name=image_name)
+            mounts = {v["target"]: v["source"] for v in service["volumes"]}
+            return Path(mounts["/hmd_transform/venv"])
+
+        first, second = venv("image:1"), venv("image:2")
+        assert first.parent.name == get_image_key("image:1")
+        assert second.parent.name == get_image_key("image:2")
+        assert first.name == second.name
+
+    def test_venv_cache_is_optional(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "src" / "python").mkdir(parents=True)
+        service = self._autodoc_compose(venv_cache=False)
+        assert "BARTLEBY_VENV" not in service["environment"]
+        assert "PIP_CACHE_DIR" in service["environment"]
+
+    def _cache_mounts(self, shell, image_name="image:1"):
+        context = {"name": "index", "shell": shell, "root_doc": "index"}
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+            with transform_config(
+                name="repo",
+                version="1.0",
+                transform_instance_context=context,
+                image_name=image_name,
+            ) as (_, compose):
+                service = compose["services"]["bartleby_transform"]
+        mounts = {v["target"]: v["source"] for v in service["volumes"]}
+        return mounts, service["environment"]
+
+    def test_pdf_latex_and_font_caches(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("HMD_BARTLEBY_CACHE_DIR", str(tmp_path / "cache"))
+
+        mounts, env = self._cache_mounts("pdf")
+        latex = Path(mounts["/hmd_transform/latex_cache"])
+        assert latex.is_dir() and latex.name == "index-pdf"
+        assert latex.parent.parent == tmp_path / "target" / "bartleby-latex"
+        fonts = Path(mounts["/hmd_transform/font_cache"])
+        assert fonts.parent == tmp_path / "cache" / "fonts"
+        assert env["BARTLEBY_LATEX_CACHE"] == "/hmd_transform/latex_cache"
+        assert env["XDG_CACHE_HOME"] == "/hmd_transform/font_cache"
+        assert env["TEXMFVAR"] == "/hmd_transform/font_cache/texmf-var"
+
+        again, _ = self._cache_mounts("pdf")
+        assert again["/hmd_transform/font_cache"] == str(fonts)
+        assert again["/hmd_transform/latex_cache"] == str(latex)
+        upgraded, _ = self._cache_mounts("pdf", image_name="image:2")
+        assert upgraded["/hmd_transform/font_cache"] != str(fonts)
+        assert upgraded["/hmd_transform/latex_cache"] != str(latex)
+        assert not latex.parent.exists()
+
+        mounts, env = self._cache_mounts("html")
+        assert "/hmd_transform/latex_cache" not in mounts
+        assert "XDG_CACHE_HOME" not in env
+
+    def test_tmpfs_scratch(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        context = {"name": "index", "shell": "html", "root_doc": "index"}
+        monkeypatch.setenv("HMD_BARTLEBY_TMPFS_SIZE", "2g")
+        with patch("hmd_cli_bartleby.hmd_cli_bartleby.hmd_home", "/hmd_home"):
+            with transform_config(
+                name="repo",
+                version="1.0",
+                transform_instance_context=context,
+                image_name="image",
+            ) as (_, compose):
+                pass
+
+        assert compose["version"] == "3.6"
+        service = compose["services"]["bartleby_transform"]
+        assert {
+            "type": "tmpfs",
+            "target": "/hmd_transform/scratch",
+            "tmpfs": {"size": 2 * 1024**3},
+        } in service["volumes"]
+        assert service["environment"]["BARTLEBY_SCRATCH"] == "/hmd_transform/scratch"
+
+    def test_parse_size(self):
+        assert parse_size("512m") == 512 * 1024**2
+        assert parse_size("1G") == 1024**3
+        assert parse_size(4096) == 4096
+        with pytest.raises(ValueError):
+            parse_size("lots")
+
+
+class TestExecuteBuilds:
+    def _make_controller(self, jobs):
+        ctrl = object.__new__(LocalController)
+        ctrl.app = MagicMock()
+        ctrl.app.pargs.jobs = jobs
+        ctrl.app.pargs.memory_budget = None
+        ctrl.app.pargs.docker_hosts = None
+        ctrl.app.pargs.runner = "docker"
+        return ctrl
+
+    def test_parallel_builds_use_async_runner(self):
+        ctrl = self._make_controller(jobs=2)
+        builds = [
+            {"name": "index", "shell": s, "root_doc": "index", "config": {}}
+            for s in ("html", "pdf")
+        ]
+
+        async def fake_run_transforms(transforms, **kwargs):
+            return [BuildResult(True, 0.0) for _ in transforms]
+
+        with patch.object(
+            LocalController, "_get_transform_args", side_effect=lambda *a: {"a": a}
+        ):
+            with patch(
+                "hmd_cli_bartleby.runner.run_transforms",
+                side_effect=fake_run_transforms,
+            ) as mock_run:
+                ctrl._execute_builds(builds)
+
+        transforms = mock_run.call_args[0][0]
+        assert [t["a"][1] for t in transforms] == ["html", "pdf"]
+        assert mock_run.call_args[1]["jobs"] == 2
+
+    def test_single_job_runs_sequentially(self):
+        ctrl = self._make_controller(jobs=1)
+        builds = [{"name": "index", "shell": "html", "root_doc": "index", "config": {}}]
+        with patch.object(LocalController, "_run_transform") as mock_transform:
+            ctrl._execute_builds(builds)
+        mock_transform.assert_called_once_with("index", "html", "index", {})
+
+        history = BuildHistory.open_default()
+        assert history.estimate("index", "html") != DEFAULT_ESTIMATES["html"]
@@ -0,0 +1,95 @@
+import asyncio
+from unittest.mock import patch
+from hmd_cli_bartleby.runner import BuildResult, run_transforms
+from hmd_cli_bartleby.scheduler import (
+    BuildHistory,
+    DEFAULT_ESTIMATES,
+    parse_memory,
+    run_scheduled,
+)
+
+
+def _transform(root, shell):
+    return {"transform_instance_context": {"name": root, "shell": shell}}
+
+
+class TestBuildHistory:
+    def test_defaults_without_history(self, tmp_path):
+        history = BuildHistory(tmp_path / "history.sqlite", repo="repo")
+        assert history.estimate("index", "pdf") == DEFAULT_ESTIMATES["pdf"]
+
+    def test_estimate_uses_successful_builds(self, tmp_path):
+        history = BuildHistory(tmp_path / "history.sqlite", repo="repo")
+        history.record("index", "html", 10.0, 300)
+        history.record("index", "html", 20.0, 500)
+        history.record("index", "html", 1.0, 50, success=False)
+        assert history.estimate("index", "html") == (15.0, 500)
+
+    def test_history_is_per_repo(self, tmp_path):
+        BuildHistory(tmp_path / "history.sqlite", repo="a").record("i", "html", 5.0)
+        history = BuildHistory(tmp_path / "history.sqlite", repo="b")
+        assert history.estimate("i", "html") == DEFAULT_ESTIMATES["html"]
+
+
+class TestParseMemory:
+    def test_units(self):
+        assert parse_memory("512MiB") == 512
+        assert parse_memory("1.5GiB ") == 1536
+        assert parse_memory("0B") == 0
+        assert parse_memory("n/a") is None
+
+
+class TestRunScheduled:
+    def test_memory_budget_packs_builds(self):
+        memory = {"pdf": 3000, "html-a": 1000, "html-b": 1000}
+        running = set()
+        concurrent = []
+
+        async def run(item):
+            running.add(item)
+            concurrent.append(set(running))
+            await asyncio.sleep(0.01)
+            running.discard(item)
+            return item
+
+        results = asyncio.run(
+            run_scheduled(
+                ["pdf", "html-a", "html-b"],
+                run,
+                memory.get,
+                cpus=3,
+                memory_budget=4000,
+            )
+        )
+
+        assert results == ["pdf", "html-a", "html-b"]
+        assert {"pdf", "html-a"} in concurrent
+        assert all(len(c) <= 2 for c in concurrent)
+
+    def test_oversized_item_still_runs(self):
+        async def run(item):
+            return item
+
+        results = asyncio.run(
+            run_scheduled(["big"], run, lambda _: 10000, memory_budget=100)
+        )
+        assert results == ["big"]
+
+
+class TestRunTransformsScheduling:
+    def test_longest_first_and_recorded(self, tmp_path):
+        history = BuildHistory(tmp_path / "history.sqlite", repo="repo")
+        started = []
+
+        async def fake_transform(**kwargs):
+            context = kwargs["transform_instance_context"]
+            started.append(context["shell"])
+            return BuildResult(True, 42.0, 700)
+
+        transforms = [_transform("index", "html"), _transform("index", "pdf")]
+        with patch("hmd_cli_bartleby.runner.transform_async", fake_transform):
+            results = asyncio.run(run_transforms(transforms, jobs=1, history=history))
+
+        assert started == ["pdf", "html"]
+        assert [r.duration for r in results] == [42.0, 42.0]
+        assert history.estimate("index", "pdf") == (42.0, 700)
@@ -0,0 +1,67 @@
+import json
+import pytest
+from hmd_cli_bartleby.output import make_staging_path, publish_output
+from hmd_cli_bartleby.search_index import (
+    SHARDS_DIR,
+    get_shard_name,
+    read_search_index,
+    shard_search_index,
+    split_index,
+)
+
+INDEX = {
+    "docnames": ["index", "guide"],
+    "titles": ["Home", "Guide"],
+    "terms": {"bartlebi": [0, 1], "build": 1, "docker": 0},
+    "titleterms": {"guid": 1, "home": 0},
+}
+
+
+def _write_index(path, index):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "searchindex.js").write_text(f"Search.setIndex({json.dumps(index)})")
+
+
+class TestSplitIndex:
+    def test_split_by_prefix(self):
+        index = json.loads(json.dumps(INDEX))
+        shards = split_index(index)
+        assert sorted(shards) == ["ba", "bu", "do", "gu", "ho"]
+        assert shards["ba"] == {"terms": {"bartlebi": [0, 1]}, "titleterms": {}}
+        assert shards["gu"] == {"terms": {}, "titleterms": {"guid": 1}}
+        assert index["terms"] == {} and index["docnames"] == ["index", "guide"]
+
+    def test_shard_names_are_file_safe(self):
+        assert get_shard_name("ba") == "6261.js"
+        assert get_shard_name("ü/") == "c3bc2f.js"
+
+
+class TestShardSearchIndex:
+    def test_writes_shards_and_loader(self, tmp_path):
+        _write_index(tmp_path, INDEX)
+        results = shard_search_index(tmp_path)
+        assert [r.shards for r in results] == [5]
+
+        content = (tmp_path / "searchindex.js").read_text()
+        assert content.index("Search.query = ") < content.index("Search.setIndex(")
+        shard = (tmp_path / SHARDS_DIR / get_shard_name("do")).read_text()
+        assert shard == 'Search.addIndexShard({"terms":{"docker":0},"titleterms":{}})'
+
+    def test_skips_unknown_files(self, tmp_path):
+        (tmp_path / "searchindex.js").write_text("var index = {};")
+        assert shard_search_index(tmp_path) == []
+        with pytest.raises(ValueError):
+            read_search_index(tmp_path / "searchindex.js")
+
+
+class TestPublishSharded:
+    def test_only_when_enabled(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for root, shard_search in (("sharded", True), ("whole", False)):
+            staging = make_staging_path(f"{root}-html")
+            _write_index(staging, INDEX)
+            publish_output(staging, root, "html", shard_search=shard_search)
+
+        output_path = tmp_path / "target" / "bartleby"
+        assert (output_path / "sharded" / "html" / SHARDS_DIR).is_dir()
+        assert not (output_path / "whole" / "html" / SHARDS_DIR).exists()
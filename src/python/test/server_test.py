@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+import urllib.request
+import pytest
+from unittest.mock import MagicMock, patch
+from hmd_cli_bartleby.server import BuildServer, SUCCEEDED, make_http_server
+
+
+def _make_controller():
+    controller = MagicMock()
+    controller.app.pargs.autodoc = False
+    controller.app.pargs.full_context = False
+    controller._get_documents.return_value = {"index": {"builders": ["html"]}}
+    controller._get_shells.return_value = [
+        {"name": "index", "shell": "html", "root_doc": "index", "config": {}}
+    ]
+    controller._run_builds.side_effect = lambda builds: [True] * len(builds)
+    return controller
+
+
+def _wait_for(build_server, job_id, status=SUCCEEDED):
+    for _ in range(200):
+        if build_server.job(job_id)["status"] == status:
+            return
+        time.sleep(0.01)
+    pytest.fail(f"job {job_id} did not reach {status}")
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "index.rst").write_text("Title\n=====\n")
+    monkeypatch.chdir(tmp_path)
+    with patch("hmd_cli_bartleby.server.read_manifest", return_value={}):
+        yield tmp_path
+
+
+class TestBuildServer:
+    def test_duplicate_requests_coalesce(self, repo):
+        controller = _make_controller()
+        build_server = BuildServer(controller, "image")
+
+        first = build_server.submit()
+        second = build_server.submit()
+        assert first[0]["id"] == second[0]["id"]
+        assert build_server.job(first[0]["id"])["requests"] == 2
+
+        build_server.start()
+        _wait_for(build_server, first[0]["id"])
+        build_server.stop()
+        controller._run_builds.assert_called_once()
+
+    def test_unchanged_inputs_reuse_last_build(self, repo):
+        controller = _make_controller()
+        build_server = BuildServer(controller, "image")
+        build_server.start()
+
+        first = build_server.submit()[0]
+        _wait_for(build_server, first["id"])
+        again = build_server.submit()[0]
+        assert again["id"] == first["id"]
+
+        (repo / "docs" / "index.rst").write_text("Changed\n=======\n")
+        changed = build_server.submit()[0]
+        assert changed["id"] != first["id"]
+        _wait_for(build_server, changed["id"])
+        build_server.stop()
+
+        assert controller._run_builds.call_count == 2
+
+    def test_inputs_hashed_when_build_starts(self, repo):
+        controller = _make_controller()
+        build_server = BuildServer(controller, "image")
+
+        queued = build_server.submit()[0]
+        (repo / "docs" / "index.rst").write_text("Changed\n=======\n")
+        build_server.start()
+        _wait_for(build_server, queued["id"])
+
+        again = build_server.submit()[0]
+        build_server.stop()
+        assert again["id"] == queued["id"]
+        controller._run_builds.assert_called_once()
+
+    def test_unknown_root_raises_value_error(self, repo):
+        controller = _make_controller()
+        controller._get_documents.side_effect = SystemExit("no roots")
+        with pytest.raises(ValueError):
+            BuildServer(controller, "image").submit(root_doc="missing")
+
+
+class TestHttpApi:
+    def test_submit_and_poll(self, repo):
+        build_server = BuildServer(_make_controller(), "image")
+        build_server.start()
+        httpd = make_http_server(build_server, port=0)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+        try:
+            request = urllib.request.Request(
+                f"{base_url}/builds",
+                data=json.dumps({"shell": "html"}).encode(),
+                method="POST",
+            )
+            with urllib.request.urlopen(request) as response:
+                assert response.status == 202
+                jobs = json.loads(response.read())
+
+            _wait_for(build_server, jobs[0]["id"])
+            with urllib.request.urlopen(f"{base_url}/jobs/{jobs[0]['id']}") as r:
+                assert json.loads(r.read())["status"] == SUCCEEDED
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+            build_server.stop()
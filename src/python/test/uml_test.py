@@ -0,0 +1,124 @@
+import os
+from unittest.mock import patch
+import pytest
+from hmd_cli_bartleby.images import build_overlay, get_overlay_path
+from hmd_cli_bartleby.uml import find_diagrams, prerender_uml, replace_diagrams
+
+GUIDE = """Guide
+=====
+
+.. uml::
+   :caption: Login flow
+   :width: 50%
+
+   Alice -> Bob: login
+   Bob --> Alice: token
+
+.. uml:: diagrams/flow.puml
+
+.. code-block:: rst
+
+   .. uml::
+
+      A -> B
+
+Done.
+"""
+
+OTHER = """Other
+=====
+
+  .. uml::
+
+     Alice -> Bob: login
+     Bob --> Alice: token
+"""
+
+
+class TestFindDiagrams:
+    def test_inline_blocks_only(self):
+        diagrams = find_diagrams(GUIDE)
+        assert len(diagrams) == 1
+        diagram = diagrams[0]
+        assert diagram.source == (
+            "@startuml\nAlice -> Bob: login\nBob --> Alice: token\n@enduml\n"
+        )
+        assert diagram.options == {"caption": "Login flow", "width": "50%"}
+        assert diagram.key == find_diagrams(OTHER)[0].key
+
+    def test_start_line_name_dropped(self):
+        diagrams = find_diagrams(
+            ".. uml::\n\n   @startuml login_flow\n   Alice -> Bob: login\n"
+            "   Bob --> Alice: token\n   @enduml\n"
+        )
+        assert diagrams[0].source.startswith("@startuml\n")
+        assert diagrams[0].key == find_diagrams(OTHER)[0].key
+
+    def test_includes_left_to_build(self):
+        text = ".. uml::\n\n   !include common.iuml\n   Alice -> Bob: login\n"
+        assert find_diagrams(text) == []
+
+    def test_replace_with_figure(self):
+        diagrams = find_diagrams(GUIDE)
+        text = replace_diagrams(GUIDE, diagrams, {diagrams[0].key: "_uml/a.png"})
+        assert ".. figure:: /_uml/a.png\n   :width: 50%\n\n   Login flow\n\n" in text
+        assert "Alice -> Bob" not in text
+        assert ".. uml:: diagrams/flow.puml" in text
+        assert replace_diagrams(GUIDE, diagrams, {}) == GUIDE
+
+
+@pytest.fixture
+def docs_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("HMD_BARTLEBY_CACHE_DIR", str(tmp_path / "cache"))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.rst").write_text(GUIDE)
+    (docs / "other.rst").write_text(OTHER)
+    (docs / "index.rst").write_text("Index\n=====\n")
+    return docs
+
+
+async def _fake_puml(files, input_path, output_path, image_name):
+    for name in files:
+        (output_path / name).with_suffix(".png").write_bytes(b"png")
+    return 0
+
+
+class TestPrerenderUml:
+    def test_renders_once_and_rewrites_view(self, docs_path):
+        overlay_path = get_overlay_path()
+        build_overlay(docs_path, overlay_path, optimize=False)
+        with patch(
+            "hmd_cli_bartleby.runner.transform_puml_async", side_effect=_fake_puml
+        ) as mock_puml:
+            result = prerender_uml(overlay_path, "image:1", jobs=4)
+
+        assert tuple(result) == (1, 1, 2)
+        mock_puml.assert_called_once()
+        key = find_diagrams(GUIDE)[0].key
+        assert (overlay_path / "_uml" / f"{key}.png").read_bytes() == b"png"
+        assert f".. image:: /_uml/{key}.png" in (overlay_path / "other.rst").read_text()
+        assert (docs_path / "guide.rst").read_text() == GUIDE
+        assert os.path.samefile(overlay_path / "index.rst", docs_path / "index.rst")
+
+        build_overlay(docs_path, overlay_path, optimize=False)
+        with patch("hmd_cli_bartleby.runner.transform_puml_async") as mock_puml:
+            result = prerender_uml(overlay_path, "image:1")
+        mock_puml.assert_not_called()
+        assert tuple(result) == (1, 0, 2)
+
+    def test_unrendered_diagrams_left_inline(self, docs_path):
+        overlay_path = get_overlay_path()
+        build_overlay(docs_path, overlay_path, optimize=False)
+
+        async def failed_puml(*args):
+            return 1
+
+        with patch(
+            "hmd_cli_bartleby.runner.transform_puml_async", side_effect=failed_puml
+        ):
+            result = prerender_uml(overlay_path, "image:1")
+
+        assert tuple(result) == (1, 0, 2)
+        assert (overlay_path / "guide.rst").read_text() == GUIDE
@@ -0,0 +1,116 @@
+import textwrap
+from hmd_cli_bartleby.validate import validate_docs
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(textwrap.dedent(text))
+
+
+class TestValidateDocs:
+    def test_follows_toctrees_and_reports_missing(self, tmp_path):
+        _write(
+            tmp_path / "index.rst",
+            """
+            Title
+            =====
+
+            .. toctree::
+               :maxdepth: 2
+               :caption: Guide
+
+               guide/intro
+               Reference <reference.rst>
+               missing
+               self
+               https://example.com
+
+            .. include:: <isonum.txt>
+            .. image:: images/logo.png
+            """,
+        )
+        _write(
+            tmp_path / "guide" / "intro.rst",
+            """
+            .. figure:: ../images/missing.png
+            .. literalinclude:: /snippets/example.py
+            .. image:: diagram.*
+            """,
+        )
+        _write(tmp_path / "reference.rst", "Reference\n")
+        _write(tmp_path / "images" / "logo.png", "")
+        _write(tmp_path / "snippets" / "example.py", "")
+        _write(tmp_path / "guide" / "diagram.svg", "")
+        _write(tmp_path / "orphan.rst", ".. image:: nothing.png\n")
+
+        errors = validate_docs(tmp_path, ["index"])
+
+        assert [(e.path, e.line) for e in errors] == [
+            ("guide/intro.rst", 2),
+            ("index.rst", 11),
+        ]
+        assert "missing document 'missing'" in errors[1].message
+
+    def test_glob_toctree(self, tmp_path):
+        _write(tmp_path / "index.rst", ".. toctree::\n   :glob:\n\n   api/*\n")
+        _write(tmp_path / "api" / "one.rst", ".. include:: two.rst\n")
+        _write(tmp_path / "api" / "two.rst", ".. image:: gone.png\n")
+
+        errors = validate_docs(tmp_path, ["index"])
+        assert [(e.path, e.line) for e in errors] == [("api/two.rst", 1)]
+
+    def test_literal_blocks_ignored(self, tmp_path):
+        _write(
+            tmp_path / "index.rst",
+            """
+            .. code-block:: rst
+
+                .. toctree::
+
+                   missing
+
+            Example::
+
+                .. image:: missing.png
+
+            .. image:: gone.png
+            """,
+        )
+
+        errors = validate_docs(tmp_path, ["index"])
+        assert [(e.path, e.line) for e in errors] == [("index.rst", 12)]
+
+    def test_missing_root(self, tmp_path):
+        errors = validate_docs(tmp_path, ["index"])
+        assert "root document 'index' not found" in str(errors[0])
+
+    def test_generated_and_outside_references(self, tmp_path):
+        docs = tmp_path / "docs"
+        _write(
+            docs / "index.rst",
+            """
+            .. toctree::
+
+               genindex
+               search
+               generated/pkg.module
+               api/missing
+
+            .. autosummary::
+               :toctree: generated
+
+               pkg.module
+
+            .. literalinclude:: ../src/a.py
+            .. image:: /../target/logo.png
+            .. include:: ../src/missing.py
+            """,
+        )
+        _write(tmp_path / "src" / "a.py", "")
+        _write(tmp_path / "target" / "logo.png", "")
+
+        errors = validate_docs(docs, ["index"])
+        assert [(e.line, e.message) for e in errors] == [
+            (7, "toctree references missing document 'api/missing'"),
+            (16, "include path '../src/missing.py' not found"),
+        ]